@@ -1,7 +1,19 @@
 import streamlit as st
-from supabase import create_client
 import pandas as pd
+import plotly.graph_objects as go
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
 import civicdb  # ← NUEVO
+import export_reports
+import qc_cohort
+from records import decode_molecular, has_detail, load_detail
+from recurrence_index import RecurrenceIndex, SIN_RECURRENCIA, variant_key
+from report_format import (
+    QUALITY_DISPLAY_COLUMNS, civic_queries, cnv_report, mutation_report, mutation_search, quality_frame, quality_tsv
+)
+from repository import MOLECULAR_TABLES, create_repository
+from sample_index import SampleIndex
 
 # =====================================================
 # CONFIGURACIÓN
@@ -12,15 +24,40 @@ st.set_page_config(
     layout="wide"
 )
 
-# Conexión Supabase
-@st.cache_resource
-def init_supabase():
-    return create_client(
-        st.secrets["SUPABASE_URL"],
-        st.secrets["SUPABASE_KEY"]
+def get_setting(name, default=None):
+    """Configuración: variable de entorno o, si no existe, st.secrets"""
+    if name in os.environ:
+        return os.environ[name]
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+# Conexión a la base de datos (réplica local de Supabase, Supabase o SQLite
+# local, ver repository.py)
+@st.cache_resource(show_spinner="Sincronizando réplica local...")
+def init_repository():
+    backend = get_setting("DB_BACKEND", "mirror")
+    if backend == "sqlite":
+        return create_repository("sqlite", path=get_setting("SQLITE_PATH", "genomica.sqlite"))
+    if backend == "mirror":
+        return create_repository(
+            "mirror",
+            url=get_setting("SUPABASE_URL"),
+            key=get_setting("SUPABASE_KEY"),
+            path=get_setting("MIRROR_PATH", "genomica_mirror.sqlite"),
+            change_column=get_setting("MIRROR_CHANGE_COLUMN"),
+            interval=float(get_setting("MIRROR_SYNC_SECONDS", 30))
+        )
+    return create_repository(
+        "supabase",
+        url=get_setting("SUPABASE_URL"),
+        key=get_setting("SUPABASE_KEY")
     )
 
-supabase = init_supabase()
+repo = init_repository()
+# Contadores de consultas de este rerun (panel de depuración)
+repo.reset_stats()
 
 # =====================================================
 # TÍTULO
@@ -28,85 +65,299 @@ supabase = init_supabase()
 st.title("🧬 Base de Datos Genómica-HGUA")
 st.markdown("---")
 
+# =====================================================
+# CALIDAD DE LA COHORTE
+# =====================================================
+@st.cache_data(ttl=300, show_spinner="Cargando QC de la cohorte...")
+def get_cohort_qc():
+    """QC de todas las muestras (una fila por muestra, columnas mínimas), compartido por todas las sesiones"""
+    return qc_cohort.cohort_frame(repo.get_qc_cohort())
+
+@st.fragment
+def cohort_dashboard():
+    """Distribuciones y tendencias mensuales de QC por workflow; sólo se envían agregados al navegador"""
+    cohort = get_cohort_qc()
+    if cohort.empty:
+        st.info("No hay muestras con fecha de análisis")
+        return
+    
+    col_workflows, col_metric = st.columns([6, 2])
+    with col_workflows:
+        workflows = st.multiselect(
+            "Workflow", list(cohort['workflow'].cat.categories), default=list(cohort['workflow'].cat.categories)
+        )
+    with col_metric:
+        metric = st.selectbox(
+            "Métrica", list(qc_cohort.QC_METRICS), format_func=lambda m: qc_cohort.QC_METRICS[m][1]
+        )
+    cohort = cohort[cohort['workflow'].isin(workflows)]
+    if cohort.empty:
+        st.info("Selecciona al menos un workflow")
+        return
+    
+    label = qc_cohort.QC_METRICS[metric][1]
+    monthly = qc_cohort.monthly_summary(cohort)
+    boxes = qc_cohort.workflow_summary(cohort)
+    boxes = boxes[boxes['metric'] == metric]
+    
+    col_m1, col_m2, col_m3 = st.columns(3)
+    col_m1.metric("Muestras", f"{len(cohort):,}")
+    col_m2.metric("FAIL de fusiones", f"{cohort['fusion_fail'].mean():.1%}")
+    col_m3.metric("Atípicas", f"{int(cohort['outlier'].sum()):,}")
+    
+    # Tendencia: mediana mensual con banda p10–p90
+    trend = go.Figure()
+    for workflow, rows in monthly.groupby('workflow', observed=True):
+        trend.add_trace(go.Scatter(
+            x=pd.concat([rows['month'], rows['month'][::-1]]),
+            y=pd.concat([rows[f'{metric}_p90'], rows[f'{metric}_p10'][::-1]]),
+            fill='toself', opacity=0.2, line={'width': 0}, hoverinfo='skip',
+            legendgroup=workflow, showlegend=False
+        ))
+        trend.add_trace(go.Scatter(
+            x=rows['month'], y=rows[f'{metric}_p50'], mode='lines+markers', name=workflow,
+            legendgroup=workflow, customdata=rows['n'],
+            hovertemplate="%{x|%Y-%m}: %{y:.2f} (n=%{customdata})"
+        ))
+    trend.update_layout(title=f"{label} por mes (mediana, p10–p90)", height=380, margin={'t': 40})
+    
+    # Distribución por workflow con los cuartiles ya calculados
+    box = go.Figure(go.Box(
+        x=boxes['workflow'], q1=boxes['q1'], median=boxes['median'], q3=boxes['q3'],
+        lowerfence=boxes['lowerfence'], upperfence=boxes['upperfence'], name=label
+    ))
+    box.update_layout(title=f"Distribución de {label} por workflow", height=380, margin={'t': 40})
+    
+    fail = go.Figure([
+        go.Bar(x=rows['month'], y=rows['fusion_fail_rate'], name=workflow)
+        for workflow, rows in monthly.groupby('workflow', observed=True)
+    ])
+    fail.update_layout(
+        title="Tasa de FAIL de fusiones por mes", yaxis_tickformat='.0%', height=320, margin={'t': 40}
+    )
+    
+    col_trend, col_box = st.columns([3, 2])
+    col_trend.plotly_chart(trend, use_container_width=True)
+    col_box.plotly_chart(box, use_container_width=True)
+    st.plotly_chart(fail, use_container_width=True)
+    
+    outliers = cohort[cohort[f'outlier_{metric}']].sort_values('month', ascending=False)
+    st.markdown(f"**Muestras atípicas en {label}** ({len(outliers)})")
+    st.caption(
+        f"Desviación de la mediana de su workflow mayor que {qc_cohort.OUTLIER_Z} veces la MAD escalada"
+    )
+    st.dataframe(
+        outliers[['sample_name', 'workflow', 'month', metric]],
+        hide_index=True,
+        use_container_width=True,
+        column_config={'month': st.column_config.DateColumn("Mes", format="YYYY-MM")}
+    )
+
+if st.sidebar.toggle("📈 Calidad de la cohorte", key="cohort_panel"):
+    st.markdown("### 📈 Calidad de la cohorte")
+    cohort_dashboard()
+    st.markdown("---")
+
 # =====================================================
 # BARRA DE BÚSQUEDA
 # =====================================================
-search = st.text_input(
-    "🔍 Buscar muestra:",
-    placeholder="Ej: 25B, 24P, 23C...",
-    help="Formato: [Año][Tipo][Número]. Ejemplo: 25B16796"
-)
+col_search, col_year, col_type = st.columns([6, 2, 2])
+
+with col_search:
+    search = st.text_input(
+        "🔍 Buscar muestra:",
+        placeholder="Ej: 25B, 24P, 23C...",
+        help="Formato: [Año][Tipo][Número]. Ejemplo: 25B16796"
+    )
 
 # =====================================================
 # OBTENER MUESTRAS
 # =====================================================
-def get_samples(search_term=None):
-    """Obtiene muestras filtradas o las últimas 20"""
-    query = supabase.table('sample').select('sample_id, sample_name, analysis_date, workflow_name')
-    
-    if search_term:
-        query = query.ilike('sample_name', f'{search_term}%')
-    
-    response = query.order('analysis_date', desc=True).limit(20).execute()
-    return response.data
+PAGE_SIZES = [20, 50, 100, 500, 1000]
+INDEX_REFRESH_SECONDS = 60
+# El refresco incremental sólo ve fechas >= la mayor conocida: las muestras
+# sin fecha o con fecha anterior y los borrados llegan con la reconstrucción
+INDEX_REBUILD_SECONDS = 900
+
+@st.cache_resource(show_spinner="Cargando índice de muestras...")
+def get_sample_index():
+    """Índice de nombres de todas las muestras (compartido por todas las sesiones)"""
+    index = SampleIndex(repo.list_sample_names())
+    index.refreshed_at = index.built_at = time.monotonic()
+    return index
+
+def refresh_sample_index(index, stale=False):
+    """Añade al índice las muestras nuevas (desde la última analysis_date conocida).
+
+    Cada INDEX_REBUILD_SECONDS, o antes si `stale` (el índice tiene IDs que
+    ya no existen), se reconstruye entero.
+    """
+    now = time.monotonic()
+    if now - index.built_at >= INDEX_REBUILD_SECONDS or (stale and now - index.built_at >= INDEX_REFRESH_SECONDS):
+        get_sample_index.clear()
+        return get_sample_index()
+    if now - index.refreshed_at >= INDEX_REFRESH_SECONDS:
+        index.refreshed_at = now
+        index.update(repo.list_sample_names(since=index.max_date))
+    return index
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_samples(sample_ids):
+    """Obtiene las filas que se muestran, en el orden de `sample_ids`"""
+    if not sample_ids:
+        return []
+    by_id = {row['sample_id']: row for row in repo.get_samples(sample_ids)}
+    return [by_id[sample_id] for sample_id in sample_ids if sample_id in by_id]
+
+sample_index = refresh_sample_index(get_sample_index())
+
+# Filtros por año y tipo (componentes del nombre)
+with col_year:
+    year_filter = st.selectbox("Año", [None] + sample_index.years(), format_func=lambda y: "Todos" if y is None else str(y))
+with col_type:
+    type_filter = st.selectbox("Tipo", [None] + sample_index.types(), format_func=lambda t: "Todos" if t is None else t)
+
+# Selección en session_state: dict {sample_id: None} como conjunto ordenado
+# (pertenencia y borrado O(1), conserva el orden en que se marcaron)
+if 'selected_samples' not in st.session_state:
+    st.session_state.selected_samples = {}
+
+# Pila de cursores: cursors[i] es el inicio de la página i (None = primera)
+if st.session_state.get('sample_search') != (search, year_filter, type_filter):
+    st.session_state['sample_search'] = (search, year_filter, type_filter)
+    st.session_state['sample_cursors'] = [None]
 
-# Obtener muestras
-samples = get_samples(search if search else None)
+cursors = st.session_state['sample_cursors']
+page_size = st.session_state.get('sample_page_size', PAGE_SIZES[0])
+
+# Página resuelta en el índice local; al servidor sólo van las filas visibles
+page_ids, has_next = sample_index.page(search, cursors[-1], page_size, year_filter, type_filter)
+samples = get_samples(tuple(page_ids))
+if len(samples) < len(page_ids):
+    # Muestras borradas que el índice aún tiene: reconstruir y repaginar
+    rebuilt = refresh_sample_index(sample_index, stale=True)
+    if rebuilt is not sample_index:
+        sample_index = rebuilt
+        page_ids, has_next = sample_index.page(search, cursors[-1], page_size, year_filter, type_filter)
+        samples = get_samples(tuple(page_ids))
 
 # =====================================================
 # TABLA CON CHECKBOXES
 # =====================================================
 st.markdown("### Muestras disponibles")
-st.caption(f"Mostrando {len(samples)} muestra(s)")
+st.caption(f"Página {len(cursors)} · Mostrando {len(samples)} muestra(s) · {len(st.session_state.selected_samples)} seleccionada(s)")
 
 if samples:
-    # Inicializar selección en session_state
-    if 'selected_samples' not in st.session_state:
-        st.session_state.selected_samples = []
-    
-    # Crear tabla
-    col1, col2, col3, col4 = st.columns([1, 4, 3, 3])
-    
-    with col1:
-        st.markdown("**☑**")
-    with col2:
-        st.markdown("**Sample Name**")
-    with col3:
-        st.markdown("**Analysis Date**")
-    with col4:
-        st.markdown("**Workflow**")
+    samples_df = pd.DataFrame(samples, columns=['sample_id', 'sample_name', 'analysis_date', 'workflow_name'])
+    samples_df.insert(0, 'selected', samples_df['sample_id'].isin(list(st.session_state.selected_samples)))
+    samples_df[['analysis_date', 'workflow_name']] = samples_df[['analysis_date', 'workflow_name']].fillna('N/A')
     
-    st.markdown("---")
+    # Una sola tabla editable: sólo la columna de selección se puede cambiar
+    edited_df = st.data_editor(
+        samples_df,
+        key=f"sample_editor_{search}_{year_filter}_{type_filter}_{len(cursors)}_{page_size}",
+        hide_index=True,
+        use_container_width=True,
+        disabled=['sample_name', 'analysis_date', 'workflow_name'],
+        column_order=['selected', 'sample_name', 'analysis_date', 'workflow_name'],
+        column_config={
+            'selected': st.column_config.CheckboxColumn("☑", width="small"),
+            'sample_name': "Sample Name",
+            'analysis_date': "Analysis Date",
+            'workflow_name': "Workflow",
+        }
+    )
     
-    # Filas con checkboxes
-    for idx, sample in enumerate(samples):
-        col1, col2, col3, col4 = st.columns([1, 4, 3, 3])
-        
-        with col1:
-            checked = st.checkbox(
-                "☑",
-                key=f"check_{sample['sample_id']}",
-                label_visibility="collapsed"
-            )
-            if checked and sample['sample_id'] not in st.session_state.selected_samples:
-                st.session_state.selected_samples.append(sample['sample_id'])
-            elif not checked and sample['sample_id'] in st.session_state.selected_samples:
-                st.session_state.selected_samples.remove(sample['sample_id'])
-        
-        with col2:
-            st.text(sample['sample_name'])
-        with col3:
-            st.text(sample['analysis_date'] or 'N/A')
-        with col4:
-            st.text(sample['workflow_name'] or 'N/A')
+    # La selección se conserva entre páginas (sólo cambian las filas de ésta)
+    selected = st.session_state.selected_samples
+    for sample_id, checked in zip(edited_df['sample_id'].tolist(), edited_df['selected'].tolist()):
+        if checked:
+            selected.setdefault(sample_id, None)
+        else:
+            selected.pop(sample_id, None)
 else:
     st.info("No se encontraron muestras")
 
+# Navegación entre páginas
+col_prev, col_next, col_size, col_spacer = st.columns([2, 2, 2, 6])
+
+with col_prev:
+    if st.button("⬅️ Anterior", use_container_width=True, disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+
+with col_next:
+    if st.button("Siguiente ➡️", use_container_width=True, disabled=not has_next):
+        # El cursor sale del índice, no de las filas pintadas (pueden faltar)
+        cursors.append(sample_index.cursor(page_ids[-1]))
+        st.rerun()
+
+with col_size:
+    new_page_size = st.selectbox(
+        "Muestras por página",
+        PAGE_SIZES,
+        index=PAGE_SIZES.index(page_size),
+        label_visibility="collapsed"
+    )
+    if new_page_size != page_size:
+        st.session_state['sample_page_size'] = new_page_size
+        st.session_state['sample_cursors'] = [None]
+        st.rerun()
+
+# =====================================================
+# EXPORTACIÓN (DOCX / XLSX)
+# =====================================================
+EXPORT_WORKERS = min(4, os.cpu_count() or 1)
+
+@st.cache_resource
+def get_export_pool():
+    """Pool de procesos compartido por todas las sesiones"""
+    return export_reports.start_pool(EXPORT_WORKERS)
+
+def start_export(sample_ids):
+    """Carga los datos (una consulta por tabla) y lanza un DOCX por muestra y el XLSX en el pool"""
+    muestras = export_reports.collect(repo, sample_ids)
+    
+    def submit(pool):
+        return {
+            'docx': [pool.submit(export_reports.build_docx, muestra) for muestra in muestras],
+            'xlsx': pool.submit(export_reports.build_xlsx, muestras),
+            'started': time.monotonic(),
+            'result': None,
+        }
+    
+    pool = get_export_pool()
+    try:
+        return submit(pool)
+    except BrokenProcessPool:
+        # Un proceso murió (p. ej. sin memoria) y el pool ya no acepta tareas
+        pool.shutdown()
+        get_export_pool.clear()
+        return submit(get_export_pool())
+
+@st.fragment(run_every=1.0)
+def export_progress(job):
+    """Progreso de la exportación; se refresca solo cada segundo sin bloquear la sesión"""
+    futures = [*job['docx'], job['xlsx']]
+    done = sum(future.done() for future in futures)
+    st.progress(done / len(futures), text=f"📥 Generando informes: {done}/{len(futures)}")
+    
+    if done == len(futures):
+        errors = [str(future.exception()) for future in futures if future.exception()]
+        docx_files = [future.result() for future in job['docx'] if not future.exception()]
+        job['result'] = {
+            'zip': export_reports.bundle_zip(docx_files) if docx_files else None,
+            'xlsx': job['xlsx'].result() if not job['xlsx'].exception() else None,
+            'errors': errors,
+            'seconds': time.monotonic() - job['started'],
+        }
+        st.rerun()
+
 # =====================================================
 # BOTONES DE ACCIÓN
 # =====================================================
 st.markdown("---")
-col_btn1, col_btn2, col_spacer = st.columns([2, 2, 6])
+col_btn1, col_btn2, col_btn3, col_spacer = st.columns([2, 2, 2, 4])
 
 with col_btn1:
     if st.button("📊 Parámetros de Calidad", use_container_width=True):
@@ -120,14 +371,77 @@ with col_btn2:
         if not st.session_state.selected_samples:
             st.warning("⚠️ Selecciona al menos una muestra")
         else:
-            st.session_state['analyzing_samples'] = st.session_state.selected_samples.copy()
+            st.session_state['analyzing_samples'] = list(st.session_state.selected_samples)
+            # Abrir el análisis siempre recarga datos frescos
+            st.session_state.pop('molecular_cache', None)
+            st.session_state.pop('civic_results', None)
+            st.session_state.pop('pending_classifications', None)
+
+with col_btn3:
+    if st.button("📥 Exportar informes", use_container_width=True):
+        if not st.session_state.selected_samples:
+            st.warning("⚠️ Selecciona al menos una muestra")
+        else:
+            st.session_state['export_job'] = start_export(list(st.session_state.selected_samples))
 
 # Botón para cerrar análisis molecular
 if st.session_state.get('analyzing_samples'):
     if st.button("❌ Cerrar Análisis Molecular", type="secondary"):
         st.session_state['analyzing_samples'] = None
+        st.session_state.pop('molecular_cache', None)
+        st.session_state.pop('civic_results', None)
+        st.session_state.pop('pending_classifications', None)
         st.rerun()
 
+# Exportación en curso o terminada
+if st.session_state.get('export_job'):
+    job = st.session_state['export_job']
+    if job['result'] is None:
+        export_progress(job)
+    else:
+        result = job['result']
+        st.success(f"✅ Informes generados en {result['seconds']:.1f} s")
+        for error in result['errors']:
+            st.error(f"❌ {error}")
+        
+        col_docx, col_xlsx, col_close = st.columns([2, 2, 1])
+        with col_docx:
+            if result['zip']:
+                st.download_button(
+                    "⬇️ Informes DOCX (zip)",
+                    data=result['zip'],
+                    file_name=export_reports.export_name('zip'),
+                    mime="application/zip",
+                    use_container_width=True
+                )
+        with col_xlsx:
+            if result['xlsx']:
+                st.download_button(
+                    "⬇️ Libro XLSX (QC y variantes)",
+                    data=result['xlsx'],
+                    file_name=export_reports.export_name('xlsx'),
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
+        with col_close:
+            if st.button("❌", key="close_export", help="Cerrar exportación"):
+                st.session_state.pop('export_job')
+                st.rerun()
+
+# =====================================================
+# OBTENER PARÁMETROS DE CALIDAD
+# =====================================================
+@st.cache_data(ttl=300, show_spinner=False)
+def get_quality_data(sample_ids):
+    """Obtiene QC de ADN/ARN de varias muestras con una consulta por tabla.
+    
+    `sample_ids` debe ser una tupla ordenada para que la caché se comparta
+    entre selecciones con las mismas muestras. Devuelve un DataFrame indexado
+    por sample_id con las columnas ya formateadas para mostrar.
+    """
+    ids = list(sample_ids)
+    return quality_frame(ids, repo.get_quality(ids) if ids else {})
+
 # =====================================================
 # PARÁMETROS DE CALIDAD
 # =====================================================
@@ -135,80 +449,21 @@ if st.session_state.get('show_quality', False):
     st.markdown("### 📊 Parámetros de Calidad")
     st.caption("Datos listos para copiar a Google Sheets (4 columnas sin sample_name, separado por TAB)")
     
-    # Recopilar TODOS los datos primero
-    all_lines = []
-    quality_data_display = []
-    
-    for sample_id in st.session_state.selected_samples:
-        # Info de muestra
-        sample_info = supabase.table('sample').select('sample_name').eq('sample_id', sample_id).execute()
-        sample_name = sample_info.data[0]['sample_name'] if sample_info.data else 'N/A'
-        
-        # QC ADN
-        qc_adn = supabase.table('sample_adn_qc').select('*').eq('sample_id', sample_id).execute()
-        
-        # QC ARN
-        qc_arn = supabase.table('sample_arn_qc').select('*').eq('sample_id', sample_id).execute()
-        
-        # Procesar datos
-        mean_reads = int(qc_adn.data[0]['median_reads_per_amplicon']) if qc_adn.data and qc_adn.data[0].get('median_reads_per_amplicon') else 'N/A'
-        uniformity_coverage = f"{qc_adn.data[0]['uniformity_of_base_coverage']:.2f}" if qc_adn.data and qc_adn.data[0].get('uniformity_of_base_coverage') else 'N/A'
-        mapd = f"{qc_adn.data[0]['mapd']:.2f}" if qc_adn.data and qc_adn.data[0].get('mapd') else 'N/A'
-        
-        # Extraer solo PASS/FAIL de fusion_qc
-        fusion_qc_raw = qc_arn.data[0]['fusion_qc'] if qc_arn.data and qc_arn.data[0].get('fusion_qc') else 'N/A'
-        if fusion_qc_raw != 'N/A':
-            fusion_qc = fusion_qc_raw.split(',')[0].strip().upper()
-        else:
-            fusion_qc = 'N/A'
-        
-        # Crear línea para copiar (separada por TAB para Google Sheets) - SIN sample_name
-        line_data = f"{mean_reads}\t{uniformity_coverage}\t{mapd}\t{fusion_qc}"
-        all_lines.append(line_data)
-        
-        # Guardar para mostrar en tabla
-        quality_data_display.append({
-            'sample_name': sample_name,
-            'mean_reads': str(mean_reads),
-            'uniformity_coverage': str(uniformity_coverage),
-            'mapd': str(mapd),
-            'fusion_qc': fusion_qc
-        })
+    # Una consulta por tabla para todas las muestras (cacheado por conjunto de IDs)
+    quality_df = get_quality_data(tuple(sorted(st.session_state.selected_samples)))
+    quality_df = quality_df.reindex(list(st.session_state.selected_samples)).reset_index(drop=True)
     
     # Mostrar tabla visual
-    col_name, col_reads, col_aligned, col_mapd, col_fusion = st.columns([3, 2, 2, 1, 1])
-    with col_name:
-        st.markdown("**Sample_name**")
-    with col_reads:
-        st.markdown("**mean_reads**")
-    with col_aligned:
-        st.markdown("**uniformity_coverage**")
-    with col_mapd:
-        st.markdown("**mapd**")
-    with col_fusion:
-        st.markdown("**fusion_qc**")
-    
-    st.markdown("---")
-    
-    # Mostrar cada fila
-    for data in quality_data_display:
-        col_name, col_reads, col_aligned, col_mapd, col_fusion = st.columns([3, 2, 2, 1, 1])
-        
-        with col_name:
-            st.text(data['sample_name'])
-        with col_reads:
-            st.text(data['mean_reads'])
-        with col_aligned:
-            st.text(data['uniformity_coverage'])
-        with col_mapd:
-            st.text(data['mapd'])
-        with col_fusion:
-            st.text(data['fusion_qc'])
+    st.dataframe(
+        quality_df[QUALITY_DISPLAY_COLUMNS],
+        hide_index=True,
+        use_container_width=True
+    )
     
     st.markdown("---")
     
     # Campo de texto grande con TODAS las filas para copiar de una vez
-    all_data_text = "\n".join(all_lines)
+    all_data_text = quality_tsv(quality_df)
     st.text_area(
         "📋 **Copiar TODAS las filas** (Ctrl+A → Ctrl+C → Pegar en Google Sheets)",
         value=all_data_text,
@@ -223,277 +478,500 @@ if st.session_state.get('show_quality', False):
         st.rerun()
 
 # =====================================================
-# ANÁLISIS MOLECULAR
+# OBTENER DATOS MOLECULARES
 # =====================================================
-if st.session_state.get('analyzing_samples'):
-    st.markdown("### 🧬 Análisis Molecular")
+def load_molecular_data(sample_ids):
+    """Variantes de varias muestras (registros compactos de records.py); sólo consulta las que no están en la sesión"""
+    cache = st.session_state.setdefault('molecular_cache', {})
+    missing = [sample_id for sample_id in sample_ids if sample_id not in cache]
     
-    # Dropdown clasificaciones
-    clasificaciones = [
-        "Sin clasificar",
-        "Benigna",
-        "Probablemente benigna",
-        "VUS",
-        "Probablemente patogénica",
-        "Patogénica",
-        "No informar por QC"
-    ]
-    
-    # Para cada muestra que se está analizando
-    for sample_id in st.session_state['analyzing_samples']:
-            # Info de muestra
-            sample_info = supabase.table('sample').select('sample_name').eq('sample_id', sample_id).execute()
-            sample_name = sample_info.data[0]['sample_name'] if sample_info.data else 'N/A'
-            
-            st.markdown(f"#### 📋 {sample_name}")
-            st.markdown("---")
+    if missing:
+        cache.update(decode_molecular(repo.get_molecular(missing, with_sample=False), missing))
+    
+    return {sample_id: cache[sample_id] for sample_id in sample_ids}
+
+# Recurrencia entre muestras: las mutaciones nuevas se añaden con la misma
+# cadencia que el índice de muestras; de vez en cuando se reconstruye entero
+# para recoger borrados (recargas de carreras) y cambios de otros procesos
+RECURRENCE_REBUILD_SECONDS = 900
+
+@st.cache_resource(show_spinner="Cargando índice de recurrencia...")
+def get_recurrence_index():
+    """Índice de variantes de todas las muestras (compartido por todas las sesiones)"""
+    index = RecurrenceIndex(repo.list_mutation_keys())
+    index.refreshed_at = index.built_at = time.monotonic()
+    return index
+
+def refresh_recurrence_index(index):
+    """Añade al índice las mutaciones nuevas (mutation_id > el mayor conocido)"""
+    now = time.monotonic()
+    if now - index.built_at >= RECURRENCE_REBUILD_SECONDS:
+        get_recurrence_index.clear()
+        return get_recurrence_index()
+    if now - index.refreshed_at >= INDEX_REFRESH_SECONDS:
+        index.refreshed_at = now
+        index.update(repo.list_mutation_keys(since_id=index.max_id + 1))
+    return index
+
+def mutation_recurrence(sample_id, mutations):
+    """{mutation_id: Recurrencia} de las mutaciones de una muestra (una sola búsqueda en el índice)"""
+    index = refresh_recurrence_index(get_recurrence_index())
+    keys = {mut.mutation_id: variant_key(mut.gene, mut.coding, mut.protein) for mut in mutations}
+    found = index.lookup(keys.values(), before_sample=sample_id, sample_order=sample_index.order_key)
+    return {mutation_id: found.get(key, SIN_RECURRENCIA) for mutation_id, key in keys.items()}
+
+def ensure_detail(record):
+    """Carga (una vez) las columnas de detalle de una variante para búsqueda/informe"""
+    if not has_detail(record):
+        rows = repo.get_variant_details(record.TABLE, [getattr(record, record.ID_COLUMN)])
+        load_detail(record, rows[0] if rows else {})
+    return record
+
+def mark_classification(table, row, widget_key):
+    """Callback del selectbox: apunta el cambio como pendiente de guardar"""
+    pending = st.session_state.setdefault('pending_classifications', {})
+    key = (table, getattr(row, MOLECULAR_TABLES[table]))
+    new_class = st.session_state[widget_key]
+    
+    if new_class == (row.clasificacion_hgua or 'Sin clasificar'):
+        pending.pop(key, None)
+    else:
+        pending[key] = new_class
+
+# Selector de clasificación de cada tabla (clave del widget = prefijo + ID)
+CLASS_WIDGET_PREFIXES = {'mutation': 'class_mut_', 'cnv': 'class_cnv_', 'arn_alteration': 'class_arn_'}
+
+# Claves de widgets por fila: prefijo → tabla del ID que lleva detrás
+ROW_WIDGET_PREFIXES = {
+    'open_sample_': 'sample',
+    'class_mut_': 'mutation', 'search_mut_': 'mutation', 'report_mut_': 'mutation', 'civic_': 'mutation',
+    'copy_search_mut_': 'mutation', 'copy_report_mut_': 'mutation',
+    'class_cnv_': 'cnv', 'report_cnv_': 'cnv', 'copy_report_cnv_': 'cnv',
+    'class_arn_': 'arn_alteration', 'report_arn_': 'arn_alteration',
+}
+
+def row_key(prefix, row_id):
+    """Clave del widget de una fila ('class_mut_' + ID). El prefijo tiene que estar
+    en ROW_WIDGET_PREFIXES para que prune_session_state la borre después"""
+    if prefix not in ROW_WIDGET_PREFIXES:
+        raise KeyError(f"Prefijo de widget sin registrar en ROW_WIDGET_PREFIXES: {prefix}")
+    return f"{prefix}{row_id}"
+
+def prune_session_state():
+    """Borra las claves de widgets de muestras y variantes que ya no están en
+    pantalla (fuera del análisis abierto), así el estado de la sesión no
+    crece con cada muestra revisada."""
+    live = {('sample', sample_id) for sample_id in st.session_state.get('analyzing_samples') or []}
+    for data in st.session_state.get('molecular_cache', {}).values():
+        for table, id_column in MOLECULAR_TABLES.items():
+            live.update((table, getattr(row, id_column)) for row in data[table])
+    
+    for key in list(st.session_state.keys()):
+        head, _, row_id = str(key).rpartition('_')
+        table = ROW_WIDGET_PREFIXES.get(head + '_')
+        if table and row_id.isdigit() and (table, int(row_id)) not in live:
+            del st.session_state[key]
+    
+    # Un cambio pendiente sólo vale mientras su selector lo muestra: si el
+    # widget ya no existe (panel plegado, análisis cerrado) se descarta, para
+    # no guardar clasificaciones que el usuario no ve
+    pending = st.session_state.get('pending_classifications')
+    if pending:
+        for (table, row_id), new_class in list(pending.items()):
+            if st.session_state.get(row_key(CLASS_WIDGET_PREFIXES[table], row_id)) != new_class:
+                del pending[(table, row_id)]
+
+def discard_pending(sample_id):
+    """Descarta los cambios pendientes de una muestra (y sus selectores) al plegar su panel"""
+    data = st.session_state.get('molecular_cache', {}).get(sample_id)
+    pending = st.session_state.get('pending_classifications')
+    if not data or not pending:
+        return
+    for table, id_column in MOLECULAR_TABLES.items():
+        for row in data[table]:
+            row_id = getattr(row, id_column)
+            if pending.pop((table, row_id), None) is not None:
+                st.session_state.pop(row_key(CLASS_WIDGET_PREFIXES[table], row_id), None)
+
+def save_pending_classifications():
+    """Guarda todas las clasificaciones pendientes.
+    
+    Agrupa por tabla y clasificación: un UPDATE ... IN (ids) por grupo, así
+    que el número de consultas no depende del número de filas. Las filas que
+    no vuelven en la respuesta (o cuyo grupo falla) se dan por fallidas y
+    siguen pendientes. Devuelve (nº guardadas, [(tabla, id, error)], segundos).
+    """
+    start = time.perf_counter()
+    pending = st.session_state.get('pending_classifications', {})
+    
+    # Filas cacheadas para actualizarlas en el sitio
+    cached_rows = {
+        (table, getattr(row, id_column)): row
+        for data in st.session_state.get('molecular_cache', {}).values()
+        for table, id_column in MOLECULAR_TABLES.items()
+        for row in data[table]
+    }
+    
+    groups = {}
+    for (table, row_id), new_class in pending.items():
+        groups.setdefault((table, new_class), []).append(row_id)
+    
+    written = 0
+    failed = []
+    for (table, new_class), row_ids in groups.items():
+        try:
+            updated = repo.update_classification(table, row_ids, new_class)
+        except Exception as e:
+            failed.extend((table, row_id, str(e)) for row_id in row_ids)
+            continue
+        
+        if table == 'mutation':
+            get_recurrence_index().set_classification(updated, new_class)
+        
+        for row_id in row_ids:
+            if row_id in updated:
+                pending.pop((table, row_id))
+                if (table, row_id) in cached_rows:
+                    cached_rows[(table, row_id)].clasificacion_hgua = new_class
+                written += 1
+            else:
+                failed.append((table, row_id, "fila no actualizada"))
+    
+    return written, failed, time.perf_counter() - start
+
+def show_civic_result(consulta, expanded=True):
+    """Muestra el resultado de CIVICdb de una mutación (civicdb.Consulta)"""
+    if consulta.estado == civicdb.ERROR:
+        st.error(f"❌ CIVICdb no disponible ahora mismo, inténtalo más tarde ({consulta.error})")
+    elif consulta.estado == civicdb.ENCONTRADO:
+        resultado = consulta.resultado
+        st.success("✅ Encontrado en CIVICdb")
+        if consulta.obsoleto:
+            st.caption("⏳ Datos guardados de una consulta anterior; actualizando en segundo plano")
+        
+        with st.expander("📊 Información de CIVICdb", expanded=expanded):
+            # Terapias
+            if resultado['terapias']:
+                st.markdown(f"**💊 Terapias:** {', '.join(resultado['terapias'])}")
             
-            # ============== MUTATIONS ==============
-            mutations = supabase.table('mutation').select('*').eq('sample_id', sample_id).execute()
+            # Evidencias
+            if resultado['evidencias']:
+                st.markdown("**📋 Evidencias principales:**")
+                for ev in resultado['evidencias']:
+                    if ev['nivel'] and ev['significancia']:
+                        st.markdown(f"- **Nivel {ev['nivel']}**: {ev['significancia']}")
+                        if ev['descripcion']:
+                            st.caption(f"{ev['descripcion']}...")
             
-            if mutations.data:
-                st.markdown(f"**🧬 Mutaciones ({len(mutations.data)})**")
+            # Link completo
+            st.markdown(f"**🔗 [Ver información completa en CIVICdb]({resultado['url']})**")
+    else:
+        st.warning("⚠️ No se encontró esta variante en CIVICdb")
+
+# =====================================================
+# ANÁLISIS MOLECULAR
+# =====================================================
+# Dropdown clasificaciones
+clasificaciones = [
+    "Sin clasificar",
+    "Benigna",
+    "Probablemente benigna",
+    "VUS",
+    "Probablemente patogénica",
+    "Patogénica",
+    "No informar por QC"
+]
+
+@st.fragment
+def sample_panel(sample_id, sample_name):
+    """Panel de una muestra. Sólo carga y dibuja sus variantes al desplegarlo,
+    y sus botones/selectores reejecutan únicamente este fragmento."""
+    with st.container(border=True):
+        if not st.toggle(f"📋 **{sample_name}**", key=row_key('open_sample_', sample_id)):
+            discard_pending(sample_id)
+            return
+        
+        data = load_molecular_data([sample_id])[sample_id]
+        civic_results = st.session_state.setdefault('civic_results', {})
+        pending = st.session_state.setdefault('pending_classifications', {})
+        
+        n_pending = sum(
+            1 for table, id_column in MOLECULAR_TABLES.items()
+            for row in data[table] if (table, getattr(row, id_column)) in pending
+        )
+        if n_pending:
+            st.caption(f"✏️ {n_pending} cambio(s) pendiente(s) de guardar en esta muestra")
+        
+        recurrence = mutation_recurrence(sample_id, data['mutation'])
+        render_variants(data, civic_results, pending, recurrence)
+
+def show_recurrence(recurrencia):
+    """Línea de la tarjeta con las veces que se ha visto la variante en muestras anteriores"""
+    if not recurrencia.n:
+        st.caption("🆕 No vista en muestras anteriores")
+        return
+    distribucion = ", ".join(f"{clase}: {n}" for clase, n in recurrencia.clasificaciones.most_common())
+    ultima = f" · **Última:** {recurrencia.ultima}" if recurrencia.ultima else ""
+    st.markdown(f"**🔁 Vista en {recurrencia.n} muestra(s) anterior(es)**{ultima}")
+    st.caption(distribucion)
+
+def render_variants(data, civic_results, pending, recurrence):
+    """Mutaciones, CNVs y alteraciones de ARN de una muestra"""
+    # ============== MUTATIONS ==============
+    mutations = data['mutation']
+    
+    if mutations:
+        st.markdown(f"**🧬 Mutaciones ({len(mutations)})**")
+        
+        for mut in mutations:
+            with st.container():
+                # Fila principal con info - TEXTO MÁS GRANDE
+                col_info, col_class, col_btn1, col_btn2, col_save = st.columns([6, 2, 1, 1, 1])
+                
+                with col_info:
+                    # Texto más grande
+                    st.markdown(f"### {mut.gene} | {mut.protein}")
+                    st.markdown(f"**Coding:** {mut.coding}")
+                    st.markdown(f"**AF:** {mut.af:.3f} | **DP:** {mut.dp} | **Type:** {mut.type}")
+                    st.markdown(f"**Function:** {mut.function} | **Location:** {mut.location}")
+                    st.markdown(f"**Oncomine:** {mut.oncomine_variant_class}")
+                    show_recurrence(recurrence[mut.mutation_id])
+                
+                with col_class:
+                    current_class = mut.clasificacion_hgua or 'Sin clasificar'
+                    new_class = st.selectbox(
+                        "Clasificación",
+                        clasificaciones,
+                        index=clasificaciones.index(current_class) if current_class in clasificaciones else 0,
+                        key=row_key('class_mut_', mut.mutation_id),
+                        label_visibility="collapsed",
+                        on_change=mark_classification,
+                        args=('mutation', mut, row_key('class_mut_', mut.mutation_id))
+                    )
+                
+                with col_btn1:
+                    # Botón copiar para búsqueda (el texto sólo se muestra en el rerun del clic)
+                    show_search = st.button("🔍", key=row_key('search_mut_', mut.mutation_id), help="Copiar para búsqueda")
+                
+                with col_btn2:
+                    # Botón copiar para informe
+                    show_report = st.button("📄", key=row_key('report_mut_', mut.mutation_id), help="Copiar para informe")
+                
+                with col_save:
+                    if ('mutation', mut.mutation_id) in pending:
+                        st.markdown("✏️", help="Cambio pendiente de guardar")
+                
+                # ===== BOTÓN CIVICDB (NUEVO) =====
+                # Un par (gen, variante) por alelo: p.Gly12Asp,p.Gly12Val → G12D y G12V
+                civic_pairs = civic_queries(mut)
+                civic_clicked = st.button("🔬 Buscar en CIVICdb", key=row_key('civic_', mut.mutation_id), type="secondary", use_container_width=True)
+                
+                if civic_clicked:
+                    if civic_pairs:
+                        with st.spinner('🔍 Buscando en CIVICdb...'):
+                            for pair, consulta in civicdb.buscar_varios(civic_pairs):
+                                civic_results[civicdb.normalizar_clave(*pair)] = consulta
+                    else:
+                        st.error("❌ Faltan datos de gen o variante")
+                
+                # Resultado de la búsqueda o de la pre-anotación. Si era de la
+                # caché caducada se vuelve a mirar por si ya se ha revalidado
+                for civic_gene, civic_variant in civic_pairs:
+                    civic_key = civicdb.normalizar_clave(civic_gene, civic_variant)
+                    if civic_key not in civic_results:
+                        continue
+                    if civic_results[civic_key].obsoleto:
+                        civic_results[civic_key] = civicdb.buscar(civic_gene, civic_variant)
+                    if len(civic_pairs) > 1:
+                        st.markdown(f"**{civic_gene} {civic_variant}**")
+                    show_civic_result(civic_results[civic_key], expanded=civic_clicked)
+                
+                # Campo para búsqueda - ANCHO COMPLETO DEBAJO
+                if show_search:
+                    search_text = mutation_search(ensure_detail(mut))
+                    st.text_area(
+                        "📋 Copiar búsqueda (Ctrl+A → Ctrl+C):",
+                        value=search_text,
+                        height=80,
+                        key=row_key('copy_search_mut_', mut.mutation_id)
+                    )
+                
+                # Campo para informe - ANCHO COMPLETO DEBAJO
+                if show_report:
+                    report_text = mutation_report(ensure_detail(mut), new_class)
+                    st.text_area(
+                        "📋 Copiar informe (Ctrl+A → Ctrl+C):",
+                        value=report_text,
+                        height=120,
+                        key=row_key('copy_report_mut_', mut.mutation_id)
+                    )
                 
-                for mut in mutations.data:
-                    with st.container():
-                        # Fila principal con info - TEXTO MÁS GRANDE
-                        col_info, col_class, col_btn1, col_btn2, col_save = st.columns([6, 2, 1, 1, 1])
-                        
-                        with col_info:
-                            gene = mut['gene'] or 'N/A'
-                            protein = mut['protein'] or 'N/A'
-                            coding = mut['coding'] or 'N/A'
-                            af = mut['af'] if mut['af'] else 0
-                            dp = mut['dp'] if mut['dp'] else 0
-                            
-                            # Texto más grande
-                            st.markdown(f"### {gene} | {protein}")
-                            st.markdown(f"**Coding:** {coding}")
-                            st.markdown(f"**AF:** {af:.3f} | **DP:** {dp} | **Type:** {mut['type'] or 'N/A'}")
-                            st.markdown(f"**Function:** {mut['function'] or 'N/A'} | **Location:** {mut['location'] or 'N/A'}")
-                            st.markdown(f"**Oncomine:** {mut['oncomine_variant_class'] or 'N/A'}")
-                        
-                        with col_class:
-                            current_class = mut['clasificacion_hgua'] or 'Sin clasificar'
-                            new_class = st.selectbox(
-                                "Clasificación",
-                                clasificaciones,
-                                index=clasificaciones.index(current_class) if current_class in clasificaciones else 0,
-                                key=f"class_mut_{mut['mutation_id']}",
-                                label_visibility="collapsed"
-                            )
-                        
-                        with col_btn1:
-                            # Botón copiar para búsqueda
-                            if st.button("🔍", key=f"search_mut_{mut['mutation_id']}", help="Copiar para búsqueda"):
-                                st.session_state[f"show_search_mut_{mut['mutation_id']}"] = True
-                            else:
-                                st.session_state[f"show_search_mut_{mut['mutation_id']}"] = False
-                        
-                        with col_btn2:
-                            # Botón copiar para informe
-                            if st.button("📄", key=f"report_mut_{mut['mutation_id']}", help="Copiar para informe"):
-                                st.session_state[f"show_report_mut_{mut['mutation_id']}"] = True
-                            else:
-                                st.session_state[f"show_report_mut_{mut['mutation_id']}"] = False
-                        
-                        with col_save:
-                            if st.button("💾", key=f"save_mut_{mut['mutation_id']}", help="Guardar clasificación"):
-                                supabase.table('mutation').update({
-                                    'clasificacion_hgua': new_class
-                                }).eq('mutation_id', mut['mutation_id']).execute()
-                                st.success("✅", icon="✅")
-                        
-                        # ===== BOTÓN CIVICDB (NUEVO) =====
-                        if st.button("🔬 Buscar en CIVICdb", key=f"civic_{mut['mutation_id']}", type="secondary", use_container_width=True):
-                            gene = mut['gene']
-                            protein = mut['protein']
-                            
-                            # Limpiar variant (p.V600E → V600E)
-                            if protein and protein.startswith('p.'):
-                                variant = protein[2:].replace('(', '').replace(')', '').strip()
-                            else:
-                                variant = protein
-                            
-                            if gene and variant:
-                                with st.spinner('🔍 Buscando en CIVICdb...'):
-                                    resultado = civicdb.buscar(gene, variant)
-                                
-                                if resultado:
-                                    st.success("✅ Encontrado en CIVICdb")
-                                    
-                                    with st.expander("📊 Información de CIVICdb", expanded=True):
-                                        # Terapias
-                                        if resultado['terapias']:
-                                            st.markdown(f"**💊 Terapias:** {', '.join(resultado['terapias'])}")
-                                        
-                                        # Evidencias
-                                        if resultado['evidencias']:
-                                            st.markdown("**📋 Evidencias principales:**")
-                                            for ev in resultado['evidencias']:
-                                                if ev['nivel'] and ev['significancia']:
-                                                    st.markdown(f"- **Nivel {ev['nivel']}**: {ev['significancia']}")
-                                                    if ev['descripcion']:
-                                                        st.caption(f"{ev['descripcion']}...")
-                                        
-                                        # Link completo
-                                        st.markdown(f"**🔗 [Ver información completa en CIVICdb]({resultado['url']})**")
-                                else:
-                                    st.warning("⚠️ No se encontró esta variante en CIVICdb")
-                            else:
-                                st.error("❌ Faltan datos de gen o variante")
-                        
-                        # Campo para búsqueda - ANCHO COMPLETO DEBAJO
-                        if st.session_state.get(f"show_search_mut_{mut['mutation_id']}", False):
-                            transcript = mut['transcript'] or ''
-                            search_text = f"{transcript}:{coding}"
-                            st.text_area(
-                                "📋 Copiar búsqueda (Ctrl+A → Ctrl+C):",
-                                value=search_text,
-                                height=80,
-                                key=f"copy_search_mut_{mut['mutation_id']}"
-                            )
-                        
-                        # Campo para informe - ANCHO COMPLETO DEBAJO
-                        if st.session_state.get(f"show_report_mut_{mut['mutation_id']}", False):
-                            chrom = mut['chrom'] or ''
-                            pos = mut['pos'] or ''
-                            exon = mut['exon'] or ''
-                            exon_formatted = f"exón {exon}" if exon else ""
-                            vaf = af * 100
-                            mut_type = mut['type'] or ''
-                            transcript = mut['transcript'] or ''
-                            report_text = f"{gene} ({chrom}:{pos}; {transcript}) {exon_formatted}; {coding}; {protein}; VAF: {vaf:.2f}%; {dp}; {mut_type}; {new_class}"
-                            st.text_area(
-                                "📋 Copiar informe (Ctrl+A → Ctrl+C):",
-                                value=report_text,
-                                height=120,
-                                key=f"copy_report_mut_{mut['mutation_id']}"
-                            )
-                        
-                        st.markdown("---")
-            
-            # Separador entre muestras
-            if sample_id != st.session_state["analyzing_samples"][-1]:
                 st.markdown("---")
-                st.markdown("")
-            
-            # ============== CNVs ==============
-            cnvs = supabase.table('cnv').select('*').eq('sample_id', sample_id).execute()
-            
-            if cnvs.data:
-                st.markdown(f"**📊 CNVs ({len(cnvs.data)})**")
+    
+    # ============== CNVs ==============
+    cnvs = data['cnv']
+    
+    if cnvs:
+        st.markdown(f"**📊 CNVs ({len(cnvs)})**")
+        
+        for cnv in cnvs:
+            with st.container():
+                col_info, col_class, col_btn, col_save = st.columns([7, 2, 1, 1])
                 
-                for cnv in cnvs.data:
-                    with st.container():
-                        col_info, col_class, col_btn, col_save = st.columns([7, 2, 1, 1])
-                        
-                        with col_info:
-                            gene_name = cnv['gene_name'] or 'N/A'
-                            cn = cnv['cn'] if cnv['cn'] else 0
-                            ci = cnv['ci'] or ''
-                            chrom = cnv['chrom'] or ''
-                            pos = cnv['pos'] or ''
-                            end_pos = cnv['end_pos'] or ''
-                            
-                            # Texto más grande
-                            st.markdown(f"### {gene_name}")
-                            st.markdown(f"**CN:** {cn:.2f} | **CI:** {ci}")
-                            st.markdown(f"**Oncomine:** {cnv['oncomine_variant_class'] or 'N/A'}")
-                        
-                        with col_class:
-                            current_class = cnv['clasificacion_hgua'] or 'Sin clasificar'
-                            new_class = st.selectbox(
-                                "Clasificación",
-                                clasificaciones,
-                                index=clasificaciones.index(current_class) if current_class in clasificaciones else 0,
-                                key=f"class_cnv_{cnv['cnv_id']}",
-                                label_visibility="collapsed"
-                            )
-                        
-                        with col_btn:
-                            if st.button("📄", key=f"report_cnv_{cnv['cnv_id']}", help="Copiar para informe"):
-                                st.session_state[f"show_report_cnv_{cnv['cnv_id']}"] = True
-                            else:
-                                st.session_state[f"show_report_cnv_{cnv['cnv_id']}"] = False
-                        
-                        with col_save:
-                            if st.button("💾", key=f"save_cnv_{cnv['cnv_id']}", help="Guardar clasificación"):
-                                supabase.table('cnv').update({
-                                    'clasificacion_hgua': new_class
-                                }).eq('cnv_id', cnv['cnv_id']).execute()
-                                st.success("✅", icon="✅")
-                        
-                        # Campo para informe - ANCHO COMPLETO DEBAJO
-                        if st.session_state.get(f"show_report_cnv_{cnv['cnv_id']}", False):
-                            # Determinar amplificación o deleción
-                            condicion = "Amplificación" if cn > 2 else "Deleción"
-                            
-                            # Formatear CI con %
-                            ci_formatted = ci
-                            if ci and '-' in ci:
-                                parts = ci.split('-')
-                                if len(parts) == 2:
-                                    ci_formatted = f"{parts[0]}%-{parts[1]}%"
-                            
-                            report_text = f"{condicion} {gene_name} ({chrom}; {pos}:{end_pos}) {ci_formatted}"
-                            st.text_area(
-                                "📋 Copiar informe (Ctrl+A → Ctrl+C):",
-                                value=report_text,
-                                height=100,
-                                key=f"copy_report_cnv_{cnv['cnv_id']}"
-                            )
-                        
-                        st.markdown("---")
-            
-            # ============== ARN ALTERATIONS ==============
-            arns = supabase.table('arn_alteration').select('*').eq('sample_id', sample_id).execute()
-            
-            if arns.data:
-                st.markdown(f"**🔬 Alteraciones de ARN ({len(arns.data)})**")
+                with col_info:
+                    # Texto más grande
+                    st.markdown(f"### {cnv.gene_name}")
+                    st.markdown(f"**CN:** {cnv.cn:.2f} | **CI:** {cnv.ci}")
+                    st.markdown(f"**Oncomine:** {cnv.oncomine_variant_class}")
+                
+                with col_class:
+                    current_class = cnv.clasificacion_hgua or 'Sin clasificar'
+                    new_class = st.selectbox(
+                        "Clasificación",
+                        clasificaciones,
+                        index=clasificaciones.index(current_class) if current_class in clasificaciones else 0,
+                        key=row_key('class_cnv_', cnv.cnv_id),
+                        label_visibility="collapsed",
+                        on_change=mark_classification,
+                        args=('cnv', cnv, row_key('class_cnv_', cnv.cnv_id))
+                    )
+                
+                with col_btn:
+                    show_report = st.button("📄", key=row_key('report_cnv_', cnv.cnv_id), help="Copiar para informe")
+                
+                with col_save:
+                    if ('cnv', cnv.cnv_id) in pending:
+                        st.markdown("✏️", help="Cambio pendiente de guardar")
+                
+                # Campo para informe - ANCHO COMPLETO DEBAJO
+                if show_report:
+                    report_text = cnv_report(ensure_detail(cnv))
+                    st.text_area(
+                        "📋 Copiar informe (Ctrl+A → Ctrl+C):",
+                        value=report_text,
+                        height=100,
+                        key=row_key('copy_report_cnv_', cnv.cnv_id)
+                    )
                 
-                for arn in arns.data:
-                    with st.container():
-                        col_info, col_class, col_btn, col_save = st.columns([7, 2, 1, 1])
-                        
-                        with col_info:
-                            svtype = arn['svtype'] or 'N/A'
-                            arn_id = arn['id'] or 'N/A'
-                            mol_count = arn['mol_count'] if arn['mol_count'] else 0
-                            read_count = arn['read_count'] if arn['read_count'] else 0
-                            imbalance_score = arn['imbalance_score'] if arn['imbalance_score'] else 0
-                            imbalance_pval = arn['imbalance_pval'] if arn['imbalance_pval'] else 0
-                            
-                            # Texto más grande
-                            st.markdown(f"### {arn_id}")
-                            st.markdown(f"**Type:** {svtype}")
-                            st.markdown(f"**Mol count:** {mol_count} | **Read count:** {read_count}")
-                            st.markdown(f"**Imbalance score:** {imbalance_score:.3f} | **P-value:** {imbalance_pval:.4f}")
-                        
-                        with col_class:
-                            current_class = arn['clasificacion_hgua'] or 'Sin clasificar'
-                            new_class = st.selectbox(
-                                "Clasificación",
-                                clasificaciones,
-                                index=clasificaciones.index(current_class) if current_class in clasificaciones else 0,
-                                key=f"class_arn_{arn['arn_alteration_id']}",
-                                label_visibility="collapsed"
-                            )
-                        
-                        with col_btn:
-                            if st.button("📄", key=f"report_arn_{arn['arn_alteration_id']}", help="Copiar para informe (pendiente)", disabled=True):
-                                st.info("Formato pendiente de definir")
-                        
-                        with col_save:
-                            if st.button("💾", key=f"save_arn_{arn['arn_alteration_id']}", help="Guardar clasificación"):
-                                supabase.table('arn_alteration').update({
-                                    'clasificacion_hgua': new_class
-                                }).eq('arn_alteration_id', arn['arn_alteration_id']).execute()
-                                st.success("✅", icon="✅")
-                        
-                        st.markdown("---")
-            
-            # Separador entre muestras
-            if sample_id != st.session_state["analyzing_samples"][-1]:
                 st.markdown("---")
-                st.markdown("")
+    
+    # ============== ARN ALTERATIONS ==============
+    arns = data['arn_alteration']
+    
+    if arns:
+        st.markdown(f"**🔬 Alteraciones de ARN ({len(arns)})**")
+        
+        for arn in arns:
+            with st.container():
+                col_info, col_class, col_btn, col_save = st.columns([7, 2, 1, 1])
+                
+                with col_info:
+                    # Texto más grande
+                    st.markdown(f"### {arn.id}")
+                    st.markdown(f"**Type:** {arn.svtype}")
+                    st.markdown(f"**Mol count:** {arn.mol_count} | **Read count:** {arn.read_count}")
+                    st.markdown(f"**Imbalance score:** {arn.imbalance_score:.3f} | **P-value:** {arn.imbalance_pval:.4f}")
+                
+                with col_class:
+                    current_class = arn.clasificacion_hgua or 'Sin clasificar'
+                    new_class = st.selectbox(
+                        "Clasificación",
+                        clasificaciones,
+                        index=clasificaciones.index(current_class) if current_class in clasificaciones else 0,
+                        key=row_key('class_arn_', arn.arn_alteration_id),
+                        label_visibility="collapsed",
+                        on_change=mark_classification,
+                        args=('arn_alteration', arn, row_key('class_arn_', arn.arn_alteration_id))
+                    )
+                
+                with col_btn:
+                    if st.button("📄", key=row_key('report_arn_', arn.arn_alteration_id), help="Copiar para informe (pendiente)", disabled=True):
+                        st.info("Formato pendiente de definir")
+                
+                with col_save:
+                    if ('arn_alteration', arn.arn_alteration_id) in pending:
+                        st.markdown("✏️", help="Cambio pendiente de guardar")
+                
+                st.markdown("---")
+
+prune_session_state()
+
+if st.session_state.get('analyzing_samples'):
+    st.markdown("### 🧬 Análisis Molecular")
+    
+    # Guardar de una vez todas las clasificaciones cambiadas (de cualquier muestra)
+    pending = st.session_state.get('pending_classifications')
+    if pending:
+        with st.expander(f"✏️ {len(pending)} cambio(s) pendiente(s)"):
+            for (table, row_id), new_class in pending.items():
+                st.caption(f"{table} {row_id} → {new_class}")
+    if st.button("💾 Guardar todo", key="save_all_classifications", type="primary"):
+        if not st.session_state.get('pending_classifications'):
+            st.info("No hay cambios pendientes")
+        else:
+            written, failed, elapsed = save_pending_classifications()
+            st.success(f"✅ {written} clasificación(es) guardada(s) en {elapsed:.2f} s")
+            if failed:
+                st.error(f"❌ {len(failed)} fila(s) no se pudieron guardar:")
+                for table, row_id, error in failed:
+                    st.caption(f"{table} {row_id}: {error}")
+    
+    # Pre-anotación: todas las mutaciones de todas las muestras, en lotes GraphQL
+    if st.button("🔬 Pre-anotar todas las mutaciones en CIVICdb", type="secondary"):
+        civic_results = st.session_state.setdefault('civic_results', {})
+        molecular_data = load_molecular_data(st.session_state['analyzing_samples'])
+        pares = [pair for data in molecular_data.values() for mut in data['mutation'] for pair in civic_queries(mut)]
+        total = len({civicdb.normalizar_clave(gene, variant) for gene, variant in pares})
+        
+        if total:
+            progress = st.progress(0.0, text="🔍 Buscando en CIVICdb...")
+            log = st.container(height=150)
+            icons = {civicdb.ENCONTRADO: '✅', civicdb.NO_ENCONTRADO: '⚠️', civicdb.ERROR: '❌'}
+            for done, ((gene, variant), consulta) in enumerate(civicdb.buscar_varios(pares), start=1):
+                civic_results[civicdb.normalizar_clave(gene, variant)] = consulta
+                progress.progress(done / total, text=f"🔍 CIVICdb: {done}/{total}")
+                log.caption(f"{icons[consulta.estado]} {gene} {variant}")
+        else:
+            st.info("No hay mutaciones con gen y variante para buscar")
+    
+    # Un panel (fragmento) por muestra; los nombres salen del índice local
+    for sample_id in st.session_state['analyzing_samples']:
+        sample_panel(sample_id, sample_index.name(sample_id) or 'N/A')
+
+# =====================================================
+# PANEL DE DEPURACIÓN
+# =====================================================
+if st.sidebar.toggle("🐞 Depuración", key="debug_panel"):
+    stats = repo.stats()
+    totals = stats.totals()
+    st.sidebar.markdown("**Consultas de este rerun**")
+    st.sidebar.caption(
+        f"{totals['queries']} consulta(s) · {totals['rows']} fila(s) · "
+        f"{totals['bytes'] / 1024:.1f} KB · {totals['seconds'] * 1000:.0f} ms"
+    )
+    if stats.tables:
+        st.sidebar.dataframe(
+            pd.DataFrame(stats.as_rows()).drop(columns='seconds'),
+            hide_index=True,
+            use_container_width=True
+        )
+    
+    if hasattr(repo, 'status'):
+        mirror = repo.status()
+        st.sidebar.markdown("**Réplica local**")
+        if mirror['last_sync']:
+            st.sidebar.caption(f"Última sincronización hace {time.time() - mirror['last_sync']:.0f} s")
+        if mirror['error']:
+            st.sidebar.caption(f"⚠️ {mirror['error']}")
+    
+    st.sidebar.caption(f"Estado de la sesión: {len(st.session_state)} clave(s)")
+    
+    civic_stats = civicdb.obtener_cache().estadisticas()
+    st.sidebar.markdown("**Caché CIVICdb**")
+    st.sidebar.caption(
+        f"{civic_stats['hits']} acierto(s) · {civic_stats['misses']} fallo(s) · "
+        f"{civic_stats['entradas']} entrada(s)"
+    )
+    st.sidebar.caption(
+        f"{civic_stats['obsoletos']} servida(s) caducada(s) · circuito {civicdb.circuito.estado}"
+    )
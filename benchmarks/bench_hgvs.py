@@ -0,0 +1,180 @@
+"""Benchmark de la normalización de variantes para CIViC (variant_names).
+
+    python benchmarks/bench_hgvs.py --rows 200000 [--civic-variants nightly-VariantSummaries.tsv]
+        [--output bench_hgvs.json]
+
+Monta un corpus con notaciones reales de Ion Reporter / ClinVar (códigos de
+tres letras, predicciones entre paréntesis, frameshifts, stops, inserciones,
+sinónimas, splicing y multialélicas) repetidas como en una cohorte, y
+compara la limpieza anterior (`protein[2:]` sin paréntesis) con
+`variant_names`: claves distintas, búsquedas inútiles (sinónimas) y tiempo
+en frío y con la memoización caliente.
+
+Los aciertos sólo se miden con `--civic-variants` (el volcado nightly de
+CIViC, el mismo que importa civic_snapshot.py): fracción de filas cuyo
+nombre coincide con el nombre o un alias de una variante real de CIViC,
+cada método con su propia normalización de claves. No hay nombres
+esperados escritos a mano.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import variant_names  # noqa: E402
+from civic_cache import normalizar_clave  # noqa: E402
+from civic_snapshot import GENE_COLUMNS, _columna, _leer_tsv  # noqa: E402
+
+# (gen, protein, coding, si hay algo que buscar: False en las sinónimas)
+CORPUS = [
+    ('BRAF', 'p.Val600Glu', 'c.1799T>A', True),
+    ('BRAF', 'p.(Val600Glu)', 'c.1799T>A', True),
+    ('BRAF', 'p.V600E', 'c.1799T>A', True),
+    ('BRAF', 'p.Val600Lys', 'c.1798_1799delinsAA', True),
+    ('BRAF', 'p.Gly469Ala', 'c.1406G>C', True),
+    ('KRAS', 'p.Gly12Cys', 'c.34G>T', True),
+    ('KRAS', 'p.Gly12Asp', 'c.35G>A', True),
+    ('KRAS', 'p.Gly12Asp,p.Gly12Val', 'c.35G>A,c.35G>T', True),
+    ('KRAS', 'p.Gly13Asp', 'c.38G>A', True),
+    ('KRAS', 'p.Gln61His', 'c.183A>C', True),
+    ('NRAS', 'p.Gln61Lys', 'c.181C>A', True),
+    ('NRAS', 'p.(Gln61Arg)', 'c.182A>G', True),
+    ('EGFR', 'p.Leu858Arg', 'c.2573T>G', True),
+    ('EGFR', 'p.Thr790Met', 'c.2369C>T', True),
+    ('EGFR', 'p.Glu746_Ala750del', 'c.2235_2249del', True),
+    ('EGFR', 'p.Leu747_Pro753delinsSer', 'c.2240_2257del', True),
+    ('EGFR', 'p.Ala767_Val769dup', 'c.2300_2308dup', True),
+    ('EGFR', 'p.Ala763_Tyr764insPheGlnGluAla', 'c.2290_2291insTCCAGGAAGCCT', True),
+    ('EGFR', 'p.Cys797Ser', 'c.2390G>C', True),
+    ('PIK3CA', 'p.Glu545Lys', 'c.1633G>A', True),
+    ('PIK3CA', 'p.His1047Arg', 'c.3140A>G', True),
+    ('PIK3CA', 'p.(His1047Leu)', 'c.3140A>T', True),
+    ('TP53', 'p.Arg175His', 'c.524G>A', True),
+    ('TP53', 'p.Arg248Gln', 'c.743G>A', True),
+    ('TP53', 'p.Arg273Cys', 'c.817C>T', True),
+    ('TP53', 'p.Arg213Ter', 'c.637C>T', True),
+    ('TP53', 'p.Arg213*', 'c.637C>T', True),
+    ('TP53', 'p.Arg306Ter', 'c.916C>T', True),
+    ('TP53', 'p.Pro72Arg', 'c.215C>G', True),
+    ('TP53', 'p.(Pro72=)', 'c.216C>T', False),
+    ('TP53', 'p.?', 'c.375+1G>A', True),
+    ('TP53', 'p.?', 'c.673-2A>G', True),
+    ('APC', 'p.Arg1450Ter', 'c.4348C>T', True),
+    ('APC', 'p.(Glu1309AspfsTer4)', 'c.3927_3931del', True),
+    ('APC', 'p.Thr1556fs*3', 'c.4666dup', True),
+    ('BRCA1', 'p.(Glu23ValfsTer17)', 'c.68_69del', True),
+    ('BRCA2', 'p.Ser1982ArgfsTer22', 'c.5946del', True),
+    ('PTEN', 'p.Arg130Ter', 'c.388C>T', True),
+    ('PTEN', 'p.(=)', 'c.1026A>G', False),
+    ('IDH1', 'p.Arg132His', 'c.395G>A', True),
+    ('IDH2', 'p.Arg140Gln', 'c.419G>A', True),
+    ('KIT', 'p.Leu576Pro', 'c.1727T>C', True),
+    ('KIT', 'p.Asp816Val', 'c.2447A>T', True),
+    ('KIT', 'p.Trp557_Lys558del', 'c.1669_1674del', True),
+    ('MET', 'p.?', 'c.3028+1G>A', True),
+    ('MET', 'p.?', 'c.3082+2T>C', True),
+    ('ERBB2', 'p.Tyr772_Ala775dup', 'c.2313_2324dup', True),
+    ('ERBB2', 'p.Ser310Phe', 'c.929C>T', True),
+    ('FGFR3', 'p.Ser249Cys', 'c.746C>G', True),
+    ('CTNNB1', 'p.Ser45del', 'c.133_135del', True),
+    ('NOTCH1', 'p.Met1?', 'c.2T>C', True),
+    ('SMAD4', 'p.Ter553GlnextTer17', 'c.1657T>C', True),
+    ('ESR1', 'p.Tyr537Ser', 'c.1610A>C', True),
+    ('POLE', 'p.Pro286Arg', 'c.857C>G', True),
+]
+
+
+def naive(protein):
+    """Limpieza anterior de civic_query"""
+    if protein and protein.startswith('p.'):
+        return protein[2:].replace('(', '').replace(')', '').strip()
+    return protein
+
+
+def old_key(gene, variant):
+    """normalizar_clave anterior (sólo espacios y mayúsculas)"""
+    return f"{' '.join((gene or '').split()).upper()}:{' '.join((variant or '').split()).upper()}"
+
+
+def civic_pairs(path):
+    """(gen, nombre) de cada variante del volcado de CIViC y de cada uno de sus alias"""
+    pairs = set()
+    for row in _leer_tsv(path):
+        gene = _columna(row, GENE_COLUMNS)
+        if not gene:
+            continue
+        for name in [row.get('variant', ''), *(row.get('variant_aliases') or '').split(',')]:
+            if name.strip():
+                pairs.add((gene, name.strip()))
+    return pairs
+
+
+def evaluate(rows, name_of, key=normalizar_clave, civic=None):
+    """Claves distintas, búsquedas inútiles, segundos y, con `civic` (pares de civic_pairs),
+    aciertos contra los nombres reales de CIViC"""
+    start = time.perf_counter()
+    names = name_of(rows)
+    seconds = time.perf_counter() - start
+
+    known = {key(gene, name) for gene, name in civic} if civic is not None else None
+    keys = set()
+    hits = wasted = 0
+    for (gene, _, _, searchable), name in zip(rows, names):
+        if name:
+            keys.add(key(gene, name))
+        if not searchable:
+            wasted += bool(name)
+        elif known is not None and name and key(gene, name) in known:
+            hits += 1
+    result = {
+        'seconds': round(seconds, 4),
+        'rows_per_s': round(len(rows) / seconds) if seconds else None,
+        'distinct_keys': len(keys),
+        'wasted_lookups': wasted,
+    }
+    if known is not None:
+        result['civic_hit_rate'] = round(hits / sum(1 for row in rows if row[3]), 4)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de variant_names")
+    parser.add_argument('--rows', type=int, default=200_000, help="Mutaciones del corpus")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--civic-variants', help="nightly-VariantSummaries.tsv de CIViC (para medir aciertos)")
+    parser.add_argument('--output', help="Fichero JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Frecuencias tipo cohorte: unos pocos hotspots concentran la mayoría de filas
+    weights = [1 / (rank + 1) for rank in range(len(CORPUS))]
+    rows = rng.choices(CORPUS, weights=weights, k=args.rows)
+
+    def old(rows):
+        return [naive(protein) for _, protein, _, _ in rows]
+
+    def new(rows):
+        return variant_names.civic_names([row[1] for row in rows], [row[2] for row in rows])
+
+    variant_names.civic_variants.cache_clear()
+    variant_names.canonical_variant.cache_clear()
+    civic = civic_pairs(args.civic_variants) if args.civic_variants else None
+    results = {
+        'anterior': evaluate(rows, old, key=old_key, civic=civic),
+        'variant_names_frio': evaluate(rows, new, civic=civic),
+        'variant_names_memoizado': evaluate(rows, new, civic=civic),
+        'memo': variant_names.civic_variants.cache_info()._asdict(),
+    }
+
+    output = json.dumps({'rows': args.rows, 'notations': len(CORPUS), 'results': results}, indent=2,
+                        ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
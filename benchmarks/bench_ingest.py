@@ -0,0 +1,106 @@
+"""Benchmark de carga de una carrera de Ion Reporter (oncomine_import).
+
+    python benchmarks/bench_ingest.py --samples 96 --mutations 40 [--output bench_ingest.json]
+
+Escribe VCFs sintéticos con el formato de Ion Reporter (FUNC, CNV, fusiones,
+QC en cabecera) y mide la carga en un SQLite vacío, la recarga (todas las
+muestras omitidas) y la recarga con --reemplazar.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import oncomine_import  # noqa: E402
+import repository  # noqa: E402
+from synthetic_data import CNV_GENES, FUSIONS, HOTSPOTS  # noqa: E402
+
+
+def write_vcf(path, name, rng, mutations, cnvs, arns):
+    date = datetime.date(2025, 1, 1) + datetime.timedelta(days=rng.randint(0, 300))
+    lines = [
+        "##fileformat=VCFv4.1",
+        f"##fileDate={date:%Y%m%d}",
+        "##IonReporterWorkflowName=Oncomine Focus - 520 - w2.7 - DNA and Fusions - Single Sample",
+        f"##mapd={rng.uniform(0.1, 0.6):.3f}",
+        f"##median_reads_per_amplicon={rng.randint(300, 3000)}",
+        f"##uniformity_of_base_coverage={rng.uniform(85, 100):.2f}",
+        f"##fusion_qc={'PASS' if rng.random() > 0.1 else 'FAIL'}, mapped reads {rng.randint(50000, 900000)}",
+        "\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT", name]),
+    ]
+    for _ in range(mutations):
+        gene, chrom, transcript, changes = rng.choice(HOTSPOTS)
+        exon, coding, protein = rng.choice(changes)
+        func = [{'gene': gene, 'transcript': transcript, 'exon': exon, 'coding': coding, 'protein': protein,
+                 'function': 'missense', 'location': 'exonic', 'origAlt': 'T', 'oncomineVariantClass': 'Hotspot'}]
+        info = f"AF={rng.uniform(0.02, 0.6):.4f};FDP={rng.randint(100, 3000)};TYPE=snp;FUNC={func}"
+        lines.append("\t".join([chrom, str(rng.randint(1, 200_000_000)), ".", "A", "T", "500", "PASS", info,
+                                "GT:GQ", "0/1:99"]))
+    for _ in range(cnvs):
+        pos = rng.randint(1, 200_000_000)
+        cn = rng.uniform(4, 20)
+        func = [{'gene': rng.choice(CNV_GENES), 'oncomineVariantClass': 'Amplification'}]
+        info = f"END={pos + 100000};CI=0.05:{cn * 0.8:.2f},0.95:{cn * 1.2:.2f};FUNC={func}"
+        lines.append("\t".join([f"chr{rng.randint(1, 22)}", str(pos), ".", "G", "<CNV>", "100", "GAIN", info,
+                                "GT:CN", f"./.:{cn:.2f}"]))
+    for _ in range(arns):
+        fusion = rng.choice(FUSIONS)
+        for end in (1, 2):
+            info = f"SVTYPE=Fusion;READ_COUNT={rng.randint(20, 20000)};MOL_COUNT={rng.randint(5, 2000)}"
+            lines.append("\t".join(["chr2", str(rng.randint(1, 200_000_000)), f"{fusion}_{end}", "N", "N[chr2:1[",
+                                    ".", "PASS", info, "GT", "1/1"]))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def measure(name, run):
+    before = repository.GLOBAL_STATS.totals()
+    resumen = run()
+    after = repository.GLOBAL_STATS.totals()
+    return {
+        'scenario': name,
+        'wall_s': round(resumen['segundos'], 4),
+        'samples': resumen['muestras'],
+        'skipped': len(resumen['omitidas']),
+        'rows': sum(resumen['filas'].values()),
+        'queries': after['queries'] - before['queries'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de oncomine_import")
+    parser.add_argument('--samples', type=int, default=96, help="Muestras de la carrera")
+    parser.add_argument('--mutations', type=int, default=40, help="Mutaciones por muestra")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Fichero JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix='genomica_ingest_')
+    paths = []
+    for i in range(args.samples):
+        name = f"25B{i + 1:05d}"
+        paths.append(os.path.join(workdir, f"{name}_v1_{name}_RNA_v1_Non-Filtered.vcf"))
+        write_vcf(paths[-1], name, rng, args.mutations, 4, 2)
+
+    repo = repository.SQLiteRepository(os.path.join(workdir, 'ingest.sqlite'))
+    results = [
+        measure('carga', lambda: oncomine_import.importar(repo, paths)),
+        measure('recarga_omitida', lambda: oncomine_import.importar(repo, paths)),
+        measure('recarga_reemplazar', lambda: oncomine_import.importar(repo, paths, reemplazar=True)),
+    ]
+
+    output = json.dumps({'samples': args.samples, 'mutations_per_sample': args.mutations, 'results': results},
+                        indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
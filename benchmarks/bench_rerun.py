@@ -0,0 +1,157 @@
+"""Benchmark de latencia de rerun de app.py con datos sintéticos.
+
+    python benchmarks/bench_rerun.py --samples 10 40 --db-samples 2000 --output bench.json
+
+Ejecuta la aplicación sin navegador (streamlit.testing AppTest) contra una
+base SQLite sintética y mide, por escenario, el tiempo de pared, las
+consultas a la base de datos (repository.GLOBAL_STATS) y el pico de memoria
+(tracemalloc). La salida JSON incluye el commit para comparar regresiones.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import repository  # noqa: E402
+from synthetic_data import generate  # noqa: E402
+
+# Bytes exactos de cada consulta, no la estimación de la aplicación
+repository.MEASURE_BYTES = True
+
+APP_PATH = os.path.join(ROOT, 'app.py')
+
+
+def _click(at, label_prefix):
+    for button in at.button:
+        if button.label.startswith(label_prefix):
+            return button.click()
+    raise KeyError(f"No hay botón '{label_prefix}'")
+
+
+def _measure(name, n_samples, step):
+    """Ejecuta `step()` (que hace un rerun) y devuelve sus métricas"""
+    before = repository.GLOBAL_STATS.totals()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    at = step()
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    after = repository.GLOBAL_STATS.totals()
+
+    if at.exception:
+        raise RuntimeError(f"{name}: {at.exception[0].value}")
+
+    return {
+        'scenario': name,
+        'selected_samples': n_samples,
+        'wall_s': round(wall, 4),
+        'queries': after['queries'] - before['queries'],
+        'rows': after['rows'] - before['rows'],
+        'bytes': after['bytes'] - before['bytes'],
+        'db_s': round(after['seconds'] - before['seconds'], 4),
+        'peak_mb': round(peak / 1024 / 1024, 2),
+    }
+
+
+def run_scenarios(db_path, n_samples, timeout=120):
+    """Recorre los escenarios con una sesión nueva y cachés vacías"""
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    results = [_measure('carga_inicial', 0, at.run)]
+
+    sample_ids = [row['sample_id'] for row in repository.SQLiteRepository(db_path).list_sample_names()][:n_samples]
+
+    def select():
+        at.session_state['selected_samples'] = dict.fromkeys(sample_ids)
+        return at.run()
+
+    results.append(_measure('seleccionar_muestras', n_samples, select))
+    results.append(_measure('abrir_calidad', n_samples, lambda: _click(at, "📊").run()))
+    results.append(_measure('abrir_analisis_molecular', n_samples, lambda: _click(at, "🧬 Análisis").run()))
+
+    def expand():
+        for sample_id in sample_ids:
+            at.toggle(key=f"open_sample_{sample_id}").set_value(True)
+        return at.run()
+
+    results.append(_measure('desplegar_muestras', n_samples, expand))
+    results.append(_measure('rerun_sin_cambios', n_samples, at.run))
+
+    mutation_keys = [sb.key for sb in at.selectbox if sb.key and sb.key.startswith('class_mut_')]
+    if mutation_keys:
+        def save():
+            selectbox = at.selectbox(key=mutation_keys[0])
+            selectbox.set_value(next(o for o in selectbox.options if o != selectbox.value)).run()
+            return _click(at, "💾 Guardar todo").run()
+
+        results.append(_measure('guardar_clasificacion', n_samples, save))
+
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de rerun de app.py")
+    parser.add_argument('--samples', type=int, nargs='+', default=[1, 10, 40], help="Muestras seleccionadas por escenario")
+    parser.add_argument('--db-samples', type=int, default=2000, help="Muestras en la base sintética")
+    parser.add_argument('--mutations', type=int, default=10, help="Media de mutaciones por muestra")
+    parser.add_argument('--db', help="SQLite ya generado (si no, se genera uno temporal)")
+    parser.add_argument('--output', help="Fichero JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='genomica_bench_')
+    db_path = args.db or os.path.join(workdir, 'bench.sqlite')
+    if not args.db:
+        generate(db_path, args.db_samples, args.mutations)
+
+    os.environ.update({
+        'DB_BACKEND': 'sqlite',
+        'SQLITE_PATH': db_path,
+        # Sin red ni cachés compartidas con la instalación real
+        'CIVIC_CACHE_PATH': os.path.join(workdir, 'civic_cache.sqlite'),
+        'CIVIC_SNAPSHOT_PATH': os.path.join(workdir, 'civic_snapshot.sqlite'),
+    })
+
+    tracemalloc.start()
+    results = []
+    for n in args.samples:
+        results.extend(run_scenarios(db_path, n))
+    tracemalloc.stop()
+
+    report = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'streamlit': st.__version__,
+        'db_samples': args.db_samples,
+        'mutations_per_sample': args.mutations,
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
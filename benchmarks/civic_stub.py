@@ -0,0 +1,184 @@
+"""Servidor local que imita la API GraphQL de CIVICdb, con fallos inyectables.
+
+    python benchmarks/civic_stub.py [--output bench_civic.json]
+
+Como script, mide la latencia que ve el usuario en `civicdb.buscar`
+(p50/p95/máx) con el servidor sano, con errores 500 intermitentes, con una
+caída lenta (timeouts) y sirviendo caducadas durante la caída. También se
+puede usar desde otro script:
+
+    with StubCivic(modo='error', probabilidad=0.5) as stub:
+        civicdb.API_URL = stub.url
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Variantes que "existen" en el stub (el resto devuelve nodes vacío)
+VARIANTES = {('BRAF', 'V600E'), ('KRAS', 'G12C'), ('EGFR', 'L858R'), ('PIK3CA', 'H1047R')}
+
+
+class StubCivic:
+    """Servidor HTTP en un puerto libre de localhost.
+
+    modo: 'ok', 'error' (HTTP 500), 'rechazo' (HTTP 400) o 'lento' (tarda
+    `retardo` s); el fallo se
+    aplica con `probabilidad`. Las peticiones que piden alguna variante de
+    `variantes_con_error` fallan siempre con HTTP 500 (fallos parciales en
+    lotes). `peticiones` cuenta las recibidas.
+    """
+
+    def __init__(self, modo='ok', probabilidad=1.0, retardo=5.0, seed=0, variantes_con_error=()):
+        self.modo = modo
+        self.variantes_con_error = {v.upper() for v in variantes_con_error}
+        self.probabilidad = probabilidad
+        self.retardo = retardo
+        self.peticiones = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/api/graphql"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub._lock:
+                    stub.peticiones += 1
+                    falla = stub.modo != 'ok' and stub._rng.random() < stub.probabilidad
+
+                if falla and stub.modo == 'lento':
+                    time.sleep(stub.retardo)
+                variables = body.get('variables', {})
+                pedidas = {str(v).upper() for name, v in variables.items() if name.startswith('variant')}
+                if (falla and stub.modo == 'error') or pedidas & stub.variantes_con_error:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                if falla and stub.modo == 'rechazo':
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+
+                data = {}
+                for name in re.findall(r'(v\d+): variants', body.get('query', '')):
+                    i = name[1:]
+                    gene, variant = variables.get(f'gene{i}', ''), variables.get(f'variant{i}', '')
+                    nodes = []
+                    if (gene.upper(), variant.upper()) in VARIANTES:
+                        nodes.append({
+                            'name': variant,
+                            'link': f'/variants/{abs(hash((gene, variant))) % 10000}',
+                            'molecularProfiles': {'nodes': [{'evidenceItems': {'nodes': [{
+                                'evidenceLevel': 'A', 'significance': 'SENSITIVITY',
+                                'description': f'{gene} {variant} stub', 'therapies': {'nodes': [{'name': 'Stubinib'}]},
+                            }]}}]},
+                        })
+                    data[name] = {'nodes': nodes}
+
+                payload = json.dumps({'data': data}).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # El cliente ya se ha ido por timeout
+                    pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _percentiles(latencias):
+    latencias = sorted(latencias)
+    return {
+        'p50_s': round(statistics.median(latencias), 3),
+        'p95_s': round(latencias[int(0.95 * (len(latencias) - 1))], 3),
+        'max_s': round(latencias[-1], 3),
+    }
+
+
+def escenario(civicdb, nombre, stub, pares):
+    """Busca cada par una vez y resume latencias y estados"""
+    civicdb.API_URL = stub.url
+    latencias, estados = [], {}
+    for gene, variant in pares:
+        start = time.perf_counter()
+        consulta = civicdb.buscar(gene, variant)
+        latencias.append(time.perf_counter() - start)
+        estados[consulta.estado] = estados.get(consulta.estado, 0) + 1
+    return {'scenario': nombre, 'busquedas': len(pares), 'peticiones': stub.peticiones, 'estados': estados,
+            'circuito': civicdb.circuito.estado, **_percentiles(latencias)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Latencia de civicdb.buscar con fallos inyectados")
+    parser.add_argument('--busquedas', type=int, default=40)
+    parser.add_argument('--timeout', type=float, default=1.0, help="civicdb.TIMEOUT durante la prueba")
+    parser.add_argument('--output', help="Fichero JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='genomica_civic_')
+    os.environ['CIVIC_CACHE_PATH'] = os.path.join(workdir, 'civic_cache.sqlite')
+    os.environ['CIVIC_SNAPSHOT_PATH'] = os.path.join(workdir, 'civic_snapshot.sqlite')
+    import civicdb  # noqa: E402
+
+    civicdb.TIMEOUT = args.timeout
+    civicdb.PRESUPUESTO = 3 * args.timeout
+    civicdb.circuito.enfriamiento = 5.0
+    genes = ['BRAF', 'KRAS', 'EGFR', 'PIK3CA', 'TP53', 'NRAS']
+
+    rng = random.Random(0)
+
+    def pares(prefijo):
+        # Unas cuantas variantes que existen y el resto inventadas
+        return sorted(VARIANTES) + [(rng.choice(genes), f"{prefijo}{i}") for i in range(args.busquedas)]
+
+    conocidos = pares('A')
+    results = []
+    with StubCivic('ok') as stub:
+        results.append(escenario(civicdb, 'sano', stub, conocidos))
+    with StubCivic('error', probabilidad=0.3) as stub:
+        results.append(escenario(civicdb, 'errores_30pct', stub, pares('B')))
+    civicdb.circuito.exito()
+    with StubCivic('lento', retardo=3 * args.timeout) as stub:
+        results.append(escenario(civicdb, 'caida_lenta', stub, pares('C')))
+
+    # Caída con la caché caducada: se sirve lo guardado sin esperar
+    civicdb.obtener_cache().ttl = civicdb.obtener_cache().negative_ttl = 0
+    civicdb.circuito.exito()
+    with StubCivic('error') as stub:
+        results.append(escenario(civicdb, 'caida_con_cache_caducada', stub, conocidos))
+
+    output = json.dumps({'timeout_s': args.timeout, 'results': results}, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
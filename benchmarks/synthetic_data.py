@@ -0,0 +1,113 @@
+"""Datos genómicos sintéticos en el esquema de la aplicación (backend SQLite).
+
+    python benchmarks/synthetic_data.py genomica_bench.sqlite --samples 1000 --mutations 15
+
+Genera muestras con nombres [Año][Tipo][Número], QC de ADN/ARN, mutaciones,
+CNVs y alteraciones de ARN con valores plausibles. Con la misma semilla el
+resultado es idéntico, para poder comparar benchmarks entre commits.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repository import SQLiteRepository  # noqa: E402
+
+SAMPLE_TYPES = ['B', 'P', 'C', 'M']
+WORKFLOWS = ['Oncomine Focus DNA and Fusions', 'Oncomine Comprehensive Plus', 'Oncomine Precision Assay']
+CLASSIFICATIONS = [None, None, None, 'VUS', 'Benigna', 'Patogénica', 'Probablemente patogénica']
+
+# (gen, cromosoma, transcrito, [(exón, coding, protein)])
+HOTSPOTS = [
+    ('BRAF', 'chr7', 'NM_004333.6', [('15', 'c.1799T>A', 'p.Val600Glu'), ('11', 'c.1406G>C', 'p.Gly469Ala')]),
+    ('KRAS', 'chr12', 'NM_004985.5', [('2', 'c.34G>T', 'p.Gly12Cys'), ('2', 'c.35G>A', 'p.Gly12Asp'), ('3', 'c.182A>G', 'p.Gln61Arg')]),
+    ('EGFR', 'chr7', 'NM_005228.5', [('21', 'c.2573T>G', 'p.Leu858Arg'), ('20', 'c.2369C>T', 'p.Thr790Met'),
+                                     ('19', 'c.2235_2249del', 'p.Glu746_Ala750del')]),
+    ('PIK3CA', 'chr3', 'NM_006218.4', [('10', 'c.1633G>A', 'p.Glu545Lys'), ('21', 'c.3140A>G', 'p.His1047Arg')]),
+    ('TP53', 'chr17', 'NM_000546.6', [('5', 'c.524G>A', 'p.Arg175His'), ('7', 'c.743G>A', 'p.Arg248Gln'),
+                                      ('8', 'c.817C>T', 'p.Arg273Cys'), ('4', 'c.215C>G', 'p.Pro72Arg')]),
+    ('NRAS', 'chr1', 'NM_002524.5', [('3', 'c.181C>A', 'p.Gln61Lys')]),
+    ('IDH1', 'chr2', 'NM_005896.4', [('4', 'c.395G>A', 'p.Arg132His')]),
+    ('KIT', 'chr4', 'NM_000222.3', [('11', 'c.1727T>C', 'p.Leu576Pro'), ('17', 'c.2447A>T', 'p.Asp816Val')]),
+]
+CNV_GENES = ['MET', 'ERBB2', 'EGFR', 'MYC', 'CDK4', 'MDM2', 'CCND1', 'FGFR1', 'CDKN2A']
+FUSIONS = ['EML4-ALK.E13A20', 'KIF5B-RET.K15R12', 'CD74-ROS1.C6R34', 'TPM3-NTRK1.T7N10', 'MET-MET.M13M15']
+
+
+def generate(path, n_samples=500, mutations=10, cnvs=2, arns=1, seed=42):
+    """Crea (o vacía) el SQLite en `path` y lo llena. Devuelve el repositorio"""
+    rng = random.Random(seed)
+    repo = SQLiteRepository(path)
+    conn = repo.connect()
+    start_date = datetime.date(2021, 1, 1)
+
+    samples, adn_qc, arn_qc, mutation_rows, cnv_rows, arn_rows = [], [], [], [], [], []
+    for sample_id in range(1, n_samples + 1):
+        date = start_date + datetime.timedelta(days=sample_id * 1500 // max(n_samples, 1))
+        name = f"{date.year % 100:02d}{rng.choice(SAMPLE_TYPES)}{rng.randint(1, 99999):05d}"
+        samples.append((sample_id, name, date.isoformat(), rng.choice(WORKFLOWS)))
+
+        adn_qc.append((sample_id, rng.uniform(300, 3000), rng.uniform(85, 100), rng.uniform(0.1, 0.6)))
+        arn_qc.append((sample_id, f"{'PASS' if rng.random() > 0.1 else 'FAIL'}, mapped reads {rng.randint(50000, 900000)}"))
+
+        for _ in range(rng.randint(0, 2 * mutations)):
+            gene, chrom, transcript, changes = rng.choice(HOTSPOTS)
+            exon, coding, protein = rng.choice(changes)
+            mutation_rows.append((
+                sample_id, gene, chrom, rng.randint(1, 2_000_000_00), transcript, exon, coding, protein,
+                rng.uniform(0.02, 0.6), rng.randint(100, 3000), 'SNV', 'missense', 'exonic',
+                rng.choice(['Hotspot', 'Deleterious', None]), rng.choice(CLASSIFICATIONS)
+            ))
+        for _ in range(rng.randint(0, 2 * cnvs)):
+            pos = rng.randint(1, 2_000_000_00)
+            cn = rng.choice([rng.uniform(0, 1.5), rng.uniform(4, 20)])
+            cnv_rows.append((
+                sample_id, rng.choice(CNV_GENES), f"chr{rng.randint(1, 22)}", pos, pos + rng.randint(1000, 500000),
+                cn, f"{cn * 0.8:.2f}-{cn * 1.2:.2f}", 'Amplification' if cn > 2 else 'Deletion', rng.choice(CLASSIFICATIONS)
+            ))
+        for _ in range(rng.randint(0, 2 * arns)):
+            arn_rows.append((
+                sample_id, rng.choice(FUSIONS), 'Fusion', rng.randint(5, 2000), rng.randint(20, 20000),
+                rng.uniform(0, 1), rng.uniform(0, 0.05), 'Fusion', rng.choice(CLASSIFICATIONS)
+            ))
+
+    with conn:
+        for table in ('arn_alteration', 'cnv', 'mutation', 'sample_arn_qc', 'sample_adn_qc', 'sample'):
+            conn.execute(f"DELETE FROM {table}")
+        conn.executemany("INSERT INTO sample VALUES (?, ?, ?, ?)", samples)
+        conn.executemany(
+            "INSERT INTO sample_adn_qc (sample_id, median_reads_per_amplicon, uniformity_of_base_coverage, mapd) "
+            "VALUES (?, ?, ?, ?)", adn_qc
+        )
+        conn.executemany("INSERT INTO sample_arn_qc (sample_id, fusion_qc) VALUES (?, ?)", arn_qc)
+        conn.executemany(
+            "INSERT INTO mutation (sample_id, gene, chrom, pos, transcript, exon, coding, protein, af, dp, type, "
+            "function, location, oncomine_variant_class, clasificacion_hgua) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", mutation_rows
+        )
+        conn.executemany(
+            "INSERT INTO cnv (sample_id, gene_name, chrom, pos, end_pos, cn, ci, oncomine_variant_class, "
+            "clasificacion_hgua) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", cnv_rows
+        )
+        conn.executemany(
+            "INSERT INTO arn_alteration (sample_id, id, svtype, mol_count, read_count, imbalance_score, "
+            "imbalance_pval, oncomine_variant_class, clasificacion_hgua) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", arn_rows
+        )
+    return repo
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera una base de datos SQLite sintética")
+    parser.add_argument('path')
+    parser.add_argument('--samples', type=int, default=500)
+    parser.add_argument('--mutations', type=int, default=10, help="Media de mutaciones por muestra")
+    parser.add_argument('--cnvs', type=int, default=2, help="Media de CNVs por muestra")
+    parser.add_argument('--arns', type=int, default=1, help="Media de alteraciones de ARN por muestra")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    generate(args.path, args.samples, args.mutations, args.cnvs, args.arns, args.seed)
+    print(f"✅ {args.samples} muestras sintéticas en {args.path}")
@@ -0,0 +1,159 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from variant_names import canonical_variant
+
+# Configuración (variables de entorno para poder ajustarla por nodo)
+DEFAULT_PATH = os.environ.get(
+    "CIVIC_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "genomica-hgua", "civic.sqlite")
+)
+DEFAULT_TTL = float(os.environ.get("CIVIC_CACHE_TTL", 7 * 24 * 3600))          # 7 días
+DEFAULT_NEGATIVE_TTL = float(os.environ.get("CIVIC_CACHE_NEGATIVE_TTL", 24 * 3600))  # 1 día
+DEFAULT_MAX_ENTRIES = int(os.environ.get("CIVIC_CACHE_MAX_ENTRIES", 5000))
+# Hasta cuándo se puede servir una entrada caducada mientras se revalida
+DEFAULT_STALE_TTL = float(os.environ.get("CIVIC_CACHE_STALE_TTL", 30 * 24 * 3600))  # 30 días
+
+
+def normalizar_clave(gene, variant):
+    """Clave única gen/variante: 'braf', ' v600e ' o 'p.Val600Glu' → 'BRAF:V600E'"""
+    gene = " ".join((gene or "").split()).upper()
+    variant = canonical_variant(" ".join((variant or "").split()).upper()).upper()
+    return f"{gene}:{variant}"
+
+
+class CacheCivic:
+    """Caché persistente (SQLite) de resultados de CIVICdb.
+
+    Compartida por todas las sesiones de Streamlit del nodo y por los
+    reinicios del proceso. Guarda también los "no encontrado" (con un TTL
+    más corto) y expulsa las entradas menos usadas cuando supera el tamaño.
+    Las entradas caducadas se conservan hasta `stale_ttl` para poder
+    servirlas mientras se revalidan (`get_entrada`); los "no encontrado"
+    no, porque la variante puede haberse añadido a CIVICdb entretanto.
+    `reloj` permite fijar el tiempo en las pruebas.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 stale_ttl=DEFAULT_STALE_TTL, reloj=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self.reloj = reloj
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Con ':memory:' cada conexión sería una base distinta: se reutiliza una
+        self._memory_conn = sqlite3.connect(path, check_same_thread=False) if path == ":memory:" else None
+
+        with self._connect() as conn:
+            if self._memory_conn is None:
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS civic_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_civic_cache_accessed ON civic_cache(accessed)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Conexión con commit automático (una por operación, válida entre hilos)"""
+        conn = self._memory_conn or sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            if conn is not self._memory_conn:
+                conn.close()
+
+    def get(self, gene, variant):
+        """Devuelve (encontrado_en_cache, resultado). resultado None = variante no existe en CIVICdb"""
+        encontrado, resultado, vigente = self.get_entrada(gene, variant)
+        if encontrado and vigente:
+            return True, resultado
+        return False, None
+
+    def get_entrada(self, gene, variant):
+        """Devuelve (encontrado, resultado, vigente); vigente False = caducada pero aún servible"""
+        key = normalizar_clave(gene, variant)
+        now = self.reloj()
+
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created FROM civic_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None:
+                value, created = row
+                if value is not None:
+                    ttl, servible = self.ttl, max(self.ttl, self.stale_ttl)
+                else:
+                    ttl = servible = self.negative_ttl
+                age = now - created
+                if age <= servible:
+                    conn.execute("UPDATE civic_cache SET accessed = ? WHERE key = ?", (now, key))
+                    if age <= ttl:
+                        self.hits += 1
+                    else:
+                        self.stale_hits += 1
+                    return True, json.loads(value) if value is not None else None, age <= ttl
+                conn.execute("DELETE FROM civic_cache WHERE key = ?", (key,))
+
+            self.misses += 1
+            return False, None, False
+
+    def set(self, gene, variant, resultado):
+        """Guarda un resultado (None = no encontrado) y aplica la expulsión LRU"""
+        key = normalizar_clave(gene, variant)
+        now = self.reloj()
+        value = json.dumps(resultado, ensure_ascii=False) if resultado is not None else None
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO civic_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            conn.execute("""
+                DELETE FROM civic_cache WHERE key IN (
+                    SELECT key FROM civic_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def clear(self):
+        """Vacía la caché y reinicia los contadores"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM civic_cache")
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def estadisticas(self):
+        """Aciertos, fallos y número de entradas guardadas"""
+        with self._lock, self._connect() as conn:
+            entries, negatives = conn.execute(
+                "SELECT COUNT(*), COUNT(*) - COUNT(value) FROM civic_cache"
+            ).fetchone()
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'obsoletos': self.stale_hits,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entradas': entries,
+            'no_encontrados': negatives,
+        }
@@ -0,0 +1,260 @@
+"""Índice local del volcado periódico de CIViC (nightly TSV).
+
+Importar (una vez por volcado):
+
+    python civic_snapshot.py nightly-VariantSummaries.tsv nightly-ClinicalEvidenceSummaries.tsv \\
+        [--profiles nightly-MolecularProfileSummaries.tsv] [--db ruta.sqlite]
+
+Después `civicdb.buscar` resuelve desde este índice sin salir a la red.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from civic_cache import normalizar_clave
+
+DEFAULT_PATH = os.environ.get(
+    "CIVIC_SNAPSHOT_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "genomica-hgua", "civic_snapshot.sqlite")
+)
+
+# Los nombres de columna han cambiado entre versiones del volcado
+GENE_COLUMNS = ('gene', 'feature_name')
+THERAPY_COLUMNS = ('therapies', 'drugs')
+SIGNIFICANCE_COLUMNS = ('significance', 'clinical_significance')
+
+# Orden de prioridad de los niveles de evidencia (A = validado)
+LEVEL_ORDER = {'A': 0, 'B': 1, 'C': 2, 'D': 3, 'E': 4}
+
+MAX_EVIDENCIAS = 5
+MAX_DESCRIPCION = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS variant (
+    variant_id INTEGER PRIMARY KEY,
+    gene TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    key TEXT NOT NULL,
+    url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_variant_key ON variant(key);
+
+-- Otros nombres de la variante en CIViC (VAL600GLU, rs...), ya normalizados
+CREATE TABLE IF NOT EXISTS variant_alias (
+    key TEXT NOT NULL,
+    variant_id INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS evidence (
+    evidence_id INTEGER,
+    variant_id INTEGER NOT NULL,
+    nivel TEXT,
+    significancia TEXT,
+    descripcion TEXT,
+    terapias TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_evidence_variant ON evidence(variant_id);
+
+CREATE TABLE IF NOT EXISTS metadata (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _columna(row, names, default=''):
+    for name in names:
+        if name in row:
+            return row[name] or default
+    return default
+
+
+def _leer_tsv(path):
+    """Itera las filas de un TSV sin cargarlo entero en memoria"""
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f, delimiter='\t')
+
+
+def _ids(value):
+    return [int(v) for v in (value or '').replace(' ', '').split(',') if v.isdigit()]
+
+
+def importar(variants_tsv, evidence_tsv, db_path=DEFAULT_PATH, profiles_tsv=None):
+    """Carga el volcado de CIViC en un SQLite indexado por gen+variante.
+
+    Se escribe en un fichero temporal y se renombra al final, así las
+    sesiones que estén leyendo el índice anterior no ven un estado a medias.
+    Devuelve (nº variantes, nº evidencias).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    # Perfil molecular → variantes (volcados recientes)
+    profile_variants = {}
+    if profiles_tsv:
+        for row in _leer_tsv(profiles_tsv):
+            profile_variants[row.get('molecular_profile_id', '')] = _ids(row.get('variant_ids'))
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+
+        n_variants = 0
+        for row in _leer_tsv(variants_tsv):
+            gene = _columna(row, GENE_COLUMNS)
+            variant = row.get('variant', '')
+            if not row.get('variant_id', '').isdigit() or not gene or not variant:
+                continue
+            conn.execute(
+                "INSERT OR REPLACE INTO variant (variant_id, gene, variant, key, url) VALUES (?, ?, ?, ?, ?)",
+                (int(row['variant_id']), gene, variant, normalizar_clave(gene, variant),
+                 row.get('variant_civic_url') or f"https://civicdb.org/variants/{row['variant_id']}/summary")
+            )
+            conn.executemany(
+                "INSERT INTO variant_alias (key, variant_id) VALUES (?, ?)",
+                [(normalizar_clave(gene, alias), int(row['variant_id']))
+                 for alias in (row.get('variant_aliases') or '').split(',') if alias.strip()]
+            )
+            n_variants += 1
+
+        n_evidence = 0
+        batch = []
+        for row in _leer_tsv(evidence_tsv):
+            if row.get('evidence_status', 'accepted') not in ('accepted', ''):
+                continue
+
+            variant_ids = _ids(row.get('variant_id')) or _ids(row.get('variant_ids'))
+            if not variant_ids:
+                variant_ids = profile_variants.get(row.get('molecular_profile_id', ''), [])
+
+            values = (
+                int(row['evidence_id']) if row.get('evidence_id', '').isdigit() else None,
+                row.get('evidence_level', ''),
+                _columna(row, SIGNIFICANCE_COLUMNS),
+                (row.get('evidence_statement') or '')[:MAX_DESCRIPCION],
+                _columna(row, THERAPY_COLUMNS),
+            )
+            for variant_id in variant_ids:
+                batch.append((values[0], variant_id) + values[1:])
+                n_evidence += 1
+
+            if len(batch) >= 5000:
+                conn.executemany("INSERT INTO evidence VALUES (?, ?, ?, ?, ?, ?)", batch)
+                batch = []
+        conn.executemany("INSERT INTO evidence VALUES (?, ?, ?, ?, ?, ?)", batch)
+
+        conn.execute(
+            "INSERT OR REPLACE INTO metadata VALUES ('source', ?)",
+            (json.dumps({'variants': os.path.basename(variants_tsv), 'evidence': os.path.basename(evidence_tsv)}),)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return n_variants, n_evidence
+
+
+class SnapshotCivic:
+    """Índice en memoria construido desde el SQLite del volcado.
+
+    Los resultados tienen el mismo formato que `civicdb.buscar`
+    (`url`, `evidencias`, `terapias`) y se precalculan al cargar, así que
+    cada búsqueda es una consulta a un diccionario.
+    """
+
+    def __init__(self, db_path=DEFAULT_PATH):
+        self.db_path = db_path
+        self.mtime = os.path.getmtime(db_path)
+        self._index = self._cargar()
+
+    def _cargar(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            variants = conn.execute("SELECT variant_id, key, url FROM variant").fetchall()
+            evidence = conn.execute(
+                "SELECT variant_id, nivel, significancia, descripcion, terapias FROM evidence"
+            ).fetchall()
+            # Índices importados antes de que hubiera alias no tienen la tabla
+            has_aliases = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'variant_alias'"
+            ).fetchone()
+            aliases = conn.execute("SELECT key, variant_id FROM variant_alias").fetchall() if has_aliases else []
+        finally:
+            conn.close()
+
+        by_variant = {}
+        for variant_id, nivel, significancia, descripcion, terapias in evidence:
+            by_variant.setdefault(variant_id, []).append((nivel, significancia, descripcion, terapias))
+
+        index = {}
+        by_id = {}
+        for variant_id, key, url in variants:
+            # Si hay varias variantes con el mismo nombre normalizado gana la primera
+            if key in index:
+                by_id[variant_id] = index[key]
+                continue
+            items = sorted(by_variant.get(variant_id, []), key=lambda e: LEVEL_ORDER.get(e[0], len(LEVEL_ORDER)))
+
+            terapias = set()
+            for item in items:
+                terapias.update(t.strip() for t in (item[3] or '').split(',') if t.strip())
+
+            index[key] = {
+                'url': url,
+                'evidencias': [
+                    {'nivel': nivel, 'significancia': significancia, 'descripcion': descripcion}
+                    for nivel, significancia, descripcion, _ in items[:MAX_EVIDENCIAS]
+                ],
+                'terapias': sorted(terapias)
+            }
+            by_id[variant_id] = index[key]
+
+        # Los alias nunca tapan el nombre principal de otra variante
+        for key, variant_id in aliases:
+            if key not in index and variant_id in by_id:
+                index[key] = by_id[variant_id]
+        return index
+
+    def __len__(self):
+        return len(self._index)
+
+    def buscar(self, gene, variant):
+        """Resultado de la variante o None si no está en el volcado"""
+        return self._index.get(normalizar_clave(gene, variant))
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+def obtener_snapshot(db_path=DEFAULT_PATH):
+    """Índice compartido por el proceso; se recarga si el fichero cambia. None si no hay volcado"""
+    global _snapshot
+    try:
+        mtime = os.path.getmtime(db_path)
+    except OSError:
+        return None
+
+    with _lock:
+        if _snapshot is None or _snapshot.db_path != db_path or _snapshot.mtime != mtime:
+            _snapshot = SnapshotCivic(db_path)
+        return _snapshot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Importa el volcado TSV de CIViC a un índice local")
+    parser.add_argument('variants_tsv', help="nightly-VariantSummaries.tsv")
+    parser.add_argument('evidence_tsv', help="nightly-ClinicalEvidenceSummaries.tsv")
+    parser.add_argument('--profiles', help="nightly-MolecularProfileSummaries.tsv (volcados sin variant_id en evidencias)")
+    parser.add_argument('--db', default=DEFAULT_PATH, help=f"Ruta del índice (por defecto {DEFAULT_PATH})")
+    args = parser.parse_args()
+
+    n_variants, n_evidence = importar(args.variants_tsv, args.evidence_tsv, args.db, args.profiles)
+    print(f"✅ {n_variants} variantes y {n_evidence} evidencias importadas en {args.db}")
@@ -1,11 +1,124 @@
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
+from requests.adapters import HTTPAdapter
 
-def buscar(gene, variant):
-    """Busca en CIVICdb. Ejemplo: buscar("BRAF", "V600E")"""
-    
-    query = """
-    query($gene: String!, $variant: String!) {
-      variants(name: $variant, geneName: $gene) {
+from civic_cache import CacheCivic, normalizar_clave
+import civic_snapshot
+from variant_names import canonical_variant
+
+API_URL = os.environ.get("CIVIC_API_URL", "https://civicdb.org/api/graphql")
+
+# Búsquedas simultáneas como máximo (también tamaño del pool de conexiones)
+MAX_WORKERS = 8
+
+# Variantes por petición en buscar_lote (sub-consultas con alias)
+CHUNK_SIZE = 25
+
+# Tiempo máximo por petición y reintentos (con espera exponencial con jitter).
+# civicdb.org responde en menos de un segundo: con el servidor caído, cada
+# una de las primeras búsquedas (hasta que se abre el circuito) espera como
+# mucho PRESUPUESTO segundos
+TIMEOUT = float(os.environ.get("CIVIC_TIMEOUT", 3))
+REINTENTOS = 2
+ESPERA_BASE = 0.5
+# Tiempo total máximo de una consulta contando reintentos
+PRESUPUESTO = float(os.environ.get("CIVIC_PRESUPUESTO", 6))
+
+# Circuit breaker: tras FALLOS_APERTURA errores seguidos no se llama a
+# civicdb.org durante ENFRIAMIENTO segundos (después, una petición de prueba)
+FALLOS_APERTURA = 5
+ENFRIAMIENTO = 30.0
+
+# Resultado de `buscar`
+ENCONTRADO = 'encontrado'
+NO_ENCONTRADO = 'no_encontrado'
+ERROR = 'error'
+
+# estado: ENCONTRADO / NO_ENCONTRADO / ERROR; resultado: dict o None;
+# obsoleto: viene de la caché caducada y se está revalidando; error: mensaje
+Consulta = namedtuple('Consulta', ['estado', 'resultado', 'obsoleto', 'error'], defaults=(False, None))
+
+
+class CivicNoDisponible(Exception):
+    """civicdb.org falla o no responde (o el circuito está abierto)"""
+
+
+class CircuitBreaker:
+    """Corta las llamadas tras varios fallos seguidos para no esperar timeouts.
+
+    cerrado → (umbral fallos) → abierto → (enfriamiento) → semiabierto: pasa
+    una petición de prueba; si va bien se cierra y si falla vuelve a abrirse.
+    """
+
+    def __init__(self, umbral=FALLOS_APERTURA, enfriamiento=ENFRIAMIENTO):
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self.fallos = 0
+        self.abierto_desde = None
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        if self.abierto_desde is None:
+            return 'cerrado'
+        if time.monotonic() - self.abierto_desde < self.enfriamiento:
+            return 'abierto'
+        return 'semiabierto'
+
+    def permitir(self):
+        """True si se puede hacer la petición ahora"""
+        with self._lock:
+            estado = self.estado
+            if estado == 'cerrado':
+                return True
+            if estado == 'semiabierto' and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            return False
+
+    def exito(self):
+        with self._lock:
+            self.fallos = 0
+            self.abierto_desde = None
+            self._prueba_en_curso = False
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            if self._prueba_en_curso or self.fallos >= self.umbral:
+                self.abierto_desde = time.monotonic()
+            self._prueba_en_curso = False
+
+
+circuito = CircuitBreaker()
+
+# Sesión HTTP compartida: reutiliza conexiones TLS entre búsquedas
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS))
+
+# Revalidación en segundo plano de entradas caducadas (una a la vez por clave)
+_revalidador = ThreadPoolExecutor(max_workers=2, thread_name_prefix="civic-revalidar")
+_revalidando = set()
+_revalidando_lock = threading.Lock()
+
+_cache = None
+
+def obtener_cache():
+    """Caché persistente compartida por todo el proceso (se crea al primer uso)"""
+    global _cache
+    if _cache is None:
+        _cache = CacheCivic()
+    return _cache
+
+# Campos que se piden de cada variante
+VARIANT_FIELDS = """
         nodes {
           name
           link
@@ -22,43 +135,234 @@ def buscar(gene, variant):
             }
           }
         }
-      }
-    }
+"""
+
+def _resolver_local(gene, variant):
+    """Busca en el volcado local y en la caché. Devuelve (encontrado, resultado)"""
+    encontrado, resultado, vigente = _resolver_local_entrada(gene, variant)
+    if encontrado and vigente:
+        return True, resultado
+    return False, None
+
+def _resolver_local_entrada(gene, variant):
+    """Como _resolver_local, pero devuelve también entradas caducadas: (encontrado, resultado, vigente)"""
+    snapshot = civic_snapshot.obtener_snapshot()
+    if snapshot is not None:
+        resultado = snapshot.buscar(gene, variant)
+        if resultado is not None:
+            return True, resultado, True
+
+    return obtener_cache().get_entrada(gene, variant)
+
+def _canonico(gene, variant):
+    """Par que se envía a CIVICdb: el mismo nombre con el que se construye la clave
+    (p.Val600Glu → V600E), para no cachear un "no encontrado" con la clave buena"""
+    return " ".join((gene or "").split()), canonical_variant(" ".join((variant or "").split()))
+
+def _consulta(resultado, obsoleto=False):
+    return Consulta(ENCONTRADO if resultado is not None else NO_ENCONTRADO, resultado, obsoleto)
+
+def buscar(gene, variant):
+    """Busca en CIVICdb. Ejemplo: buscar("BRAF", "V600E") → Consulta
+
+    Orden: volcado local de CIViC (civic_snapshot), caché persistente y,
+    sólo si ninguno tiene la variante, civicdb.org. Si la caché tiene la
+    variante caducada se devuelve en el acto (obsoleto=True) y se actualiza
+    en segundo plano. Los errores (estado ERROR) no se cachean.
     """
-    
+    gene, variant = _canonico(gene, variant)
+    encontrado, resultado, vigente = _resolver_local_entrada(gene, variant)
+    if encontrado:
+        if not vigente:
+            _revalidar(gene, variant)
+        return _consulta(resultado, obsoleto=not vigente)
+
     try:
-        r = requests.post(
-            "https://civicdb.org/api/graphql",
-            json={"query": query, "variables": {"gene": gene, "variant": variant}},
-            timeout=10
-        )
-        
-        data = r.json()
-        variants = data.get("data", {}).get("variants", {}).get("nodes", [])
-        
-        if not variants:
-            return None
-        
-        v = variants[0]
-        profiles = v.get("molecularProfiles", {}).get("nodes", [])
-        
-        evidencias = []
-        terapias = set()
-        
-        for p in profiles:
-            for ev in p.get("evidenceItems", {}).get("nodes", []):
-                evidencias.append({
-                    'nivel': ev.get('evidenceLevel', ''),
-                    'significancia': ev.get('significance', ''),
-                    'descripcion': ev.get('description', '')[:100]
-                })
-                for t in ev.get('therapies', {}).get('nodes', []):
-                    terapias.add(t.get('name', ''))
-        
-        return {
-            'url': f"https://civicdb.org{v.get('link', '')}",
-            'evidencias': evidencias[:5],
-            'terapias': list(terapias)
-        }
-    except:
-        return None
+        resultado = _consultar_lote([(gene, variant)])[(gene, variant)]
+    except CivicNoDisponible as e:
+        return Consulta(ERROR, None, error=str(e))
+
+    obtener_cache().set(gene, variant, resultado)
+    return _consulta(resultado)
+
+def _revalidar(gene, variant):
+    """Pide la variante a civicdb.org en segundo plano y actualiza la caché"""
+    key = normalizar_clave(gene, variant)
+    with _revalidando_lock:
+        if key in _revalidando or circuito.estado == 'abierto':
+            return
+        _revalidando.add(key)
+
+    def tarea():
+        try:
+            resultado = _consultar_lote([(gene, variant)])[(gene, variant)]
+            obtener_cache().set(gene, variant, resultado)
+        except CivicNoDisponible:
+            pass
+        finally:
+            with _revalidando_lock:
+                _revalidando.discard(key)
+
+    _revalidador.submit(tarea)
+
+def buscar_varios(pares, max_workers=MAX_WORKERS, chunk_size=CHUNK_SIZE, url=None):
+    """Busca muchas variantes con pocas peticiones. Ejemplo: buscar_varios([("BRAF", "V600E"), ("KRAS", "G12C")])
+
+    Genera ((gene, variant), Consulta): primero las que resuelven el volcado
+    o la caché (las caducadas se sirven y se revalidan en segundo plano) y
+    después, a medida que terminan, las de cada consulta GraphQL con alias
+    de `chunk_size` variantes que se pide a CIVICdb (`max_workers` a la vez).
+    Los pares repetidos (misma clave normalizada) se buscan una sola vez,
+    con el nombre canónico.
+    """
+    unicos = {}
+    for par in pares:
+        unicos.setdefault(normalizar_clave(*par), tuple(par))
+
+    pendientes = []
+    for par in unicos.values():
+        canonico = _canonico(*par)
+        encontrado, resultado, vigente = _resolver_local_entrada(*canonico)
+        if not encontrado:
+            pendientes.append((par, canonico))
+            continue
+        if not vigente:
+            _revalidar(*canonico)
+        yield par, _consulta(resultado, obsoleto=not vigente)
+
+    if not pendientes:
+        return
+
+    cache = obtener_cache()
+    lotes = [pendientes[start:start + chunk_size] for start in range(0, len(pendientes), chunk_size)]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(lotes))) as pool:
+        futures = {pool.submit(_consultar_lote, [canonico for _, canonico in lote], url): lote for lote in lotes}
+        for future in as_completed(futures):
+            lote = futures[future]
+            try:
+                encontrados = future.result()
+            except CivicNoDisponible as e:
+                for par, _ in lote:
+                    yield par, Consulta(ERROR, None, error=str(e))
+                continue
+            for par, canonico in lote:
+                cache.set(*canonico, encontrados[canonico])
+                yield par, _consulta(encontrados[canonico])
+
+def buscar_lote(pares, chunk_size=CHUNK_SIZE, url=None):
+    """Como `buscar_varios`, pero todo de una vez. Ejemplo: buscar_lote([("BRAF", "V600E"), ("KRAS", "G12C")])
+
+    Devuelve (resultados, no_encontrados, errores):
+      - resultados: {(gene, variant): resultado} de las encontradas
+      - no_encontrados: pares que no existen en CIVICdb
+      - errores: pares cuya petición falló (no se cachean)
+    """
+    pares = [tuple(par) for par in pares]
+    consultas = {
+        normalizar_clave(*par): consulta
+        for par, consulta in buscar_varios(pares, chunk_size=chunk_size, url=url)
+    }
+
+    resultados = {}
+    no_encontrados = []
+    errores = []
+    for par in dict.fromkeys(pares):
+        consulta = consultas[normalizar_clave(*par)]
+        if consulta.estado == ERROR:
+            errores.append(par)
+        elif consulta.estado == NO_ENCONTRADO:
+            no_encontrados.append(par)
+        else:
+            resultados[par] = consulta.resultado
+
+    return resultados, no_encontrados, errores
+
+def _consultar_lote(pares, url=None):
+    """Una sola petición GraphQL con una sub-consulta con alias por variante.
+
+    Devuelve {(gene, variant): resultado o None si no existe}; lanza
+    CivicNoDisponible si falla la petición (tras los reintentos).
+    """
+    definiciones = []
+    consultas = []
+    variables = {}
+    for i, (gene, variant) in enumerate(pares):
+        definiciones.append(f"$gene{i}: String!, $variant{i}: String!")
+        consultas.append(f"v{i}: variants(name: $variant{i}, geneName: $gene{i}) {{{VARIANT_FIELDS}      }}")
+        variables[f"gene{i}"] = gene
+        variables[f"variant{i}"] = variant
+
+    query = f"query({', '.join(definiciones)}) {{\n      " + "\n      ".join(consultas) + "\n    }"
+
+    data = _peticion({"query": query, "variables": variables}, url or API_URL)
+
+    resultados = {}
+    for i, par in enumerate(pares):
+        variants = (data["data"].get(f"v{i}") or {}).get("nodes", [])
+        resultados[par] = _parsear_variante(variants[0]) if variants else None
+    return resultados
+
+def _peticion(payload, url):
+    """POST a la API GraphQL con reintentos y circuit breaker; devuelve el JSON"""
+    inicio = time.monotonic()
+    ultimo_error = None
+
+    for intento in range(REINTENTOS + 1):
+        if not circuito.permitir():
+            raise CivicNoDisponible(f"CIVICdb no disponible (circuito abierto): {ultimo_error or 'demasiados errores'}")
+
+        try:
+            r = _session.post(url, json=payload, timeout=TIMEOUT)
+            if r.status_code == 429 or r.status_code >= 500:
+                raise CivicNoDisponible(f"HTTP {r.status_code}")
+            data = r.json() if r.status_code < 400 else None
+        except (requests.RequestException, ValueError, CivicNoDisponible) as e:
+            circuito.fallo()
+            ultimo_error = e
+            # Espera exponencial con jitter completo, sin pasarse del presupuesto
+            espera = random.uniform(0, ESPERA_BASE * 2 ** intento)
+            if intento == REINTENTOS or time.monotonic() - inicio + espera + TIMEOUT > PRESUPUESTO:
+                break
+            time.sleep(espera)
+            continue
+
+        # El servidor responde: el circuito se cierra aunque la petición sea incorrecta
+        circuito.exito()
+        if data is None:
+            # 4xx (salvo 429): la petición es incorrecta, reintentar no sirve
+            raise CivicNoDisponible(f"Petición rechazada: HTTP {r.status_code}")
+        if data.get("errors") or not data.get("data"):
+            # Consulta mal formada: reintentar no sirve
+            raise CivicNoDisponible(f"Respuesta GraphQL inválida: {data.get('errors')}")
+        return data
+
+    raise CivicNoDisponible(f"CIVICdb no responde: {ultimo_error}")
+
+def _parsear_variante(v):
+    """Convierte un nodo `variant` de GraphQL al formato de resultado.
+
+    GraphQL devuelve null (no un objeto vacío) en los campos sin datos.
+    """
+    profiles = (v.get("molecularProfiles") or {}).get("nodes") or []
+
+    evidencias = []
+    terapias = set()
+
+    for p in profiles:
+        for ev in ((p or {}).get("evidenceItems") or {}).get("nodes") or []:
+            if not ev:
+                continue
+            evidencias.append({
+                'nivel': ev.get('evidenceLevel') or '',
+                'significancia': ev.get('significance') or '',
+                'descripcion': (ev.get('description') or '')[:100]
+            })
+            for t in (ev.get('therapies') or {}).get('nodes') or []:
+                if t and t.get('name'):
+                    terapias.add(t['name'])
+
+    return {
+        'url': f"https://civicdb.org{v.get('link') or ''}",
+        'evidencias': evidencias[:5],
+        'terapias': list(terapias)
+    }
@@ -0,0 +1,306 @@
+"""Exportación de informes: un DOCX clínico por muestra y un XLSX con QC y variantes.
+
+Las funciones `build_*` sólo reciben datos ya cargados (dicts y registros de
+records.py) y devuelven bytes, para poder ejecutarlas en un pool de
+procesos sin conexión a la base de datos:
+
+    muestras = collect(repo, sample_ids)
+    nombre, docx_bytes = build_docx(muestras[0])
+    xlsx_bytes = build_xlsx(muestras)
+"""
+import datetime
+import io
+import os
+import re
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import zipfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from docx import Document
+from docx.shared import Pt
+from openpyxl import Workbook
+
+from records import decode_molecular
+from report_format import QUALITY_DISPLAY_COLUMNS, cnv_report, mutation_report, quality_frame
+
+QUALITY_LABELS = {
+    'mean_reads': 'Mean reads',
+    'uniformity_coverage': 'Uniformity coverage',
+    'mapd': 'MAPD',
+    'fusion_qc': 'Fusion QC',
+}
+
+
+def collect(repo, sample_ids):
+    """Datos de todas las muestras con una consulta por tabla, en el orden de `sample_ids`.
+
+    Cada muestra es un dict con 'sample' (fila de sample), 'quality' (QC
+    formateado) y las listas de registros de mutation, cnv y arn_alteration.
+    """
+    ids = list(sample_ids)
+    samples = {row['sample_id']: row for row in repo.get_samples(ids)}
+    quality = quality_frame(ids, repo.get_quality(ids)).reindex(ids).fillna('N/A')
+    variants = decode_molecular(repo.get_molecular(ids, detail=True), ids, detail=True)
+
+    return [
+        {
+            'sample': samples.get(sample_id, {'sample_id': sample_id, 'sample_name': 'N/A'}),
+            'quality': quality.loc[sample_id].to_dict(),
+            **variants[sample_id],
+        }
+        for sample_id in ids
+    ]
+
+
+def _filename(name, extension):
+    return f"{re.sub(r'[^A-Za-z0-9_-]+', '_', name or 'muestra')}.{extension}"
+
+
+# =====================================================
+# DOCX
+# =====================================================
+def _table(document, header, rows):
+    table = document.add_table(rows=1, cols=len(header))
+    table.style = 'Light Grid Accent 1'
+    for cell, text in zip(table.rows[0].cells, header):
+        cell.text = text
+    for row in rows:
+        for cell, value in zip(table.add_row().cells, row):
+            cell.text = str(value)
+    return table
+
+
+def build_docx(muestra):
+    """Informe clínico de una muestra. Devuelve (nombre de fichero, bytes)"""
+    sample = muestra['sample']
+    name = sample.get('sample_name') or 'N/A'
+
+    document = Document()
+    document.styles['Normal'].font.size = Pt(10)
+    document.add_heading(f"Informe de análisis molecular · {name}", level=1)
+    document.add_paragraph(
+        f"Fecha de análisis: {sample.get('analysis_date') or 'N/A'} · "
+        f"Workflow: {sample.get('workflow_name') or 'N/A'}"
+    )
+
+    document.add_heading("Parámetros de calidad", level=2)
+    _table(
+        document,
+        [QUALITY_LABELS[c] for c in QUALITY_LABELS],
+        [[muestra['quality'].get(c, 'N/A') for c in QUALITY_LABELS]]
+    )
+
+    document.add_heading(f"Mutaciones ({len(muestra['mutation'])})", level=2)
+    if muestra['mutation']:
+        _table(
+            document,
+            ['Gen', 'Coding', 'Proteína', 'VAF', 'DP', 'Clasificación'],
+            [
+                [m.gene, m.coding, m.protein, f"{m.af * 100:.2f}%", m.dp, m.clasificacion_hgua or 'Sin clasificar']
+                for m in muestra['mutation']
+            ]
+        )
+        for m in muestra['mutation']:
+            document.add_paragraph(mutation_report(m, m.clasificacion_hgua or 'Sin clasificar'), style='List Bullet')
+    else:
+        document.add_paragraph("Sin mutaciones detectadas")
+
+    document.add_heading(f"CNVs ({len(muestra['cnv'])})", level=2)
+    if muestra['cnv']:
+        for c in muestra['cnv']:
+            document.add_paragraph(
+                f"{cnv_report(c)} · {c.clasificacion_hgua or 'Sin clasificar'}", style='List Bullet'
+            )
+    else:
+        document.add_paragraph("Sin CNVs detectadas")
+
+    document.add_heading(f"Alteraciones de ARN ({len(muestra['arn_alteration'])})", level=2)
+    if muestra['arn_alteration']:
+        _table(
+            document,
+            ['ID', 'Tipo', 'Mol count', 'Read count', 'Clasificación'],
+            [
+                [a.id, a.svtype, a.mol_count, a.read_count, a.clasificacion_hgua or 'Sin clasificar']
+                for a in muestra['arn_alteration']
+            ]
+        )
+    else:
+        document.add_paragraph("Sin alteraciones de ARN detectadas")
+
+    output = io.BytesIO()
+    document.save(output)
+    return _filename(name, 'docx'), output.getvalue()
+
+
+# =====================================================
+# XLSX
+# =====================================================
+MUTATION_COLUMNS = ['gene', 'coding', 'protein', 'af', 'dp', 'type', 'function', 'location',
+                    'oncomine_variant_class', 'clasificacion_hgua', 'transcript', 'chrom', 'pos', 'exon']
+CNV_COLUMNS = ['gene_name', 'cn', 'ci', 'oncomine_variant_class', 'clasificacion_hgua', 'chrom', 'pos', 'end_pos']
+ARN_COLUMNS = ['id', 'svtype', 'mol_count', 'read_count', 'imbalance_score', 'imbalance_pval', 'clasificacion_hgua']
+
+
+def build_xlsx(muestras):
+    """Libro con una hoja de QC y una por tipo de variante (todas las muestras). Devuelve bytes"""
+    # write_only: las filas se escriben en streaming, sin guardar celdas en memoria
+    workbook = Workbook(write_only=True)
+
+    quality = workbook.create_sheet("Calidad")
+    quality.append(QUALITY_DISPLAY_COLUMNS)
+    for muestra in muestras:
+        quality.append([muestra['quality'].get(c, 'N/A') for c in QUALITY_DISPLAY_COLUMNS])
+
+    for title, table, columns, report in (
+        ("Mutaciones", 'mutation', MUTATION_COLUMNS,
+         lambda m: mutation_report(m, m.clasificacion_hgua or 'Sin clasificar')),
+        ("CNVs", 'cnv', CNV_COLUMNS, cnv_report),
+        ("ARN", 'arn_alteration', ARN_COLUMNS, None),
+    ):
+        sheet = workbook.create_sheet(title)
+        sheet.append(['sample_name', *columns, *(['informe'] if report else [])])
+        for muestra in muestras:
+            name = muestra['sample'].get('sample_name')
+            for record in muestra[table]:
+                row = [name, *(getattr(record, c) for c in columns)]
+                if report:
+                    row.append(report(record))
+                sheet.append(row)
+
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def bundle_zip(files):
+    """ZIP con [(nombre, bytes)]; los nombres repetidos se numeran"""
+    output = io.BytesIO()
+    seen = {}
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            seen[name] = seen.get(name, 0) + 1
+            if seen[name] > 1:
+                stem, _, extension = name.rpartition('.')
+                name = f"{stem}_{seen[name]}.{extension}"
+            archive.writestr(name, data)
+    return output.getvalue()
+
+
+def export_name(extension):
+    return f"informes_{datetime.datetime.now():%Y%m%d_%H%M}.{extension}"
+
+
+# =====================================================
+# POOL DE PROCESOS
+# =====================================================
+class ExportPool:
+    """Procesos `python export_reports.py --worker` que ejecutan `build_*`.
+
+    Con Streamlit, __main__ es el script de la aplicación y un pool
+    'spawn' de multiprocessing lo volvería a ejecutar entero en cada
+    proceso. Aquí cada proceso arranca este módulo como script y recibe
+    las tareas por stdin (pickle, las funciones por nombre); un hilo por
+    proceso reparte la cola. Misma interfaz que ProcessPoolExecutor:
+    `submit` devuelve un Future y, si un proceso muere, sus tareas y las
+    pendientes fallan con BrokenProcessPool y el pool deja de aceptar más.
+    """
+
+    def __init__(self, workers):
+        self._tasks = queue.SimpleQueue()
+        self._broken = None
+        self._procs = [
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker'],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            for _ in range(workers)
+        ]
+        for proc in self._procs:
+            threading.Thread(target=self._serve, args=(proc,), daemon=True).start()
+
+    def submit(self, fn, *args):
+        if self._broken:
+            raise BrokenProcessPool(self._broken)
+        if WORKER_TASKS.get(fn.__name__) is not fn:
+            raise ValueError(f"{fn.__name__} no es una tarea de exportación")
+        future = Future()
+        self._tasks.put((future, fn.__name__, args))
+        return future
+
+    def _serve(self, proc):
+        while (task := self._tasks.get()) is not None:
+            future, name, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                pickle.dump((name, args), proc.stdin)
+                proc.stdin.flush()
+                ok, value = pickle.load(proc.stdout)
+            except (OSError, EOFError, pickle.UnpicklingError) as error:
+                self._broken = f"Un proceso de exportación terminó de forma inesperada ({error!r})"
+                future.set_exception(BrokenProcessPool(self._broken))
+                self._fail_pending()
+                return
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+    def _fail_pending(self):
+        while True:
+            try:
+                task = self._tasks.get_nowait()
+            except queue.Empty:
+                return
+            if task is not None and task[0].set_running_or_notify_cancel():
+                task[0].set_exception(BrokenProcessPool(self._broken))
+
+    def shutdown(self):
+        """Termina los procesos (las tareas en curso acaban antes)"""
+        self._broken = self._broken or "Pool cerrado"
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc in self._procs:
+            try:
+                proc.stdin.close()
+            except OSError:
+                # Proceso ya muerto con datos sin enviar
+                pass
+            proc.wait()
+
+
+WORKER_TASKS = {'build_docx': build_docx, 'build_xlsx': build_xlsx}
+
+
+def start_pool(workers):
+    """ExportPool con `workers` procesos, ya arrancados.
+
+    Procesos nuevos en vez de fork: el servidor de Streamlit tiene muchos
+    hilos y hacer fork de un proceso con hilos puede dejar locks bloqueados.
+    """
+    return ExportPool(workers)
+
+
+def _worker():
+    """Bucle de un proceso del pool: (nombre, args) por stdin, (ok, resultado) por stdout"""
+    tasks, results = sys.stdin.buffer, sys.stdout.buffer
+    # Cualquier print de las librerías no debe mezclarse con los resultados
+    sys.stdout = sys.stderr
+    while True:
+        try:
+            name, args = pickle.load(tasks)
+        except EOFError:
+            return
+        try:
+            result = (True, WORKER_TASKS[name](*args))
+        except Exception as error:
+            result = (False, f"{type(error).__name__}: {error}")
+        pickle.dump(result, results)
+        results.flush()
+
+
+if __name__ == '__main__' and sys.argv[1:] == ['--worker']:
+    _worker()
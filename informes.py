@@ -0,0 +1,130 @@
+"""QC e informes de variantes desde la línea de comandos, sin abrir la aplicación.
+
+    python informes.py --prefijo 25B --desde 2025-01-01 --hasta 2025-03-31 \\
+        [--calidad qc.tsv] [--informe informe.txt] [--civic] [--sqlite ruta.sqlite]
+
+Selecciona las muestras por prefijo de nombre y/o rango de analysis_date y
+escribe, en el orden de la tabla de la aplicación:
+
+- `--calidad`: el TSV de QC (sample_name + las 4 columnas que se pegan en
+  Google Sheets)
+- `--informe`: las líneas de informe de mutaciones y CNVs de cada muestra,
+  iguales a las del botón 📄 (con `--civic`, anotadas con CIVICdb)
+
+Sin ruta (o con '-') se escribe en la salida estándar. Las muestras se piden
+por lotes de --lote con una consulta por tabla, y se escribe cada lote en
+cuanto llega. Sin --sqlite se usa la configuración de la aplicación
+(DB_BACKEND, SQLITE_PATH, SUPABASE_URL, SUPABASE_KEY en el entorno).
+"""
+import argparse
+import sys
+
+import civicdb
+from records import decode_molecular
+from report_format import (
+    QUALITY_DISPLAY_COLUMNS, civic_queries, civic_summary, cnv_report, mutation_report, quality_frame, quality_tsv
+)
+from repository import create_repository, repository_from_env
+from sample_index import sort_key
+
+# Muestras por lote (una consulta por tabla y lote)
+BATCH_SAMPLES = 200
+
+
+def seleccionar_muestras(repo, prefijo=None, desde=None, hasta=None):
+    """[(sample_id, sample_name)] en el orden de la tabla (más recientes primero)"""
+    prefijo = (prefijo or '').strip().upper()
+    rows = [
+        row for row in repo.list_sample_names(since=desde)
+        if (row['sample_name'] or '').upper().startswith(prefijo)
+        and (hasta is None or (row['analysis_date'] is not None and row['analysis_date'][:10] <= hasta))
+    ]
+    rows.sort(key=lambda row: sort_key(row['analysis_date'], row['sample_id']), reverse=True)
+    return [(row['sample_id'], row['sample_name']) for row in rows]
+
+
+def lineas_informe(nombre, variantes, civic=None):
+    """Líneas de informe de una muestra; `civic` = {clave normalizada: Consulta}"""
+    yield f"# {nombre}"
+    for mut in variantes['mutation']:
+        line = mutation_report(mut, mut.clasificacion_hgua or 'Sin clasificar')
+        if civic is not None:
+            pares = civic_queries(mut)
+            for gene, variant in pares:
+                # Con varios alelos, cada resumen lleva su variante
+                etiqueta = f"{variant}: " if len(pares) > 1 else ""
+                line += f" | {etiqueta}{civic_summary(civic[civicdb.normalizar_clave(gene, variant)])}"
+        yield line
+    for cnv in variantes['cnv']:
+        yield cnv_report(cnv)
+
+
+def exportar(repo, muestras, calidad=None, informe=None, civic=False, batch_samples=BATCH_SAMPLES):
+    """Escribe QC y/o informes de `muestras` ([(sample_id, sample_name)]) en los ficheros abiertos dados"""
+    if calidad is not None:
+        calidad.write('\t'.join(QUALITY_DISPLAY_COLUMNS) + '\n')
+
+    for start in range(0, len(muestras), batch_samples):
+        lote = muestras[start:start + batch_samples]
+        ids = [sample_id for sample_id, _ in lote]
+
+        if calidad is not None:
+            quality_df = quality_frame(ids, repo.get_quality(ids)).reindex(ids)
+            calidad.write(quality_tsv(quality_df, QUALITY_DISPLAY_COLUMNS) + '\n')
+
+        if informe is not None:
+            variantes = decode_molecular(repo.get_molecular(ids, detail=True), ids, detail=True)
+            resultados = None
+            if civic:
+                # Todas las mutaciones del lote en consultas GraphQL por lotes (pares repetidos una sola vez)
+                pares = [par for v in variantes.values() for mut in v['mutation'] for par in civic_queries(mut)]
+                resultados = {
+                    civicdb.normalizar_clave(*par): consulta for par, consulta in civicdb.buscar_varios(pares)
+                }
+            for sample_id, nombre in lote:
+                for line in lineas_informe(nombre, variantes[sample_id], resultados):
+                    informe.write(line + '\n')
+
+        for f in (calidad, informe):
+            if f is not None:
+                f.flush()
+
+
+def _abrir_salida(path):
+    return sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="QC e informes de variantes por lotes")
+    parser.add_argument('--prefijo', help="Prefijo del nombre de muestra (25B, 24P...)")
+    parser.add_argument('--desde', help="analysis_date mínima (AAAA-MM-DD)")
+    parser.add_argument('--hasta', help="analysis_date máxima (AAAA-MM-DD)")
+    parser.add_argument('--calidad', nargs='?', const='-', help="TSV de QC (ruta o '-')")
+    parser.add_argument('--informe', nargs='?', const='-', help="Líneas de informe (ruta o '-')")
+    parser.add_argument('--civic', action='store_true', help="Anotar las mutaciones con CIVICdb")
+    parser.add_argument('--sqlite', help="Leer de este SQLite en vez de la base configurada")
+    parser.add_argument('--lote', type=int, default=BATCH_SAMPLES, help="Muestras por consulta")
+    args = parser.parse_args()
+
+    if args.calidad is None and args.informe is None:
+        args.informe = '-'
+    if args.calidad == '-' and args.informe == '-':
+        parser.error("--calidad e --informe no pueden ir los dos a la salida estándar")
+
+    if args.sqlite:
+        repo = create_repository('sqlite', path=args.sqlite)
+    else:
+        repo = repository_from_env()
+
+    muestras = seleccionar_muestras(repo, args.prefijo, args.desde, args.hasta)
+    calidad = _abrir_salida(args.calidad) if args.calidad else None
+    informe = _abrir_salida(args.informe) if args.informe else None
+    try:
+        exportar(repo, muestras, calidad, informe, args.civic, args.lote)
+    finally:
+        for f in (calidad, informe):
+            if f is not None and f is not sys.stdout:
+                f.close()
+
+    totals = repo.stats().totals()
+    print(f"✅ {len(muestras)} muestra(s) · {totals['queries']} consulta(s) · {totals['rows']} fila(s)", file=sys.stderr)
@@ -0,0 +1,470 @@
+"""Carga de exportaciones de Ion Reporter (Oncomine) en la base de datos.
+
+    python oncomine_import.py run01/*.vcf run01/*-full.tsv [--qc qc.tsv] [--reemplazar] [--sqlite ruta.sqlite]
+
+Acepta, por muestra, el VCF de Ion Reporter (también .vcf.gz) o la tabla
+de variantes en TSV, y opcionalmente un TSV de QC con una fila por muestra.
+Los ficheros se leen línea a línea y las muestras se insertan por lotes
+(`Repository.insert_samples`), así que la memoria no depende del tamaño de
+la carrera.
+
+Las muestras se identifican por nombre: volver a cargar la misma carrera no
+duplica nada (se omiten las que ya existen) y con `--reemplazar` se vuelven
+a insertar conservando la clasificación HGUA de las variantes; las antiguas
+se borran sólo después de insertar las nuevas, así un fallo a mitad (Supabase
+no tiene transacciones) no pierde datos.
+
+Sin --sqlite se usa la misma configuración que la aplicación (DB_BACKEND,
+SQLITE_PATH, SUPABASE_URL, SUPABASE_KEY en el entorno).
+"""
+import argparse
+import ast
+import gzip
+import os
+import re
+import sys
+import time
+
+from repository import MOLECULAR_TABLES, SAMPLE_CHILD_TABLES, create_repository, repository_from_env
+
+# Filas pendientes (de todas las tablas) antes de escribir un lote
+BATCH_ROWS = 5000
+
+# Nombre de muestra [Año][Tipo][Número] dentro de un texto (25B16796_v1_...)
+SAMPLE_NAME_SEARCH = re.compile(r'(?<![A-Za-z0-9])(\d{2}[A-Za-z]+\d+)(?![A-Za-z0-9])')
+
+# Alias de columnas / claves de cabecera (ya normalizados con _normalizar)
+SAMPLE_NAME_KEYS = ('sample_name', 'sample', 'ionreportersamplename')
+DATE_KEYS = ('analysis_date', 'filedate', 'ionreporteranalysisdate')
+WORKFLOW_KEYS = ('workflow_name', 'ionreporterworkflowname', 'workflow')
+MEDIAN_READS_KEYS = ('median_reads_per_amplicon', 'medianreadsperamplicon', 'median_read_coverage')
+UNIFORMITY_KEYS = ('uniformity_of_base_coverage', 'uniformityofbasecoverage', 'uniformity')
+MAPD_KEYS = ('mapd',)
+FUSION_QC_KEYS = ('fusion_qc', 'fusionqc', 'rna_qc')
+
+# Tipos de registro de ARN que no son alteraciones (controles del panel)
+RNA_CONTROL_TYPES = {'ExprControl', 'ProcControl', 'GeneExpression'}
+RNA_TYPES = {'Fusion', 'RNAExonVariant', '5p3pAssays', 'RNAExonTiles'} | RNA_CONTROL_TYPES
+
+NO_CALL_FILTERS = {'NOCALL', 'FAIL'}
+
+# Columnas que se rellenan en cada tabla (todas las filas con las mismas)
+COLUMNS = {
+    'mutation': ('gene', 'chrom', 'pos', 'transcript', 'exon', 'coding', 'protein', 'af', 'dp', 'type',
+                 'function', 'location', 'oncomine_variant_class', 'clasificacion_hgua'),
+    'cnv': ('gene_name', 'chrom', 'pos', 'end_pos', 'cn', 'ci', 'oncomine_variant_class', 'clasificacion_hgua'),
+    'arn_alteration': ('id', 'svtype', 'mol_count', 'read_count', 'imbalance_score', 'imbalance_pval',
+                       'oncomine_variant_class', 'clasificacion_hgua'),
+    'sample_adn_qc': ('median_reads_per_amplicon', 'uniformity_of_base_coverage', 'mapd'),
+    'sample_arn_qc': ('fusion_qc',),
+}
+
+# Misma variante entre dos cargas de una muestra (para conservar la clasificación)
+VARIANT_KEYS = {
+    'mutation': ('gene', 'coding'),
+    'cnv': ('gene_name',),
+    'arn_alteration': ('id',),
+}
+
+
+# =====================================================
+# LECTURA
+# =====================================================
+def _abrir(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def _normalizar(name):
+    """'##Median Reads per Amplicon' → 'median_reads_per_amplicon'"""
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def _columna(values, names, default=None):
+    for name in names:
+        value = values.get(name)
+        if value not in (None, '', '.', 'NA', 'N/A'):
+            return value
+    return default
+
+
+def _numero(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _entero(value):
+    number = _numero(value)
+    return int(number) if number is not None else None
+
+
+def _fecha(value):
+    """'20250115' / '2025-01-15...' → '2025-01-15'"""
+    if not value:
+        return None
+    digits = re.sub(r'\D', '', value)[:8]
+    if len(digits) == 8:
+        return f"{digits[:4]}-{digits[4:6]}-{digits[6:]}"
+    return None
+
+
+def _nombre_muestra(candidates):
+    """Primer candidato con nombre [Año][Tipo][Número]; si no, el primero no vacío"""
+    candidates = [c for c in candidates if c]
+    for candidate in candidates:
+        match = SAMPLE_NAME_SEARCH.search(candidate)
+        if match:
+            return match.group(1).upper()
+    return candidates[0] if candidates else None
+
+
+def _fila(table, **values):
+    return {name: values.get(name) for name in COLUMNS[table]}
+
+
+def _nueva_muestra(meta, candidates):
+    """Muestra vacía a partir de los metadatos de cabecera ('##clave=valor')"""
+    sample = {
+        'sample': {
+            'sample_name': _nombre_muestra([_columna(meta, SAMPLE_NAME_KEYS), *candidates]),
+            'analysis_date': _fecha(_columna(meta, DATE_KEYS)),
+            'workflow_name': _columna(meta, WORKFLOW_KEYS),
+        },
+        **{table: [] for table in SAMPLE_CHILD_TABLES},
+    }
+    _aplicar_qc(sample, meta)
+    return sample
+
+
+def _aplicar_qc(sample, values):
+    """QC de ADN/ARN de la muestra a partir de cabeceras o de una fila de QC"""
+    adn = _fila(
+        'sample_adn_qc',
+        median_reads_per_amplicon=_numero(_columna(values, MEDIAN_READS_KEYS)),
+        uniformity_of_base_coverage=_numero(_columna(values, UNIFORMITY_KEYS)),
+        mapd=_numero(_columna(values, MAPD_KEYS)),
+    )
+    if any(value is not None for value in adn.values()):
+        sample['sample_adn_qc'] = [adn]
+
+    fusion_qc = _columna(values, FUSION_QC_KEYS)
+    if fusion_qc:
+        sample['sample_arn_qc'] = [_fila('sample_arn_qc', fusion_qc=fusion_qc)]
+
+
+def _func(value):
+    """Anotación FUNC de Ion Reporter: "[{'gene':'BRAF',...}]" → lista de dicts"""
+    if not value:
+        return []
+    try:
+        func = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return []
+    return [item for item in (func if isinstance(func, list) else [func]) if isinstance(item, dict)]
+
+
+def _ci(value):
+    """CI de CNV '0.05:2.1,0.95:3.4' → '2.1-3.4' (el formato que usa el informe)"""
+    bounds = [part.split(':')[-1] for part in (value or '').split(',') if part]
+    return '-'.join(bounds) if len(bounds) == 2 else value
+
+
+def _arn_id(record_id):
+    # Las fusiones vienen en dos registros (un extremo cada uno): ID_1 / ID_2
+    return re.sub(r'_[12]$', '', record_id)
+
+
+def leer_vcf(path):
+    """Muestra del VCF de Ion Reporter (una por fichero)"""
+    meta = {}
+    sample = None
+    seen_arn = set()
+
+    with _abrir(path) as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.startswith('##'):
+                key, _, value = line[2:].partition('=')
+                meta[_normalizar(key)] = value
+                continue
+            if line.startswith('#'):
+                header = line[1:].split('\t')
+                sample = _nueva_muestra(meta, [header[9] if len(header) > 9 else None, os.path.basename(path)])
+                continue
+            if not line or sample is None:
+                continue
+
+            fields = line.split('\t')
+            chrom, pos, record_id, _, alt, _, filter_, info = fields[:8]
+            if filter_ in NO_CALL_FILTERS:
+                continue
+            info = dict(item.partition('=')[::2] for item in info.split(';'))
+            call = dict(zip(fields[8].split(':'), fields[9].split(':'))) if len(fields) > 9 else {}
+            func = _func(info.get('FUNC'))
+            oncomine = _columna(func[0], ('oncomineVariantClass',)) if func else None
+
+            if alt == '<CNV>':
+                sample['cnv'].append(_fila(
+                    'cnv',
+                    gene_name=(func[0].get('gene') if func else None) or info.get('GENE'),
+                    chrom=chrom, pos=_entero(pos), end_pos=_entero(info.get('END')),
+                    cn=_numero(call.get('CN') or info.get('CN')), ci=_ci(info.get('CI')),
+                    oncomine_variant_class=oncomine,
+                ))
+                continue
+
+            svtype = info.get('SVTYPE')
+            if svtype in RNA_TYPES:
+                arn_id = _arn_id(record_id)
+                if svtype in RNA_CONTROL_TYPES or arn_id in seen_arn:
+                    continue
+                seen_arn.add(arn_id)
+                sample['arn_alteration'].append(_fila(
+                    'arn_alteration',
+                    id=arn_id, svtype=svtype,
+                    mol_count=_entero(_columna(info, ('MOL_COUNT', 'MOL_COV'))),
+                    read_count=_entero(_columna(info, ('READ_COUNT', 'READ_COV'))),
+                    imbalance_score=_numero(_columna(info, ('IMBALANCE_SCORE', 'EXON_IMBALANCE_SCORE'))),
+                    imbalance_pval=_numero(_columna(info, ('IMBALANCE_PVAL', 'EXON_IMBALANCE_PVAL'))),
+                    oncomine_variant_class=oncomine,
+                ))
+                continue
+
+            # Variantes pequeñas: un registro puede tener varios alelos alternativos
+            called = {int(i) for i in re.split(r'[/|]', call.get('GT', '')) if i.isdigit()}
+            alts = alt.split(',')
+            afs = info.get('AF', '').split(',')
+            types = info.get('TYPE', '').split(',')
+            depth = _entero(_columna(info, ('FDP', 'DP')))
+            for allele, alt_allele in enumerate(alts, start=1):
+                if called and allele not in called:
+                    continue
+                annotation = next((a for a in func if a.get('origAlt') == alt_allele), func[0] if len(alts) == 1 and func else None)
+                if not annotation or not annotation.get('gene'):
+                    continue
+                sample['mutation'].append(_fila(
+                    'mutation',
+                    gene=annotation.get('gene'), chrom=chrom, pos=_entero(pos),
+                    transcript=annotation.get('transcript'),
+                    exon=str(annotation['exon']) if annotation.get('exon') not in (None, '') else None,
+                    coding=annotation.get('coding'), protein=annotation.get('protein'),
+                    af=_numero(afs[allele - 1]) if allele <= len(afs) else None, dp=depth,
+                    type=types[allele - 1] if allele <= len(types) else None,
+                    function=annotation.get('function'), location=annotation.get('location'),
+                    oncomine_variant_class=_columna(annotation, ('oncomineVariantClass',)),
+                ))
+
+    if sample is None:
+        raise ValueError(f"{path}: no es un VCF (falta la línea #CHROM)")
+    yield sample
+
+
+def _leer_tabla(path):
+    """(metadatos '##', filas) de un TSV de Ion Reporter con columnas normalizadas"""
+    meta = {}
+    f = _abrir(path)
+    header = None
+    for line in f:
+        if line.startswith('##'):
+            key, _, value = line[2:].rstrip('\r\n').partition('=')
+            meta[_normalizar(key)] = value
+            continue
+        header = [_normalizar(name) for name in line.rstrip('\r\n').split('\t')]
+        break
+
+    def rows():
+        with f:
+            for line in f:
+                line = line.rstrip('\r\n')
+                if line and not line.startswith('#'):
+                    yield dict(zip(header, line.split('\t')))
+
+    return meta, header or [], rows()
+
+
+def leer_tsv(path):
+    """Muestra de la tabla de variantes de Ion Reporter (*-full.tsv / *-oncomine.tsv)"""
+    meta, _, rows = _leer_tabla(path)
+    sample = _nueva_muestra(meta, [os.path.basename(path)])
+    seen_arn = set()
+
+    for row in rows:
+        kind = _columna(row, ('type', 'variant_type'), '')
+        if _columna(row, ('call', 'filter'), '').upper() in NO_CALL_FILTERS:
+            continue
+        chrom, _, pos = _columna(row, ('locus',), '').partition(':')
+        oncomine = _columna(row, ('oncomine_variant_class', 'oncominevariantclass'))
+
+        if kind.upper() == 'CNV':
+            sample['cnv'].append(_fila(
+                'cnv',
+                gene_name=_columna(row, ('genes', 'gene')), chrom=chrom or None, pos=_entero(pos),
+                end_pos=_entero(_columna(row, ('end', 'end_position'))),
+                cn=_numero(_columna(row, ('copy_number', 'cn'))), ci=_ci(_columna(row, ('ci', 'confidence_interval'))),
+                oncomine_variant_class=oncomine,
+            ))
+        elif kind in RNA_TYPES or kind.upper() == 'FUSION':
+            arn_id = _arn_id(_columna(row, ('variant_id', 'id', 'fusion'), '')) or None
+            if kind in RNA_CONTROL_TYPES or (arn_id and arn_id in seen_arn):
+                continue
+            seen_arn.add(arn_id)
+            sample['arn_alteration'].append(_fila(
+                'arn_alteration',
+                id=arn_id,
+                svtype='Fusion' if kind.upper() == 'FUSION' else kind,
+                mol_count=_entero(_columna(row, ('mol_count', 'molecular_count'))),
+                read_count=_entero(_columna(row, ('read_counts', 'read_count'))),
+                imbalance_score=_numero(_columna(row, ('imbalance_score',))),
+                imbalance_pval=_numero(_columna(row, ('imbalance_pval', 'imbalance_p_value'))),
+                oncomine_variant_class=oncomine,
+            ))
+        else:
+            gene = _columna(row, ('genes', 'gene'))
+            if not gene:
+                continue
+            # Ion Reporter da la frecuencia en %
+            frequency = _numero(_columna(row, ('frequency', 'allele_frequency', 'allele_frequency_')))
+            af = _numero(_columna(row, ('af',)))
+            sample['mutation'].append(_fila(
+                'mutation',
+                gene=gene, chrom=chrom or None, pos=_entero(pos),
+                transcript=_columna(row, ('transcript',)), exon=_columna(row, ('exon',)),
+                coding=_columna(row, ('coding',)), protein=_columna(row, ('protein', 'amino_acid_change')),
+                af=af if af is not None else (frequency / 100 if frequency is not None else None),
+                dp=_entero(_columna(row, ('coverage', 'fdp', 'dp', 'original_coverage'))),
+                type=kind or None,
+                function=_columna(row, ('function', 'variant_effect')), location=_columna(row, ('location',)),
+                oncomine_variant_class=oncomine,
+            ))
+
+    yield sample
+
+
+def leer_qc(path):
+    """QC por muestra de un TSV con una fila por muestra: {sample_name: fila}"""
+    _, _, rows = _leer_tabla(path)
+    qc = {}
+    for row in rows:
+        name = _nombre_muestra([_columna(row, SAMPLE_NAME_KEYS)])
+        if name:
+            qc[name] = row
+    return qc
+
+
+def leer_muestras(paths):
+    """Itera las muestras de una lista de VCF/TSV, fichero a fichero"""
+    for path in paths:
+        name = path.lower().removesuffix('.gz')
+        yield from (leer_vcf(path) if name.endswith('.vcf') else leer_tsv(path))
+
+
+# =====================================================
+# CARGA
+# =====================================================
+def _clave(table, row):
+    return tuple(row.get(name) for name in VARIANT_KEYS[table])
+
+
+def _escribir_lote(repo, batch, reemplazar, resumen):
+    """Inserta un lote de muestras; las que ya existen se omiten o se reemplazan.
+
+    Al reemplazar se inserta primero y se borran las antiguas después: si la
+    inserción falla quedan las antiguas; si falla el borrado quedan las dos
+    (un reintento con --reemplazar borra todas las anteriores).
+    """
+    existing = {}
+    for row in repo.find_samples([s['sample']['sample_name'] for s in batch]):
+        existing.setdefault(row['sample_name'], []).append(row['sample_id'])
+    old_ids = [sample_id for ids in existing.values() for sample_id in ids]
+
+    if existing and not reemplazar:
+        resumen['omitidas'].extend(name for name in existing)
+        batch = [sample for sample in batch if sample['sample']['sample_name'] not in existing]
+    elif existing:
+        # Conservar las clasificaciones HGUA ya hechas sobre las mismas variantes
+        names = {sample_id: name for name, ids in existing.items() for sample_id in ids}
+        old = repo.get_molecular(old_ids, with_sample=False)
+        classes = {
+            (names[row['sample_id']], table, _clave(table, row)): row['clasificacion_hgua']
+            for table in MOLECULAR_TABLES for row in old[table] if row['clasificacion_hgua']
+        }
+        for sample in batch:
+            name = sample['sample']['sample_name']
+            if name not in existing:
+                continue
+            for table in MOLECULAR_TABLES:
+                for row in sample[table]:
+                    row['clasificacion_hgua'] = classes.get((name, table, _clave(table, row)), row['clasificacion_hgua'])
+        resumen['reemplazadas'] += len(existing)
+
+    with repo.transaction():
+        repo.insert_samples(batch, replacing=old_ids if reemplazar else ())
+        if reemplazar and old_ids:
+            repo.delete_samples(old_ids)
+
+    resumen['muestras'] += len(batch)
+    for table in SAMPLE_CHILD_TABLES:
+        resumen['filas'][table] += sum(len(sample[table]) for sample in batch)
+
+
+def importar(repo, paths, qc_path=None, reemplazar=False, batch_rows=BATCH_ROWS):
+    """Carga los ficheros en el repositorio por lotes de ~batch_rows filas.
+
+    Devuelve un resumen: muestras insertadas, reemplazadas, omitidas (ya
+    existían o repetidas en la entrada), filas por tabla y segundos.
+    """
+    start = time.perf_counter()
+    qc = leer_qc(qc_path) if qc_path else {}
+    resumen = {
+        'muestras': 0, 'reemplazadas': 0, 'omitidas': [],
+        'filas': {table: 0 for table in SAMPLE_CHILD_TABLES}, 'segundos': 0.0,
+    }
+
+    seen = set()
+    batch, pending_rows = [], 0
+    for sample in leer_muestras(paths):
+        name = sample['sample']['sample_name']
+        if name in seen:
+            resumen['omitidas'].append(name)
+            continue
+        seen.add(name)
+        if name in qc:
+            _aplicar_qc(sample, qc[name])
+
+        batch.append(sample)
+        pending_rows += 1 + sum(len(sample[table]) for table in SAMPLE_CHILD_TABLES)
+        if pending_rows >= batch_rows:
+            _escribir_lote(repo, batch, reemplazar, resumen)
+            batch, pending_rows = [], 0
+
+    if batch:
+        _escribir_lote(repo, batch, reemplazar, resumen)
+
+    resumen['segundos'] = time.perf_counter() - start
+    return resumen
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Carga exportaciones de Ion Reporter (VCF/TSV) en la base de datos")
+    parser.add_argument('paths', nargs='+', help="VCF (.vcf, .vcf.gz) o TSV de variantes, uno por muestra")
+    parser.add_argument('--qc', help="TSV de QC con una fila por muestra")
+    parser.add_argument('--reemplazar', action='store_true', help="Vuelve a cargar las muestras que ya existen")
+    parser.add_argument('--sqlite', help="Cargar en este SQLite en vez de la base configurada")
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS, help="Filas por lote de inserción")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        repo = create_repository('sqlite', path=args.sqlite)
+    else:
+        repo = repository_from_env()
+
+    resumen = importar(repo, args.paths, args.qc, args.reemplazar, args.batch_rows)
+    filas = ', '.join(f"{n} {table}" for table, n in resumen['filas'].items())
+    print(f"✅ {resumen['muestras']} muestra(s) cargada(s) en {resumen['segundos']:.1f} s ({filas})")
+    if resumen['reemplazadas']:
+        print(f"♻️ {resumen['reemplazadas']} reemplazada(s)")
+    if resumen['omitidas']:
+        print(f"⏭️ {len(resumen['omitidas'])} omitida(s): {', '.join(resumen['omitidas'])}", file=sys.stderr)
@@ -0,0 +1,120 @@
+"""Agregados de QC de toda la cohorte para el panel de calidad.
+
+Parte de `Repository.get_qc_cohort()` (sólo las columnas necesarias) y lo
+convierte en un DataFrame compacto, una fila por muestra, con tipos
+numéricos y categóricos. Todo lo demás (percentiles, tasas de FAIL y
+muestras atípicas por workflow y mes) son operaciones vectorizadas de
+pandas, así al navegador sólo llegan las filas ya agregadas:
+
+    cohort = cohort_frame(repo.get_qc_cohort())
+    resumen = monthly_summary(cohort)
+    atipicas = cohort[cohort['outlier']]
+"""
+import numpy as np
+import pandas as pd
+
+from report_format import fusion_status
+
+# Métrica → (columna de origen, etiqueta)
+QC_METRICS = {
+    'mean_reads': ('median_reads_per_amplicon', 'Mean reads'),
+    'uniformity': ('uniformity_of_base_coverage', 'Uniformity coverage'),
+    'mapd': ('mapd', 'MAPD'),
+}
+
+PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+# Atípica si |x - mediana| > OUTLIER_Z * 1.4826 * MAD de su workflow
+OUTLIER_Z = 3.5
+MAD_SCALE = 1.4826
+
+SIN_WORKFLOW = 'Sin workflow'
+
+
+def cohort_frame(data):
+    """Una fila por muestra: sample_id, sample_name, month, workflow, métricas (float32),
+    fusion_fail (1/0, NaN si no hay QC de ARN), outlier_* y outlier.
+
+    Si una muestra tiene varias filas de QC se usa la primera, como en la
+    tabla de Parámetros de Calidad. Las muestras sin fecha se descartan.
+    """
+    samples = pd.DataFrame(data['sample'], columns=['sample_id', 'sample_name', 'analysis_date', 'workflow_name'])
+    adn = pd.DataFrame(data['sample_adn_qc'], columns=['sample_id', *(c for c, _ in QC_METRICS.values())])
+    arn = pd.DataFrame(data['sample_arn_qc'], columns=['sample_id', 'fusion_qc'])
+
+    df = (
+        samples
+        .merge(adn.drop_duplicates('sample_id', keep='first'), on='sample_id', how='left')
+        .merge(arn.drop_duplicates('sample_id', keep='first'), on='sample_id', how='left')
+    )
+
+    month = pd.to_datetime(df['analysis_date'], errors='coerce').dt.to_period('M')
+    cohort = pd.DataFrame({
+        'sample_id': df['sample_id'],
+        'sample_name': df['sample_name'],
+        'month': month.dt.to_timestamp(),
+        'workflow': df['workflow_name'].fillna(SIN_WORKFLOW).astype('category'),
+    })
+    for metric, (column, _) in QC_METRICS.items():
+        values = pd.to_numeric(df[column], errors='coerce')
+        # 0 es "sin dato" en la hoja de QC
+        cohort[metric] = values.where(values != 0).astype('float32')
+
+    status = fusion_status(df['fusion_qc'])
+    cohort['fusion_fail'] = (status == 'FAIL').astype('float32').where(status.notna())
+
+    cohort = cohort[cohort['month'].notna()].reset_index(drop=True)
+    return flag_outliers(cohort)
+
+
+def flag_outliers(cohort):
+    """Añade outlier_<métrica> (desviación robusta dentro de su workflow) y outlier (cualquiera)"""
+    groups = cohort.groupby('workflow', observed=True)
+    flags = []
+    for metric in QC_METRICS:
+        values = cohort[metric]
+        median = groups[metric].transform('median')
+        deviation = (values - median).abs()
+        mad = deviation.groupby(cohort['workflow'], observed=True).transform('median') * MAD_SCALE
+        # Con MAD 0 (casi todas iguales) no se marca nada
+        flag = (deviation > OUTLIER_Z * mad) & (mad > 0)
+        cohort[f'outlier_{metric}'] = flag.to_numpy()
+        flags.append(flag.to_numpy())
+    cohort['outlier'] = np.logical_or.reduce(flags) if flags else False
+    return cohort
+
+
+def monthly_summary(cohort):
+    """Una fila por (workflow, month): n, percentiles de cada métrica, tasa de FAIL de fusiones y atípicas"""
+    groups = cohort.groupby(['workflow', 'month'], observed=True)
+
+    quantiles = groups[list(QC_METRICS)].quantile(PERCENTILES).unstack()
+    quantiles.columns = [f"{metric}_p{round(q * 100)}" for metric, q in quantiles.columns]
+
+    summary = pd.DataFrame({
+        'n': groups.size(),
+        # mean() ignora NaN: muestras sin QC de ARN no cuentan
+        'fusion_fail_rate': groups['fusion_fail'].mean(),
+        'outliers': groups['outlier'].sum(),
+    })
+    return summary.join(quantiles).reset_index().sort_values(['workflow', 'month'], ignore_index=True)
+
+
+def workflow_summary(cohort):
+    """Una fila por workflow con los cuartiles y bigotes (1.5 IQR) de cada métrica, para diagramas de caja"""
+    groups = cohort.groupby('workflow', observed=True)
+    rows = []
+    for metric in QC_METRICS:
+        q = groups[metric].quantile([0.25, 0.5, 0.75]).unstack()
+        q.columns = ['q1', 'median', 'q3']
+        iqr = q['q3'] - q['q1']
+        # Bigotes: valor extremo dentro de 1.5 IQR (como plotly con todos los puntos)
+        bounds = cohort[['workflow', metric]].join(
+            (q['q1'] - 1.5 * iqr).rename('low'), on='workflow'
+        ).join((q['q3'] + 1.5 * iqr).rename('high'), on='workflow')
+        inside = bounds[(bounds[metric] >= bounds['low']) & (bounds[metric] <= bounds['high'])]
+        fences = inside.groupby('workflow', observed=True)[metric].agg(['min', 'max'])
+        q = q.join(fences.rename(columns={'min': 'lowerfence', 'max': 'upperfence'}))
+        q['metric'] = metric
+        rows.append(q.reset_index())
+    return pd.concat(rows, ignore_index=True)
@@ -0,0 +1,153 @@
+"""Registros tipados de las variantes que se muestran en Análisis Molecular.
+
+Cada tabla se pide en dos proyecciones:
+
+- `SUMMARY_COLUMNS`: lo que se pinta en la tarjeta de la lista
+- `DETAIL_COLUMNS`: lo que sólo hace falta para el texto de búsqueda/informe,
+  que se carga al pulsar 🔍/📄 (`load_detail`)
+
+Los valores por defecto (None → 'N/A', None → 0...) se aplican una sola vez
+al decodificar la fila, no en cada rerun.
+"""
+from dataclasses import dataclass
+from typing import ClassVar, Optional
+
+
+def _decode(cls, row, defaults):
+    """Crea el registro a partir de un dict; los valores vacíos toman su valor por defecto"""
+    values = {}
+    for name, default in defaults.items():
+        value = row.get(name)
+        values[name] = value if value or default is None else default
+    return cls(**values)
+
+
+@dataclass(slots=True)
+class Mutation:
+    TABLE: ClassVar[str] = 'mutation'
+    ID_COLUMN: ClassVar[str] = 'mutation_id'
+    SUMMARY_COLUMNS: ClassVar[str] = (
+        'mutation_id, sample_id, gene, protein, coding, af, dp, type, function, location, '
+        'oncomine_variant_class, clasificacion_hgua'
+    )
+    DETAIL_COLUMNS: ClassVar[str] = 'mutation_id, transcript, chrom, pos, exon'
+
+    mutation_id: int
+    sample_id: int
+    gene: str
+    protein: str
+    coding: str
+    af: float
+    dp: int
+    type: str
+    function: str
+    location: str
+    oncomine_variant_class: str
+    clasificacion_hgua: Optional[str]
+    # Detalle (None = todavía no cargado)
+    transcript: Optional[str] = None
+    chrom: Optional[str] = None
+    pos: Optional[str] = None
+    exon: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row):
+        return _decode(cls, row, {
+            'mutation_id': None, 'sample_id': None,
+            'gene': 'N/A', 'protein': 'N/A', 'coding': 'N/A', 'af': 0, 'dp': 0,
+            'type': 'N/A', 'function': 'N/A', 'location': 'N/A', 'oncomine_variant_class': 'N/A',
+            'clasificacion_hgua': None,
+        })
+
+
+@dataclass(slots=True)
+class CNV:
+    TABLE: ClassVar[str] = 'cnv'
+    ID_COLUMN: ClassVar[str] = 'cnv_id'
+    SUMMARY_COLUMNS: ClassVar[str] = 'cnv_id, sample_id, gene_name, cn, ci, oncomine_variant_class, clasificacion_hgua'
+    DETAIL_COLUMNS: ClassVar[str] = 'cnv_id, chrom, pos, end_pos'
+
+    cnv_id: int
+    sample_id: int
+    gene_name: str
+    cn: float
+    ci: str
+    oncomine_variant_class: str
+    clasificacion_hgua: Optional[str]
+    # Detalle (None = todavía no cargado)
+    chrom: Optional[str] = None
+    pos: Optional[str] = None
+    end_pos: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row):
+        return _decode(cls, row, {
+            'cnv_id': None, 'sample_id': None,
+            'gene_name': 'N/A', 'cn': 0, 'ci': '', 'oncomine_variant_class': 'N/A',
+            'clasificacion_hgua': None,
+        })
+
+
+@dataclass(slots=True)
+class ArnAlteration:
+    TABLE: ClassVar[str] = 'arn_alteration'
+    ID_COLUMN: ClassVar[str] = 'arn_alteration_id'
+    SUMMARY_COLUMNS: ClassVar[str] = (
+        'arn_alteration_id, sample_id, id, svtype, mol_count, read_count, imbalance_score, imbalance_pval, '
+        'clasificacion_hgua'
+    )
+    # Sin formato de informe todavía: la tarjeta ya lo tiene todo
+    DETAIL_COLUMNS: ClassVar[str] = 'arn_alteration_id'
+
+    arn_alteration_id: int
+    sample_id: int
+    id: str
+    svtype: str
+    mol_count: int
+    read_count: int
+    imbalance_score: float
+    imbalance_pval: float
+    clasificacion_hgua: Optional[str]
+
+    @classmethod
+    def from_row(cls, row):
+        return _decode(cls, row, {
+            'arn_alteration_id': None, 'sample_id': None,
+            'id': 'N/A', 'svtype': 'N/A', 'mol_count': 0, 'read_count': 0,
+            'imbalance_score': 0, 'imbalance_pval': 0,
+            'clasificacion_hgua': None,
+        })
+
+
+# Tabla → clase de registro
+RECORD_TYPES = {cls.TABLE: cls for cls in (Mutation, CNV, ArnAlteration)}
+
+
+def _detail_names(record):
+    return [name.strip() for name in record.DETAIL_COLUMNS.split(',')][1:]
+
+
+def load_detail(record, row):
+    """Completa los campos de detalle de un registro (None → '')"""
+    for name in _detail_names(record):
+        setattr(record, name, row.get(name) or '')
+
+
+def has_detail(record):
+    """True si ya se han cargado los campos de detalle"""
+    return all(getattr(record, name) is not None for name in _detail_names(record))
+
+
+def decode_molecular(data, sample_ids, detail=False):
+    """{sample_id: {tabla: [registros]}} a partir de `Repository.get_molecular`.
+
+    Con detail=True las filas traen también las columnas de detalle.
+    """
+    decoded = {sample_id: {table: [] for table in RECORD_TYPES} for sample_id in sample_ids}
+    for table, record_type in RECORD_TYPES.items():
+        for row in data[table]:
+            record = record_type.from_row(row)
+            if detail:
+                load_detail(record, row)
+            decoded[row['sample_id']][table].append(record)
+    return decoded
@@ -0,0 +1,104 @@
+"""Índice en memoria de recurrencia de mutaciones entre muestras.
+
+Para cada variante (gene, coding, protein) guarda en qué muestras aparece y
+con qué clasificación HGUA, así cada tarjeta de Análisis Molecular puede
+mostrar cuántas veces se ha visto antes y cómo se clasificó sin ir al
+servidor: todas las tarjetas de una muestra se resuelven con un `lookup`.
+"""
+import threading
+from collections import Counter, namedtuple
+
+# n: nº de muestras anteriores con la variante; clasificaciones: Counter
+# (sin clasificar incluido); ultima: clasificación de la más reciente de
+# ellas que tenga una (None si ninguna)
+Recurrencia = namedtuple('Recurrencia', ['n', 'clasificaciones', 'ultima'])
+
+SIN_RECURRENCIA = Recurrencia(0, Counter(), None)
+
+
+def variant_key(gene, coding, protein):
+    """Clave de la variante; None si falta el gen o el cambio"""
+    gene = (gene or '').strip().upper()
+    coding = (coding or '').strip()
+    protein = (protein or '').strip()
+    if not gene or gene == 'N/A' or not (coding or protein):
+        return None
+    return (gene, coding if coding != 'N/A' else '', protein if protein != 'N/A' else '')
+
+
+class RecurrenceIndex:
+    """Índice (gene, coding, protein) → {mutation_id: (sample_id, clasificación)}.
+
+    Se carga con todas las mutaciones, se completa con las nuevas
+    (`max_id`) y se actualiza en el sitio al guardar clasificaciones.
+    """
+
+    def __init__(self, rows=()):
+        self._by_variant = {}
+        self._keys = {}
+        self.max_id = 0
+        self.refreshed_at = 0.0
+        self.built_at = 0.0
+        # Compartido entre sesiones de Streamlit (hilos)
+        self.lock = threading.RLock()
+        self.update(rows)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, rows):
+        """Añade o actualiza filas de mutation (mutation_id, sample_id, gene, coding, protein, clasificacion_hgua)"""
+        with self.lock:
+            for row in rows:
+                mutation_id = row['mutation_id']
+                key = variant_key(row['gene'], row['coding'], row['protein'])
+                old_key = self._keys.pop(mutation_id, None)
+                if old_key is not None:
+                    self._by_variant[old_key].pop(mutation_id, None)
+                if key is not None:
+                    self._keys[mutation_id] = key
+                    self._by_variant.setdefault(key, {})[mutation_id] = (row['sample_id'], row['clasificacion_hgua'])
+                self.max_id = max(self.max_id, mutation_id)
+
+    def set_classification(self, mutation_ids, new_class):
+        """Refleja en el índice clasificaciones ya guardadas"""
+        with self.lock:
+            for mutation_id in mutation_ids:
+                key = self._keys.get(mutation_id)
+                if key is not None:
+                    sample_id, _ = self._by_variant[key][mutation_id]
+                    self._by_variant[key][mutation_id] = (sample_id, new_class)
+
+    def lookup(self, keys, before_sample=None, sample_order=None):
+        """{clave: Recurrencia} para varias variantes a la vez.
+
+        Con `before_sample` (la muestra que se está revisando) sólo cuenta
+        las apariciones en muestras anteriores a ella, sin incluirla; sin él,
+        todas. `sample_order(sample_id)` da el orden temporal de las
+        muestras; sin él, el ID.
+        """
+        sample_order = sample_order or (lambda sample_id: sample_id)
+        before = sample_order(before_sample) if before_sample is not None else None
+        result = {}
+        with self.lock:
+            for key in keys:
+                if key is None or key in result:
+                    continue
+                occurrences = {}
+                for sample_id, clase in self._by_variant.get(key, {}).values():
+                    if sample_id == before_sample or (before is not None and not sample_order(sample_id) < before):
+                        continue
+                    # Varias filas de la misma muestra cuentan una vez; gana la clasificada
+                    if clase or sample_id not in occurrences:
+                        occurrences[sample_id] = clase
+                if not occurrences:
+                    result[key] = SIN_RECURRENCIA
+                    continue
+
+                classified = [(sample_order(s), c) for s, c in occurrences.items() if c]
+                result[key] = Recurrencia(
+                    n=len(occurrences),
+                    clasificaciones=Counter(c or 'Sin clasificar' for c in occurrences.values()),
+                    ultima=max(classified, key=lambda item: item[0])[1] if classified else None,
+                )
+        return result
@@ -0,0 +1,127 @@
+"""Formato de los textos que se copian a la hoja de QC y a los informes.
+
+Lo usan la aplicación (app.py) y la línea de comandos (informes.py), así
+que las dos producen exactamente las mismas líneas.
+"""
+import pandas as pd
+
+import civicdb
+from variant_names import civic_variants
+
+# =====================================================
+# PARÁMETROS DE CALIDAD
+# =====================================================
+QUALITY_TSV_COLUMNS = ['mean_reads', 'uniformity_coverage', 'mapd', 'fusion_qc']
+QUALITY_DISPLAY_COLUMNS = ['sample_name'] + QUALITY_TSV_COLUMNS
+
+
+def _format_decimal(values):
+    """Formatea con 2 decimales; nulos y ceros → 'N/A'"""
+    numbers = pd.to_numeric(values, errors='coerce')
+    formatted = numbers.map('{:.2f}'.format, na_action='ignore')
+    return formatted.where(numbers.notna() & (numbers != 0), 'N/A')
+
+
+def fusion_status(values):
+    """Sólo PASS/FAIL de fusion_qc ("PASS, ..." → "PASS"); NaN si no hay valor"""
+    fusion = values.fillna('').astype(str)
+    return fusion.str.split(',').str[0].str.strip().str.upper().where(fusion != '')
+
+
+def quality_frame(sample_ids, data):
+    """DataFrame indexado por sample_id con el QC ya formateado para mostrar.
+
+    `data` es lo que devuelve `Repository.get_quality(sample_ids)`.
+    """
+    ids = list(sample_ids)
+    if not ids:
+        return pd.DataFrame(columns=QUALITY_DISPLAY_COLUMNS, index=pd.Index([], name='sample_id'))
+
+    # Una fila por muestra (si hay varias filas de QC se usa la primera, como antes)
+    df = pd.DataFrame({'sample_id': ids})
+    for rows, columns in (
+        (data['sample'], ['sample_id', 'sample_name']),
+        (data['sample_adn_qc'], ['sample_id', 'median_reads_per_amplicon', 'uniformity_of_base_coverage', 'mapd']),
+        (data['sample_arn_qc'], ['sample_id', 'fusion_qc']),
+    ):
+        table = pd.DataFrame(rows, columns=columns).drop_duplicates('sample_id', keep='first')
+        df = df.merge(table, on='sample_id', how='left')
+
+    # mean_reads como entero truncado
+    reads = pd.to_numeric(df['median_reads_per_amplicon'], errors='coerce')
+    has_reads = reads.notna() & (reads != 0)
+    df['mean_reads'] = reads.where(has_reads, 0).astype('int64').astype(str).where(has_reads, 'N/A')
+
+    df['uniformity_coverage'] = _format_decimal(df['uniformity_of_base_coverage'])
+    df['mapd'] = _format_decimal(df['mapd'])
+
+    df['fusion_qc'] = fusion_status(df['fusion_qc']).fillna('N/A')
+
+    df['sample_name'] = df['sample_name'].fillna('N/A')
+    return df.set_index('sample_id')[QUALITY_DISPLAY_COLUMNS]
+
+
+def quality_tsv(quality_df, columns=QUALITY_TSV_COLUMNS):
+    """Texto TSV (por defecto sin sample_name) para pegar en Google Sheets"""
+    values = [quality_df[c].astype(str) for c in columns]
+    lines = values[0]
+    for column in values[1:]:
+        lines = lines + '\t' + column
+    return "\n".join(lines)
+
+
+# =====================================================
+# VARIANTES
+# =====================================================
+def civic_queries(mut):
+    """Pares (gen, variante) para CIVICdb de una mutación, uno por alelo (p.Val600Glu → V600E).
+
+    Lista vacía si no hay nada que buscar (sin gen, sinónimas, p.?, sin proteína).
+    """
+    if not mut.gene or mut.gene == 'N/A':
+        return []
+    return [(mut.gene, variant) for variant in civic_variants(mut.protein, mut.coding)]
+
+
+def mutation_search(mut):
+    """Texto de búsqueda (transcrito:coding); necesita el detalle cargado"""
+    return f"{mut.transcript}:{mut.coding}"
+
+
+def mutation_report(mut, clasificacion):
+    """Línea de informe de una mutación; necesita el detalle cargado"""
+    exon_formatted = f"exón {mut.exon}" if mut.exon else ""
+    vaf = mut.af * 100
+    return (f"{mut.gene} ({mut.chrom}:{mut.pos}; {mut.transcript}) {exon_formatted}; {mut.coding}; {mut.protein}; "
+            f"VAF: {vaf:.2f}%; {mut.dp}; {mut.type}; {clasificacion}")
+
+
+def cnv_report(cnv):
+    """Línea de informe de una CNV; necesita el detalle cargado"""
+    # Determinar amplificación o deleción
+    condicion = "Amplificación" if cnv.cn > 2 else "Deleción"
+
+    # Formatear CI con %
+    ci_formatted = cnv.ci
+    if cnv.ci and '-' in cnv.ci:
+        parts = cnv.ci.split('-')
+        if len(parts) == 2:
+            ci_formatted = f"{parts[0]}%-{parts[1]}%"
+
+    return f"{condicion} {cnv.gene_name} ({cnv.chrom}; {cnv.pos}:{cnv.end_pos}) {ci_formatted}"
+
+
+def civic_summary(consulta):
+    """Resumen en una línea de una civicdb.Consulta (para informes en texto)"""
+    if consulta.estado == civicdb.ERROR:
+        return "CIViC: error"
+    if consulta.estado == civicdb.NO_ENCONTRADO:
+        return "CIViC: no encontrado"
+    resultado = consulta.resultado
+    niveles = sorted({ev['nivel'] for ev in resultado['evidencias'] if ev['nivel']})
+    partes = [f"CIViC: {resultado['url']}"]
+    if niveles:
+        partes.append(f"niveles {','.join(niveles)}")
+    if resultado['terapias']:
+        partes.append(f"terapias {', '.join(sorted(resultado['terapias']))}")
+    return "; ".join(partes)
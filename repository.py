@@ -0,0 +1,817 @@
+"""Acceso a datos de la aplicación.
+
+Todas las consultas pasan por un `Repository` con dos implementaciones:
+
+- `SupabaseRepository`: la base de datos de producción
+- `SQLiteRepository`: mismo esquema en un fichero local (pruebas offline,
+  benchmarks)
+- `MirroredRepository`: lee de un SQLite local que replica Supabase y se
+  mantiene al día en segundo plano; las escrituras van a Supabase y se
+  aplican a la réplica en el momento
+
+Cada consulta se contabiliza (nº consultas, filas, bytes y latencia por
+tabla) en unas estadísticas por hilo, que en Streamlit equivale a por
+sesión: `reset_stats()` al empezar cada rerun y `stats()` al final.
+`GLOBAL_STATS` acumula lo mismo para todo el proceso (benchmarks).
+"""
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from records import RECORD_TYPES
+
+# Tabla → columna con el ID de la fila (tablas con clasificación HGUA)
+MOLECULAR_TABLES = {
+    'mutation': 'mutation_id',
+    'cnv': 'cnv_id',
+    'arn_alteration': 'arn_alteration_id',
+}
+
+# Tablas que cuelgan de sample (orden de inserción; se borran al revés)
+SAMPLE_CHILD_TABLES = ('sample_adn_qc', 'sample_arn_qc', *MOLECULAR_TABLES)
+
+# Columna para ordenar (y poder paginar) cada tabla
+ORDER_COLUMNS = {
+    'sample': 'sample_id',
+    'sample_adn_qc': 'sample_id',
+    'sample_arn_qc': 'sample_id',
+    **MOLECULAR_TABLES,
+}
+
+# Clave primaria de cada tabla (réplica local)
+ROW_KEYS = {
+    'sample': 'sample_id',
+    'sample_adn_qc': 'sample_adn_qc_id',
+    'sample_arn_qc': 'sample_arn_qc_id',
+    **MOLECULAR_TABLES,
+}
+
+# Esquema de las tablas que usa la aplicación (para el backend SQLite)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sample (
+    sample_id INTEGER PRIMARY KEY,
+    sample_name TEXT NOT NULL,
+    analysis_date TEXT,
+    workflow_name TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sample_order ON sample(analysis_date, sample_id);
+CREATE INDEX IF NOT EXISTS idx_sample_name ON sample(sample_name);
+
+CREATE TABLE IF NOT EXISTS sample_adn_qc (
+    sample_adn_qc_id INTEGER PRIMARY KEY,
+    sample_id INTEGER NOT NULL REFERENCES sample(sample_id),
+    median_reads_per_amplicon REAL,
+    uniformity_of_base_coverage REAL,
+    mapd REAL
+);
+CREATE INDEX IF NOT EXISTS idx_sample_adn_qc_sample ON sample_adn_qc(sample_id);
+
+CREATE TABLE IF NOT EXISTS sample_arn_qc (
+    sample_arn_qc_id INTEGER PRIMARY KEY,
+    sample_id INTEGER NOT NULL REFERENCES sample(sample_id),
+    fusion_qc TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sample_arn_qc_sample ON sample_arn_qc(sample_id);
+
+CREATE TABLE IF NOT EXISTS mutation (
+    mutation_id INTEGER PRIMARY KEY,
+    sample_id INTEGER NOT NULL REFERENCES sample(sample_id),
+    gene TEXT,
+    chrom TEXT,
+    pos INTEGER,
+    transcript TEXT,
+    exon TEXT,
+    coding TEXT,
+    protein TEXT,
+    af REAL,
+    dp INTEGER,
+    type TEXT,
+    function TEXT,
+    location TEXT,
+    oncomine_variant_class TEXT,
+    clasificacion_hgua TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_mutation_sample ON mutation(sample_id);
+
+CREATE TABLE IF NOT EXISTS cnv (
+    cnv_id INTEGER PRIMARY KEY,
+    sample_id INTEGER NOT NULL REFERENCES sample(sample_id),
+    gene_name TEXT,
+    chrom TEXT,
+    pos INTEGER,
+    end_pos INTEGER,
+    cn REAL,
+    ci TEXT,
+    oncomine_variant_class TEXT,
+    clasificacion_hgua TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_cnv_sample ON cnv(sample_id);
+
+CREATE TABLE IF NOT EXISTS arn_alteration (
+    arn_alteration_id INTEGER PRIMARY KEY,
+    sample_id INTEGER NOT NULL REFERENCES sample(sample_id),
+    id TEXT,
+    svtype TEXT,
+    mol_count INTEGER,
+    read_count INTEGER,
+    imbalance_score REAL,
+    imbalance_pval REAL,
+    oncomine_variant_class TEXT,
+    clasificacion_hgua TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_arn_alteration_sample ON arn_alteration(sample_id);
+
+CREATE TABLE IF NOT EXISTS mirror_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# =====================================================
+# ESTADÍSTICAS DE CONSULTAS
+# =====================================================
+class QueryStats:
+    """Contadores por tabla: consultas, filas, bytes (JSON) y segundos"""
+
+    def __init__(self):
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def record(self, table, rows, size, seconds):
+        with self._lock:
+            self._record(table, rows, size, seconds)
+
+    def _record(self, table, rows, size, seconds):
+        counters = self.tables.setdefault(table, {'queries': 0, 'rows': 0, 'bytes': 0, 'seconds': 0.0})
+        counters['queries'] += 1
+        counters['rows'] += rows
+        counters['bytes'] += size
+        counters['seconds'] += seconds
+
+    def totals(self):
+        totals = {'queries': 0, 'rows': 0, 'bytes': 0, 'seconds': 0.0}
+        for counters in self.tables.values():
+            for name in totals:
+                totals[name] += counters[name]
+        return totals
+
+    def as_rows(self):
+        """Una fila por tabla (para mostrar en un DataFrame)"""
+        return [
+            {'table': table, **counters, 'ms': round(counters['seconds'] * 1000, 1)}
+            for table, counters in sorted(self.tables.items())
+        ]
+
+
+# Todas las consultas del proceso, de cualquier repositorio
+GLOBAL_STATS = QueryStats()
+
+# Bytes exactos (serializa cada resultado a JSON) sólo con instrumentación
+# (benchmarks, REPO_MEASURE_BYTES=1); si no, se estiman con la primera fila
+MEASURE_BYTES = os.environ.get('REPO_MEASURE_BYTES') == '1'
+
+
+def _payload_size(data):
+    """Bytes en JSON de un resultado: exactos con MEASURE_BYTES, estimados si no"""
+    if not data:
+        return 0
+    if MEASURE_BYTES:
+        return len(json.dumps(data, default=str))
+    return len(json.dumps(data[0], default=str)) * len(data)
+
+
+# =====================================================
+# REPOSITORIO BASE
+# =====================================================
+class Repository:
+    """Consultas de la aplicación sobre las primitivas de cada backend:
+    `_select`, `_select_all`, `_update`, `_insert` y `_delete`."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    # ---------- Estadísticas ----------
+    def stats(self):
+        """Estadísticas del hilo actual (sesión de Streamlit)"""
+        if not hasattr(self._local, 'stats'):
+            self._local.stats = QueryStats()
+        return self._local.stats
+
+    def reset_stats(self):
+        self._local.stats = QueryStats()
+
+    def _timed(self, table, run):
+        start = time.perf_counter()
+        data = run()
+        elapsed = time.perf_counter() - start
+        size = _payload_size(data)
+        self.stats().record(table, len(data), size, elapsed)
+        GLOBAL_STATS.record(table, len(data), size, elapsed)
+        return data
+
+    # ---------- Primitivas (cada backend) ----------
+    def _select(self, table, columns, column, values):
+        """Filas de `table` con `column` IN values"""
+        raise NotImplementedError
+
+    def _select_all(self, table, columns, key_column, since_column=None, since=None):
+        """Todas las filas (o las que tienen since_column >= since); key_column para paginar"""
+        raise NotImplementedError
+
+    def _update(self, table, values, column, ids):
+        """UPDATE ... SET values WHERE column IN ids; devuelve las filas actualizadas"""
+        raise NotImplementedError
+
+    def _insert(self, table, rows):
+        """INSERT de muchas filas (todas con las mismas columnas) por lotes"""
+        raise NotImplementedError
+
+    def _delete(self, table, column, ids):
+        """DELETE ... WHERE column IN ids"""
+        raise NotImplementedError
+
+    def transaction(self):
+        """Agrupa escrituras en una transacción; sin efecto si el backend no las tiene"""
+        return contextlib.nullcontext()
+
+    # ---------- Muestras ----------
+    def list_sample_names(self, since=None):
+        """sample_id, sample_name y analysis_date de todas las muestras (o desde una fecha)"""
+        return self._select_all('sample', 'sample_id, sample_name, analysis_date', 'sample_id', 'analysis_date', since)
+
+    def get_samples(self, sample_ids):
+        return self._select('sample', 'sample_id, sample_name, analysis_date, workflow_name', 'sample_id', sample_ids)
+
+    # ---------- Calidad ----------
+    def get_quality(self, sample_ids):
+        """{tabla: filas} de sample, sample_adn_qc y sample_arn_qc"""
+        return {
+            'sample': self._select('sample', 'sample_id, sample_name', 'sample_id', sample_ids),
+            'sample_adn_qc': self._select(
+                'sample_adn_qc',
+                'sample_id, median_reads_per_amplicon, uniformity_of_base_coverage, mapd',
+                'sample_id', sample_ids
+            ),
+            'sample_arn_qc': self._select('sample_arn_qc', 'sample_id, fusion_qc', 'sample_id', sample_ids),
+        }
+
+    def get_qc_cohort(self):
+        """{tabla: filas} con sólo las columnas del panel de cohorte, de todas las muestras"""
+        return {
+            'sample': self._select_all('sample', 'sample_id, sample_name, analysis_date, workflow_name', 'sample_id'),
+            'sample_adn_qc': self._select_all(
+                'sample_adn_qc',
+                'sample_id, median_reads_per_amplicon, uniformity_of_base_coverage, mapd',
+                'sample_id'
+            ),
+            'sample_arn_qc': self._select_all('sample_arn_qc', 'sample_id, fusion_qc', 'sample_id'),
+        }
+
+    # ---------- Análisis molecular ----------
+    def get_molecular(self, sample_ids, detail=False, with_sample=True):
+        """{tabla: filas} de sample, mutation, cnv y arn_alteration (columnas de resumen y, si detail, de detalle).
+
+        Con with_sample=False no se consulta sample (quien ya tiene los nombres).
+        """
+        data = {}
+        if with_sample:
+            data['sample'] = self._select('sample', 'sample_id, sample_name', 'sample_id', sample_ids)
+        for table in MOLECULAR_TABLES:
+            record_type = RECORD_TYPES[table]
+            columns = record_type.SUMMARY_COLUMNS
+            if detail:
+                columns = ', '.join([columns, *(c.strip() for c in record_type.DETAIL_COLUMNS.split(',')[1:])])
+            data[table] = self._select(table, columns, 'sample_id', sample_ids)
+        return data
+
+    def get_variant_details(self, table, row_ids):
+        """Columnas de detalle (informe/búsqueda) de unas filas de mutation, cnv o arn_alteration"""
+        return self._select(table, RECORD_TYPES[table].DETAIL_COLUMNS, MOLECULAR_TABLES[table], row_ids)
+
+    def list_mutation_keys(self, since_id=None):
+        """Variante y clasificación de todas las mutaciones (o desde un mutation_id) para el índice de recurrencia"""
+        return self._select_all(
+            'mutation', 'mutation_id, sample_id, gene, coding, protein, clasificacion_hgua',
+            'mutation_id', 'mutation_id', since_id
+        )
+
+    def update_classification(self, table, row_ids, new_class):
+        """Guarda la misma clasificación en varias filas; devuelve los IDs actualizados"""
+        id_column = MOLECULAR_TABLES[table]
+        rows = self._update(table, {'clasificacion_hgua': new_class}, id_column, row_ids)
+        return {row[id_column] for row in rows}
+
+    # ---------- Carga de resultados ----------
+    def find_samples(self, sample_names):
+        """sample_id y sample_name de las muestras con esos nombres"""
+        return self._select('sample', 'sample_id, sample_name', 'sample_name', sample_names)
+
+    def insert_samples(self, samples, replacing=()):
+        """Inserta muestras completas: dicts con la fila de `sample` y las filas
+        de cada tabla hija (sin sample_id). Devuelve {sample_name: sample_id}.
+
+        `replacing` son los IDs de muestras con el mismo nombre que se van a
+        borrar después (no se confunden con las nuevas). Sin transacciones
+        (Supabase), si falla una tabla se borran las muestras del lote, así un
+        reintento no encuentra muestras a medias.
+        """
+        if not samples:
+            return {}
+        replacing = set(replacing)
+        with self.transaction():
+            self._insert('sample', [sample['sample'] for sample in samples])
+            ids = {
+                row['sample_name']: row['sample_id']
+                for row in self.find_samples([sample['sample']['sample_name'] for sample in samples])
+                if row['sample_id'] not in replacing
+            }
+            try:
+                for table in SAMPLE_CHILD_TABLES:
+                    self._insert(table, [
+                        {**row, 'sample_id': ids[sample['sample']['sample_name']]}
+                        for sample in samples for row in sample[table]
+                    ])
+            except Exception:
+                self.delete_samples(ids.values())
+                raise
+        return ids
+
+    def delete_samples(self, sample_ids):
+        """Borra muestras con su QC y variantes"""
+        sample_ids = list(sample_ids)
+        with self.transaction():
+            for table in reversed(SAMPLE_CHILD_TABLES):
+                self._delete(table, 'sample_id', sample_ids)
+            self._delete('sample', 'sample_id', sample_ids)
+
+
+# =====================================================
+# SUPABASE
+# =====================================================
+class SupabaseRepository(Repository):
+    # PostgREST devuelve como máximo 1000 filas por petición
+    PAGE_SIZE = 1000
+    # Valores por filtro in_(): van en la URL y con miles de IDs la petición
+    # supera el límite de longitud del servidor (unos 8 KB)
+    MAX_IN_VALUES = 200
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def _chunks(self, values):
+        values = list(values)
+        return [values[start:start + self.MAX_IN_VALUES] for start in range(0, len(values), self.MAX_IN_VALUES)]
+
+    def _paged(self, table, columns, order_column, where=lambda query: query):
+        """Ejecuta la consulta por páginas de PAGE_SIZE filas hasta agotarla.
+
+        La primera página pide también el total (count='exact'): con él no
+        hace falta otra petición para saber que una página completa era la
+        última. Si el servidor no lo devuelve, se para en la primera página corta.
+        """
+        rows = []
+        total = None
+        while True:
+            start = len(rows)
+            query = self.client.table(table).select(columns, count='exact' if not start else None)
+            query = where(query).order(order_column).range(start, start + self.PAGE_SIZE - 1)
+            response = None
+
+            def run():
+                nonlocal response
+                response = query.execute()
+                return response.data
+
+            page = self._timed(table, run)
+            rows.extend(page)
+            if not start:
+                total = response.count
+            if len(page) < self.PAGE_SIZE or (total is not None and len(rows) >= total):
+                return rows
+
+    def _select(self, table, columns, column, values):
+        rows = []
+        for chunk in self._chunks(values):
+            rows.extend(self._paged(
+                table, columns, ORDER_COLUMNS.get(table, column), lambda query: query.in_(column, chunk)
+            ))
+        return rows
+
+    def _select_all(self, table, columns, key_column, since_column=None, since=None):
+        if since is None:
+            return self._paged(table, columns, key_column)
+        return self._paged(table, columns, key_column, lambda query: query.gte(since_column, since))
+
+    def _update(self, table, values, column, ids):
+        rows = []
+        for chunk in self._chunks(ids):
+            rows.extend(self._timed(
+                table, lambda: self.client.table(table).update(values).in_(column, chunk).execute().data
+            ))
+        return rows
+
+    def _insert(self, table, rows):
+        from postgrest.types import ReturnMethod
+
+        def run(chunk):
+            # Sin devolver las filas insertadas: la respuesta queda vacía
+            self.client.table(table).insert(chunk, returning=ReturnMethod.minimal).execute()
+            return chunk
+
+        for start in range(0, len(rows), self.PAGE_SIZE):
+            chunk = rows[start:start + self.PAGE_SIZE]
+            self._timed(table, lambda: run(chunk))
+
+    def _delete(self, table, column, ids):
+        for chunk in self._chunks(ids):
+            self._timed(table, lambda: self.client.table(table).delete().in_(column, chunk).execute().data)
+
+
+# =====================================================
+# SQLITE
+# =====================================================
+class SQLiteRepository(Repository):
+    # Límite prudente de parámetros por sentencia en SQLite
+    MAX_VARIABLES = 900
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._connections = threading.local()
+        with self.transaction():
+            self.connect().executescript(SCHEMA)
+
+    def connect(self):
+        """Conexión del hilo actual (sqlite3 no comparte conexiones entre hilos)"""
+        conn = getattr(self._connections, 'conn', None)
+        if conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._connections.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """COMMIT (o ROLLBACK) al salir del bloque más externo"""
+        depth = getattr(self._connections, 'depth', 0)
+        self._connections.depth = depth + 1
+        try:
+            if depth:
+                yield
+            else:
+                with self.connect():
+                    yield
+        finally:
+            self._connections.depth = depth
+
+    def _query(self, sql, params=()):
+        return [dict(row) for row in self.connect().execute(sql, params).fetchall()]
+
+    def _select(self, table, columns, column, values):
+        values = list(values)
+        if not values:
+            return []
+
+        def run():
+            rows = []
+            for start in range(0, len(values), self.MAX_VARIABLES):
+                chunk = values[start:start + self.MAX_VARIABLES]
+                rows.extend(self._query(
+                    f"SELECT {columns} FROM {table} WHERE {column} IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ))
+            return rows
+
+        return self._timed(table, run)
+
+    def _select_all(self, table, columns, key_column, since_column=None, since=None):
+        if since is None:
+            return self._timed(table, lambda: self._query(f"SELECT {columns} FROM {table}"))
+        return self._timed(table, lambda: self._query(
+            f"SELECT {columns} FROM {table} WHERE {since_column} >= ?", (since,)
+        ))
+
+    def _update(self, table, values, column, ids):
+        ids = list(ids)
+        if not ids:
+            return []
+
+        def run():
+            conn = self.connect()
+            assignments = ', '.join(f"{name} = ?" for name in values)
+            rows = []
+            with self.transaction():
+                for start in range(0, len(ids), self.MAX_VARIABLES):
+                    chunk = ids[start:start + self.MAX_VARIABLES]
+                    placeholders = ', '.join('?' * len(chunk))
+                    conn.execute(
+                        f"UPDATE {table} SET {assignments} WHERE {column} IN ({placeholders})",
+                        [*values.values(), *chunk]
+                    )
+                    rows.extend(self._query(f"SELECT * FROM {table} WHERE {column} IN ({placeholders})", chunk))
+            return rows
+
+        return self._timed(table, run)
+
+    def _insert(self, table, rows):
+        if not rows:
+            return
+        columns = list(rows[0])
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+        def run():
+            with self.transaction():
+                self.connect().executemany(sql, ([row[name] for name in columns] for row in rows))
+            return rows
+
+        self._timed(table, run)
+
+    def _delete(self, table, column, ids):
+        ids = list(ids)
+        if not ids:
+            return
+
+        def run():
+            with self.transaction():
+                for start in range(0, len(ids), self.MAX_VARIABLES):
+                    chunk = ids[start:start + self.MAX_VARIABLES]
+                    self.connect().execute(
+                        f"DELETE FROM {table} WHERE {column} IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+            return []
+
+        self._timed(table, run)
+
+    def columns(self, table):
+        """Nombres de las columnas de `table`"""
+        return [row['name'] for row in self._query(f"PRAGMA table_info({table})")]
+
+    def upsert(self, table, rows):
+        """INSERT OR REPLACE por clave primaria (réplica local)"""
+        if not rows:
+            return
+        columns = list(rows[0])
+        sql = (f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+
+        def run():
+            with self.transaction():
+                self.connect().executemany(sql, ([row[name] for name in columns] for row in rows))
+            return rows
+
+        self._timed(table, run)
+
+
+# =====================================================
+# RÉPLICA LOCAL
+# =====================================================
+class MirroredRepository(Repository):
+    """Repositorio remoto (Supabase) con todas las lecturas servidas desde una
+    réplica SQLite local.
+
+    La primera sincronización copia todas las tablas; después, en cada
+    pasada, sólo se traen las filas nuevas (clave mayor que la última local)
+    y las muestras borradas en el remoto. Cada `full_refresh_seconds` se
+    repasan todas las claves de cada tabla: llegan las filas con clave menor
+    confirmadas tarde (dos cargas a la vez) y se borran las que ya no están
+    (variantes sueltas). Las ediciones desde otro nodo llegan:
+
+    - con `change_column` (p. ej. una columna `updated_at` mantenida por un
+      trigger en Supabase), en cada pasada, las filas de
+      mutation/cnv/arn_alteration cambiadas desde la última marca;
+    - sin ella, en el repaso completo, comparando las filas enteras.
+
+    Si el remoto falla o va lento, las lecturas siguen saliendo de la
+    réplica; el error queda en `status()`.
+    """
+
+    def __init__(self, remote, local, change_column=None, full_refresh_seconds=900):
+        super().__init__()
+        self.remote = remote
+        self.local = local
+        self.change_column = change_column
+        self.full_refresh_seconds = full_refresh_seconds
+        # Las estadísticas del hilo incluyen las consultas de los dos repositorios
+        remote._local = local._local = self._local
+        # WAL: las lecturas no esperan a la sincronización
+        local.connect().execute("PRAGMA journal_mode=WAL")
+        self._columns = {table: set(local.columns(table)) for table in ROW_KEYS}
+        self._sync_lock = threading.Lock()
+        self._thread = None
+        self.last_sync = None
+        # El repaso completo lo hace la primera pasada de `open`
+        self.last_full_refresh = time.monotonic()
+        self.last_error = None
+
+    # ---------- Primitivas ----------
+    def _select(self, table, columns, column, values):
+        return self.local._select(table, columns, column, values)
+
+    def _select_all(self, table, columns, key_column, since_column=None, since=None):
+        return self.local._select_all(table, columns, key_column, since_column, since)
+
+    def _update(self, table, values, column, ids):
+        rows = self.remote._update(table, values, column, ids)
+        self.local.upsert(table, [self._local_row(table, row) for row in rows])
+        return rows
+
+    def _insert(self, table, rows):
+        self.remote._insert(table, rows)
+        # Las claves las asigna el remoto: se traen las filas nuevas
+        with self._sync_lock:
+            self._pull_new(table)
+
+    def _delete(self, table, column, ids):
+        ids = list(ids)
+        self.remote._delete(table, column, ids)
+        self.local._delete(table, column, ids)
+
+    def transaction(self):
+        return self.remote.transaction()
+
+    # ---------- Sincronización ----------
+    def _local_row(self, table, row):
+        """Sólo las columnas que existen en la réplica"""
+        return {name: value for name, value in row.items() if name in self._columns[table]}
+
+    def _state(self, name):
+        rows = self.local._query("SELECT value FROM mirror_state WHERE name = ?", (name,))
+        return rows[0]['value'] if rows else None
+
+    def _set_state(self, name, value):
+        with self.local.transaction():
+            self.local.connect().execute(
+                "INSERT OR REPLACE INTO mirror_state (name, value) VALUES (?, ?)", (name, value)
+            )
+
+    def _pull_new(self, table):
+        """Filas del remoto con clave mayor que la última de la réplica"""
+        key = ROW_KEYS[table]
+        last = self.local._query(f"SELECT MAX({key}) AS last FROM {table}")[0]['last']
+        rows = self.remote._select_all(table, '*', key, key, None if last is None else last + 1)
+        self.local.upsert(table, [self._local_row(table, row) for row in rows])
+        return len(rows)
+
+    def _pull_deleted(self):
+        """Borra de la réplica las muestras que ya no están en el remoto (recargas de carreras)"""
+        remote_ids = {row['sample_id'] for row in self.remote._select_all('sample', 'sample_id', 'sample_id')}
+        local_ids = {row['sample_id'] for row in self.local._select_all('sample', 'sample_id', 'sample_id')}
+        if local_ids - remote_ids:
+            self.local.delete_samples(local_ids - remote_ids)
+        return len(local_ids - remote_ids)
+
+    def _pull_changed(self):
+        """Filas de variantes modificadas desde la última marca de `change_column`"""
+        changed = 0
+        for table, key in MOLECULAR_TABLES.items():
+            mark = f'{table}.{self.change_column}'
+            since = self._state(mark)
+            rows = self.remote._select_all(table, '*', key, self.change_column, since)
+            if rows:
+                self.local.upsert(table, [self._local_row(table, row) for row in rows])
+                # Filas sin marca (anteriores al trigger) no mueven la marca
+                marks = [row[self.change_column] for row in rows if row[self.change_column] is not None]
+                if marks:
+                    self._set_state(mark, str(max(marks)))
+                changed += len(rows)
+        return changed
+
+    def _reconcile(self, table):
+        """Repaso completo de una tabla: (IDs nuevos o cambiados que se traen, IDs que ya no están).
+
+        Con `change_column` sólo se comparan las claves (las ediciones llegan
+        por `_pull_changed`); sin ella, las filas enteras.
+        """
+        key = ROW_KEYS[table]
+        columns = key if self.change_column else '*'
+        remote = {row[key]: row for row in self.remote._select_all(table, columns, key)}
+        local = {row[key]: row for row in self.local._select_all(table, columns, key)}
+
+        if self.change_column:
+            missing = [row_id for row_id in remote if row_id not in local]
+            rows = [self._local_row(table, row) for row in self.remote._select(table, '*', key, missing)]
+        else:
+            rows = [
+                self._local_row(table, row) for row_id, row in remote.items()
+                if self._local_row(table, row) != local.get(row_id)
+            ]
+        self.local.upsert(table, rows)
+        return [row[key] for row in rows], [row_id for row_id in local if row_id not in remote]
+
+    def has_data(self):
+        """Si la réplica ya tiene muestras (se puede servir sin esperar al remoto)"""
+        return bool(self.local._query("SELECT 1 FROM sample LIMIT 1"))
+
+    def sync(self, full=False):
+        """Trae del remoto los cambios desde la última sincronización.
+
+        Devuelve {'new', 'deleted', 'changed'} (filas); `full` fuerza el
+        repaso completo de claves (y de filas, sin `change_column`).
+        """
+        with self._sync_lock:
+            counts = {'new': 0, 'deleted': 0, 'changed': 0}
+            # sample primero: las tablas hijas apuntan a sus IDs
+            tables = ('sample', *SAMPLE_CHILD_TABLES)
+            for table in tables:
+                counts['new'] += self._pull_new(table)
+            counts['deleted'] = self._pull_deleted()
+            if self.change_column:
+                counts['changed'] = self._pull_changed()
+
+            if full or time.monotonic() - self.last_full_refresh >= self.full_refresh_seconds:
+                gone = {}
+                for table in tables:
+                    pulled, gone[table] = self._reconcile(table)
+                    counts['changed'] += len(pulled)
+                # Borrados de las hijas hacia sample
+                for table in reversed(tables):
+                    self.local._delete(table, ROW_KEYS[table], gone[table])
+                    counts['deleted'] += len(gone[table])
+                self.last_full_refresh = time.monotonic()
+
+            self.last_sync = time.time()
+            self.last_error = None
+            return counts
+
+    def _sync_safely(self, full=False):
+        try:
+            self.sync(full)
+        except Exception as error:
+            # La réplica sigue sirviendo lecturas con los últimos datos
+            self.last_error = str(error)
+
+    def start(self, interval=30, full=True):
+        """Sincroniza en un hilo de fondo: una pasada al momento (completa si `full`) y luego cada `interval` segundos"""
+        if self._thread is not None:
+            return
+
+        def run():
+            self._sync_safely(full)
+            while True:
+                time.sleep(interval)
+                self._sync_safely()
+
+        self._thread = threading.Thread(target=run, name='repository-mirror', daemon=True)
+        self._thread.start()
+
+    def open(self, interval=30, background=True):
+        """Deja la réplica lista para servir lecturas.
+
+        Sólo se espera al remoto si la réplica está vacía; si no, se sirve lo
+        que haya en disco y el repaso completo va en el hilo de fondo. Sin
+        `background` (scripts), una pasada incremental y sin hilo.
+        """
+        synced = False
+        if not self.has_data():
+            self._sync_safely(full=True)
+            synced = self.last_error is None
+        if background:
+            self.start(interval, full=not synced)
+        elif not synced:
+            self._sync_safely()
+        return self
+
+    def status(self):
+        """Hora de la última sincronización correcta y último error (None si no hubo)"""
+        return {'last_sync': self.last_sync, 'error': self.last_error}
+
+
+def create_repository(backend='supabase', **options):
+    """Crea el repositorio: backend 'supabase' (url, key), 'sqlite' (path) o
+    'mirror' (url, key, path de la réplica y opcionalmente change_column,
+    interval de sincronización en segundos y background=False para scripts)"""
+    if backend == 'sqlite':
+        return SQLiteRepository(options.get('path') or 'genomica.sqlite')
+    if backend == 'supabase':
+        from supabase import create_client
+        return SupabaseRepository(create_client(options['url'], options['key']))
+    if backend == 'mirror':
+        repo = MirroredRepository(
+            create_repository('supabase', url=options['url'], key=options['key']),
+            SQLiteRepository(options.get('path') or 'genomica_mirror.sqlite'),
+            change_column=options.get('change_column'),
+        )
+        return repo.open(options.get('interval') or 30, background=options.get('background', True))
+    raise ValueError(f"Backend desconocido: {backend}")
+
+
+def repository_from_env():
+    """Repositorio configurado con DB_BACKEND, SQLITE_PATH (o MIRROR_PATH), SUPABASE_URL,
+    SUPABASE_KEY y MIRROR_CHANGE_COLUMN (scripts)"""
+    backend = os.environ.get('DB_BACKEND', 'supabase')
+    return create_repository(
+        backend,
+        path=os.environ.get('MIRROR_PATH' if backend == 'mirror' else 'SQLITE_PATH'),
+        url=os.environ.get('SUPABASE_URL'),
+        key=os.environ.get('SUPABASE_KEY'),
+        change_column=os.environ.get('MIRROR_CHANGE_COLUMN'),
+        # Un script termina enseguida: sin hilo de sincronización
+        background=False,
+    )
@@ -0,0 +1,217 @@
+"""Índice en memoria de nombres de muestra para el buscador.
+
+Los nombres siguen el esquema [Año][Tipo][Número] (25B16796 → 2025, B, 16796).
+El índice responde a búsquedas por prefijo, filtros de año/tipo y "últimas N"
+sin ir al servidor; sólo se piden a la base de datos las filas que se muestran.
+"""
+import bisect
+import heapq
+import re
+import threading
+from collections import Counter, namedtuple
+
+SAMPLE_NAME_RE = re.compile(r'^\s*(\d{2})([A-Za-z]+)(\d+)\s*$')
+
+NombreMuestra = namedtuple('NombreMuestra', ['year', 'type', 'number'])
+
+# Orden de la tabla: analysis_date desc (nulos al final), sample_id desc.
+# Internamente se guarda ascendente con esta clave y se recorre al revés.
+def sort_key(analysis_date, sample_id):
+    return (analysis_date is not None, analysis_date or '', sample_id)
+
+def parse_sample_name(name):
+    """'25B16796' → NombreMuestra(year=2025, type='B', number=16796); None si no sigue el esquema"""
+    match = SAMPLE_NAME_RE.match(name or '')
+    if not match:
+        return None
+    year, sample_type, number = match.groups()
+    return NombreMuestra(2000 + int(year), sample_type.upper(), int(number))
+
+
+def _group(parsed):
+    """Grupo año+tipo de un nombre ('25B'); None si no sigue el esquema"""
+    return f"{parsed.year % 100:02d}{parsed.type}" if parsed else None
+
+
+class SampleIndex:
+    """Índice de (sample_id, sample_name, analysis_date).
+
+    - `_by_name`: lista ordenada de (NOMBRE, sample_id) → prefijos con bisect
+    - `_by_group`: por grupo año+tipo, lista ordenada de claves de orden →
+      "últimas N" y filtros de año/tipo recorriendo sólo los grupos que aplican
+    - `_entries`: sample_id → (NOMBRE, clave, NombreMuestra, nombre original)
+    """
+
+    def __init__(self, rows=()):
+        self._by_name = []
+        self._by_group = {}
+        self._entries = {}
+        self._years = Counter()
+        self._types = Counter()
+        self.max_date = None
+        self.refreshed_at = self.built_at = 0.0
+        # Compartido entre sesiones de Streamlit (hilos)
+        self.lock = threading.RLock()
+        self.update(rows)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, rows):
+        """Añade o actualiza filas (dicts con sample_id, sample_name, analysis_date)"""
+        with self.lock:
+            self._update(list(rows))
+
+    def _update(self, rows):
+        # Con muchas filas es más rápido reordenar todo que insertar una a una
+        bulk = len(rows) > 64
+
+        # Primero se quitan las que cambian: en bloque, las listas no están
+        # ordenadas hasta el final y `_remove` usa bisect
+        pending = []
+        for row in {row['sample_id']: row for row in rows}.values():
+            sample_id = row['sample_id']
+            display = row['sample_name'] or ''
+            key = sort_key(row['analysis_date'], sample_id)
+
+            old = self._entries.get(sample_id)
+            if old is not None:
+                if old[3] == display and old[1] == key:
+                    continue
+                self._remove(sample_id, old)
+            pending.append((row, display, key))
+
+        for row, display, key in pending:
+            sample_id = row['sample_id']
+            name = display.upper()
+            parsed = parse_sample_name(name)
+            self._entries[sample_id] = (name, key, parsed, display)
+            if parsed:
+                self._years[parsed.year] += 1
+                self._types[parsed.type] += 1
+
+            group = self._by_group.setdefault(_group(parsed), [])
+            if bulk:
+                self._by_name.append((name, sample_id))
+                group.append(key)
+            else:
+                bisect.insort(self._by_name, (name, sample_id))
+                bisect.insort(group, key)
+
+            if row['analysis_date'] is not None and (self.max_date is None or row['analysis_date'] > self.max_date):
+                self.max_date = row['analysis_date']
+
+        if bulk:
+            self._by_name.sort()
+            for group in self._by_group.values():
+                group.sort()
+
+    def _remove(self, sample_id, entry):
+        name, key, parsed, _ = entry
+        if parsed:
+            self._years[parsed.year] -= 1
+            self._types[parsed.type] -= 1
+        del self._by_name[bisect.bisect_left(self._by_name, (name, sample_id))]
+        group = self._by_group[_group(parsed)]
+        del group[bisect.bisect_left(group, key)]
+
+    def name(self, sample_id):
+        """Nombre de la muestra tal como está en la base de datos (None si no está en el índice)"""
+        entry = self._entries.get(sample_id)
+        return entry[3] if entry else None
+
+    def cursor(self, sample_id):
+        """(analysis_date, sample_id) de la muestra, como `cursor` de `page`"""
+        entry = self._entries.get(sample_id)
+        key = entry[1] if entry else sort_key(None, sample_id)
+        return (key[1] if key[0] else None, sample_id)
+
+    def order_key(self, sample_id):
+        """Clave de orden de la muestra (más reciente = mayor); sin fecha si no está en el índice"""
+        entry = self._entries.get(sample_id)
+        return entry[1] if entry else sort_key(None, sample_id)
+
+    def years(self):
+        with self.lock:
+            return sorted((y for y, n in self._years.items() if n), reverse=True)
+
+    def types(self):
+        with self.lock:
+            return sorted(t for t, n in self._types.items() if n)
+
+    def page(self, prefix=None, cursor=None, limit=20, year=None, sample_type=None):
+        """IDs de una página en el orden de la tabla y si hay página siguiente.
+
+        `cursor` es (analysis_date, sample_id) de la última fila de la página
+        anterior, como en la paginación por clave del servidor.
+        """
+        with self.lock:
+            return self._page(prefix, cursor, limit, year, sample_type)
+
+    def _page(self, prefix, cursor, limit, year, sample_type):
+        prefix = (prefix or '').strip().upper()
+        cursor_key = sort_key(*cursor) if cursor is not None else None
+        wanted = limit + 1
+
+        def matches(entry):
+            parsed = entry[2]
+            if year is not None and (parsed is None or parsed.year != year):
+                return False
+            if sample_type is not None and (parsed is None or parsed.type != sample_type):
+                return False
+            return entry[0].startswith(prefix)
+
+        # Grupos año+tipo compatibles con los filtros y el prefijo
+        groups = []
+        for group, keys in self._by_group.items():
+            if group is None:
+                if year is None and sample_type is None:
+                    groups.append(keys)
+                continue
+            parsed = parse_sample_name(group + '0')
+            if year is not None and parsed.year != year:
+                continue
+            if sample_type is not None and parsed.type != sample_type:
+                continue
+            if group.startswith(prefix) or prefix.startswith(group):
+                groups.append(keys)
+
+        in_groups = sum(len(keys) for keys in groups)
+        if prefix:
+            lo = bisect.bisect_left(self._by_name, (prefix,))
+            hi = bisect.bisect_left(self._by_name, (prefix + '\uffff',))
+        else:
+            lo, hi = 0, len(self._by_name)
+        matched = min(hi - lo, in_groups)
+        if not matched:
+            return [], False
+
+        # Dos estrategias según lo selectivo que sea el prefijo:
+        # - pocas coincidencias: ordenar sólo ésas por fecha (heap)
+        # - muchas: recorrer los grupos por fecha descartando las que no coinciden
+        # Se elige la que recorre menos entradas. El heap recorre las `matched`
+        # que empiezan por el prefijo; recorriendo por fecha, si las
+        # coincidencias están repartidas entre las `in_groups` claves (una de
+        # cada in_groups / matched), reunir `wanted` cuesta unas:
+        scan_cost = wanted * in_groups / matched
+        if prefix and matched < scan_cost:
+            keys = []
+            for _, sample_id in self._by_name[lo:hi]:
+                entry = self._entries[sample_id]
+                if (cursor_key is None or entry[1] < cursor_key) and matches(entry):
+                    keys.append(entry[1])
+            keys = heapq.nlargest(wanted, keys)
+        else:
+            def descending(group_keys):
+                end = len(group_keys) if cursor_key is None else bisect.bisect_left(group_keys, cursor_key)
+                for i in range(end - 1, -1, -1):
+                    yield group_keys[i]
+
+            keys = []
+            for key in heapq.merge(*(descending(g) for g in groups), reverse=True):
+                if matches(self._entries[key[2]]):
+                    keys.append(key)
+                    if len(keys) == wanted:
+                        break
+
+        return [key[2] for key in keys[:limit]], len(keys) > limit
@@ -0,0 +1,55 @@
+"""Fixtures comunes: caché y volcado de CIViC en ficheros temporales, sin red."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import civic_cache  # noqa: E402
+import civic_snapshot  # noqa: E402
+import civicdb  # noqa: E402
+
+# Volcado mínimo de CIViC (nightly TSV) con alias y un perfil molecular
+VARIANTS_TSV = (
+    "variant_id\tgene\tvariant\tvariant_aliases\tvariant_civic_url\n"
+    "12\tBRAF\tV600E\tVAL600GLU,RS113488022\thttps://civicdb.org/variants/12/summary\n"
+    "13\tEGFR\tE746_A750del\t\t\n"
+    "14\tTP53\tR213*\tARG213TER\t\n"
+    "15\tBRAF\tV600\tV600E\t\n"
+)
+EVIDENCE_TSV = (
+    "evidence_id\tvariant_id\tmolecular_profile_id\tevidence_level\tsignificance\t"
+    "evidence_statement\ttherapies\tevidence_status\n"
+    "1\t12\t\tB\tSensitivity\tBRAF V600E responde\tVemurafenib\taccepted\n"
+    "2\t12\t\tA\tSensitivity\tBRAF V600E validado\tDabrafenib, Trametinib\taccepted\n"
+    "3\t\t100\tC\tResistance\tEGFR del19 por perfil\tOsimertinib\taccepted\n"
+    "4\t14\t\tA\tOncogenic\tRechazada\t\trejected\n"
+)
+PROFILES_TSV = "molecular_profile_id\tvariant_ids\n100\t13\n"
+
+
+@pytest.fixture
+def volcado(tmp_path):
+    """Rutas (variants, evidence, profiles) de un volcado pequeño de CIViC"""
+    paths = []
+    for name, content in (('variants.tsv', VARIANTS_TSV), ('evidence.tsv', EVIDENCE_TSV),
+                          ('profiles.tsv', PROFILES_TSV)):
+        path = tmp_path / name
+        path.write_text(content, encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def civic(tmp_path, monkeypatch):
+    """civicdb con caché nueva, sin volcado local, circuito cerrado y esperas cortas"""
+    monkeypatch.setattr(civicdb, '_cache', civic_cache.CacheCivic(str(tmp_path / 'civic_cache.sqlite')))
+    monkeypatch.setattr(civicdb, 'circuito', civicdb.CircuitBreaker(umbral=3, enfriamiento=0.2))
+    monkeypatch.setattr(civic_snapshot, 'obtener_snapshot', lambda *args, **kwargs: None)
+    monkeypatch.setattr(civicdb, 'TIMEOUT', 0.5)
+    monkeypatch.setattr(civicdb, 'PRESUPUESTO', 2.0)
+    monkeypatch.setattr(civicdb, 'ESPERA_BASE', 0.01)
+    return civicdb
@@ -0,0 +1,35 @@
+"""Comprobaciones estáticas de app.py (el script de Streamlit no se puede importar en las pruebas)."""
+import ast
+import os
+
+from conftest import ROOT
+
+with open(os.path.join(ROOT, 'app.py'), encoding='utf-8') as f:
+    APP = ast.parse(f.read())
+
+
+def asignacion(name):
+    node = next(node for node in APP.body
+                if isinstance(node, ast.Assign) and getattr(node.targets[0], 'id', None) == name)
+    return ast.literal_eval(node.value)
+
+
+def llamadas(name):
+    return [node for node in ast.walk(APP)
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name]
+
+
+def test_claves_de_fila_con_prefijo_registrado():
+    prefixes = asignacion('ROW_WIDGET_PREFIXES')
+    assert set(asignacion('CLASS_WIDGET_PREFIXES').values()) <= set(prefixes)
+
+    literales = [call.args[0].value for call in llamadas('row_key') if isinstance(call.args[0], ast.Constant)]
+    assert literales and set(literales) <= set(prefixes)
+
+
+def test_claves_con_id_pasan_por_row_key():
+    # Una clave f"..._{fila.x_id}" escrita a mano no la limpiaría prune_session_state
+    for node in ast.walk(APP):
+        if (isinstance(node, ast.JoinedStr) and isinstance(node.values[0], ast.Constant)
+                and isinstance(node.values[-1], ast.FormattedValue)):
+            assert not ast.unparse(node.values[-1].value).endswith('_id'), ast.unparse(node)
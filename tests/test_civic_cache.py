@@ -0,0 +1,80 @@
+import pytest
+
+from civic_cache import CacheCivic
+
+RESULTADO = {'url': 'https://civicdb.org/variants/12', 'evidencias': [], 'terapias': []}
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj():
+    return Reloj()
+
+
+@pytest.fixture
+def cache(tmp_path, reloj):
+    return CacheCivic(str(tmp_path / 'cache.sqlite'), ttl=100, negative_ttl=10,
+                      max_entries=3, stale_ttl=1000, reloj=reloj)
+
+
+def test_vigente_caducada_servible_y_expirada(cache, reloj):
+    cache.set('BRAF', 'V600E', RESULTADO)
+
+    reloj.ahora += 100
+    assert cache.get_entrada('braf', ' v600e ') == (True, RESULTADO, True)
+    reloj.ahora += 1
+    assert cache.get_entrada('BRAF', 'V600E') == (True, RESULTADO, False)
+    assert cache.get('BRAF', 'V600E') == (False, None)
+
+    reloj.ahora += 1000
+    assert cache.get_entrada('BRAF', 'V600E') == (False, None, False)
+    assert cache.estadisticas()['entradas'] == 0
+
+
+def test_no_encontrado_no_se_sirve_pasado_su_ttl(cache, reloj):
+    cache.set('TP53', 'X1', None)
+
+    reloj.ahora += 10
+    assert cache.get_entrada('TP53', 'X1') == (True, None, True)
+    # Aunque stale_ttl sea mayor, un "no encontrado" caducado ya no vale
+    reloj.ahora += 1
+    assert cache.get_entrada('TP53', 'X1') == (False, None, False)
+
+
+def test_expulsa_la_menos_usada(cache, reloj):
+    for i in range(3):
+        reloj.ahora += 1
+        cache.set('KRAS', f'G12{i}', RESULTADO)
+    reloj.ahora += 1
+    cache.get('KRAS', 'G120')
+
+    reloj.ahora += 1
+    cache.set('KRAS', 'G12D', RESULTADO)
+
+    assert cache.get('KRAS', 'G121') == (False, None)
+    assert all(cache.get('KRAS', v)[0] for v in ['G120', 'G122', 'G12D'])
+    assert cache.estadisticas()['entradas'] == 3
+
+
+def test_contadores(cache, reloj):
+    cache.set('BRAF', 'V600E', RESULTADO)
+    cache.set('TP53', 'X1', None)
+    cache.get('BRAF', 'V600E')
+    cache.get('TP53', 'X1')
+    cache.get('EGFR', 'L858R')
+    reloj.ahora += 101
+    cache.get_entrada('BRAF', 'V600E')
+
+    assert cache.estadisticas() == {
+        'hits': 2, 'misses': 1, 'obsoletos': 1, 'hit_rate': 2 / 3,
+        'entradas': 2, 'no_encontrados': 1,
+    }
+    cache.clear()
+    assert cache.estadisticas()['hits'] == cache.estadisticas()['entradas'] == 0
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from civic_stub import StubCivic
+
+
+@pytest.fixture
+def stub(civic, monkeypatch):
+    with StubCivic('error') as stub:
+        monkeypatch.setattr(civic, 'API_URL', stub.url)
+        yield stub
+
+
+def esperar(condicion, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "tiempo agotado"
+        time.sleep(0.02)
+
+
+def test_error_no_es_no_encontrado_y_no_se_cachea(civic, stub):
+    consulta = civic.buscar('BRAF', 'V600E')
+
+    assert consulta.estado == civic.ERROR
+    assert consulta.error
+    assert civic.obtener_cache().get_entrada('BRAF', 'V600E')[0] is False
+
+
+def test_circuito_abre_y_semiabierto_deja_pasar_una_prueba(civic, stub):
+    civic.buscar('BRAF', 'V600E')
+    assert civic.circuito.estado == 'abierto'
+
+    # Abierto: falla al momento sin llamar al servidor
+    peticiones = stub.peticiones
+    assert civic.buscar('KRAS', 'G12C').estado == civic.ERROR
+    assert stub.peticiones == peticiones
+
+    # Tras el enfriamiento, una prueba que falla vuelve a abrirlo
+    time.sleep(civic.circuito.enfriamiento + 0.05)
+    assert civic.circuito.estado == 'semiabierto'
+    civic.buscar('KRAS', 'G12C')
+    assert stub.peticiones == peticiones + 1
+    assert civic.circuito.estado == 'abierto'
+
+    # Y una prueba que va bien lo cierra
+    time.sleep(civic.circuito.enfriamiento + 0.05)
+    stub.modo = 'ok'
+    assert civic.buscar('KRAS', 'G12C').estado == civic.ENCONTRADO
+    assert civic.circuito.estado == 'cerrado'
+
+
+def test_4xx_no_se_reintenta_ni_abre_el_circuito(civic, stub):
+    stub.modo = 'rechazo'
+
+    for i in range(civic.circuito.umbral + 2):
+        consulta = civic.buscar('BRAF', f'V60{i}E')
+        assert consulta.estado == civic.ERROR
+        assert 'HTTP 400' in str(consulta.error)
+        assert stub.peticiones == i + 1
+
+    assert civic.circuito.estado == 'cerrado'
+    assert civic.obtener_cache().get_entrada('BRAF', 'V600E')[0] is False
+
+
+def test_caducada_se_sirve_al_momento_y_se_revalida(civic, stub):
+    cache = civic.obtener_cache()
+    cache.set('BRAF', 'V600E', {'url': 'antigua', 'evidencias': [], 'terapias': []})
+    cache.ttl = 0.1
+    time.sleep(0.15)
+
+    # Caído: se sirve la caducada sin esperar y sigue en caché
+    start = time.perf_counter()
+    consulta = civic.buscar('BRAF', 'V600E')
+    assert time.perf_counter() - start < 0.1
+    assert consulta.estado == civic.ENCONTRADO
+    assert consulta.obsoleto
+    assert consulta.resultado['url'] == 'antigua'
+    esperar(lambda: not civic._revalidando)
+    assert cache.get_entrada('BRAF', 'V600E')[1]['url'] == 'antigua'
+
+    # Recuperado: la revalidación en segundo plano actualiza la entrada
+    stub.modo = 'ok'
+    civic.circuito.exito()
+    cache.ttl = 60
+    cache.set('BRAF', 'V600E', {'url': 'antigua', 'evidencias': [], 'terapias': []})
+    cache.ttl = 0
+    assert civic.buscar('BRAF', 'V600E').obsoleto
+    cache.ttl = 60
+    esperar(lambda: cache.get_entrada('BRAF', 'V600E')[1]['url'] != 'antigua')
+
+
+def test_parsear_variante_con_campos_null(civic):
+    resultado = civic._parsear_variante({
+        'name': 'V600E',
+        'link': None,
+        'molecularProfiles': {'nodes': [
+            {'evidenceItems': None},
+            {'evidenceItems': {'nodes': [
+                {'evidenceLevel': None, 'significance': 'SENSITIVITY', 'description': None, 'therapies': None},
+                {'evidenceLevel': 'A', 'therapies': {'nodes': [None, {'name': None}, {'name': 'Vemurafenib'}]}},
+            ]}},
+        ]},
+    })
+
+    assert resultado['url'] == 'https://civicdb.org'
+    assert [ev['nivel'] for ev in resultado['evidencias']] == ['', 'A']
+    assert resultado['terapias'] == ['Vemurafenib']
+    assert civic._parsear_variante({'molecularProfiles': None})['evidencias'] == []
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from civic_stub import StubCivic
+
+
+@pytest.fixture
+def stub(civic, monkeypatch):
+    with StubCivic('ok', variantes_con_error={'BOOM'}) as stub:
+        monkeypatch.setattr(civic, 'API_URL', stub.url)
+        yield stub
+
+
+def test_buscar_lote_trocea_y_deduplica(civic, stub):
+    existentes = [('BRAF', 'V600E'), ('KRAS', 'G12C'), ('EGFR', 'L858R'), ('PIK3CA', 'H1047R')]
+    inventadas = [('TP53', f'X{i}') for i in range(56)]
+    pares = existentes + inventadas + [('braf', ' v600e ')]
+
+    resultados, no_encontrados, errores = civic.buscar_lote(pares, chunk_size=25)
+
+    # 60 claves distintas en lotes de 25 → 3 peticiones
+    assert stub.peticiones == 3
+    assert set(resultados) == {*existentes, ('braf', ' v600e ')}
+    assert resultados[('braf', ' v600e ')] == resultados[('BRAF', 'V600E')]
+    assert no_encontrados == inventadas
+    assert errores == []
+
+    # Todo queda en caché (también los no encontrados): no hay más peticiones
+    assert civic.buscar_lote(pares, chunk_size=25)[0].keys() == resultados.keys()
+    assert stub.peticiones == 3
+
+
+def test_buscar_lote_fallo_parcial(civic, stub, monkeypatch):
+    # Sin abrir el circuito: sólo interesa el lote que falla
+    monkeypatch.setattr(civic.circuito, 'umbral', 100)
+    pares = [('BRAF', 'V600E'), ('KRAS', 'G12C'), ('TP53', 'BOOM'), ('EGFR', 'L858R')]
+
+    resultados, no_encontrados, errores = civic.buscar_lote(pares, chunk_size=2)
+
+    assert set(resultados) == {('BRAF', 'V600E'), ('KRAS', 'G12C')}
+    assert no_encontrados == []
+    assert errores == [('TP53', 'BOOM'), ('EGFR', 'L858R')]
+    # Los errores no se cachean: EGFR L858R se vuelve a pedir y ahora sí aparece
+    assert civic.buscar('EGFR', 'L858R').estado == civic.ENCONTRADO
+
+
+def test_buscar_varios_una_peticion_por_lote(civic, stub):
+    pares = [('BRAF', 'V600E'), ('braf', 'V600E'), ('KRAS', 'G12C'), ('TP53', 'X1')]
+
+    estados = {par: consulta.estado for par, consulta in civic.buscar_varios(pares)}
+
+    assert estados == {
+        ('BRAF', 'V600E'): civic.ENCONTRADO,
+        ('KRAS', 'G12C'): civic.ENCONTRADO,
+        ('TP53', 'X1'): civic.NO_ENCONTRADO,
+    }
+    assert stub.peticiones == 1
+
+
+def test_buscar_varios_lotes_en_paralelo(civic, stub):
+    stub.modo, stub.retardo = 'lento', 0.3
+    pares = [('TP53', f'X{i}') for i in range(8)]
+
+    start = time.perf_counter()
+    consultas = list(civic.buscar_varios(pares, chunk_size=2))
+
+    assert len(consultas) == 8 and stub.peticiones == 4
+    assert time.perf_counter() - start < 4 * stub.retardo
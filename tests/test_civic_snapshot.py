@@ -0,0 +1,54 @@
+import civic_snapshot
+import civicdb
+
+
+def test_importar_cuenta_variantes_y_evidencias_aceptadas(volcado, tmp_path):
+    db = str(tmp_path / 'snapshot.sqlite')
+    n_variants, n_evidence = civic_snapshot.importar(*volcado[:2], db, profiles_tsv=volcado[2])
+
+    assert n_variants == 4
+    # La rechazada no entra; la del perfil 100 se asigna a la variante 13
+    assert n_evidence == 3
+
+
+def test_buscar_ordena_evidencias_y_junta_terapias(volcado, tmp_path):
+    db = str(tmp_path / 'snapshot.sqlite')
+    civic_snapshot.importar(*volcado[:2], db, profiles_tsv=volcado[2])
+    snapshot = civic_snapshot.SnapshotCivic(db)
+
+    resultado = snapshot.buscar('braf', ' v600e ')
+    assert resultado['url'] == 'https://civicdb.org/variants/12/summary'
+    assert [ev['nivel'] for ev in resultado['evidencias']] == ['A', 'B']
+    assert resultado['terapias'] == ['Dabrafenib', 'Trametinib', 'Vemurafenib']
+
+    assert snapshot.buscar('EGFR', 'E746_A750del')['terapias'] == ['Osimertinib']
+    assert snapshot.buscar('KRAS', 'G12C') is None
+
+
+def test_alias_y_notacion_hgvs(volcado, tmp_path):
+    db = str(tmp_path / 'snapshot.sqlite')
+    civic_snapshot.importar(*volcado[:2], db, profiles_tsv=volcado[2])
+    snapshot = civic_snapshot.SnapshotCivic(db)
+
+    braf = snapshot.buscar('BRAF', 'V600E')
+    assert snapshot.buscar('BRAF', 'VAL600GLU') is braf
+    assert snapshot.buscar('BRAF', 'p.(Val600Glu)') is braf
+    assert snapshot.buscar('TP53', 'ARG213TER') is snapshot.buscar('TP53', 'R213*')
+    # Un alias nunca tapa el nombre principal de otra variante
+    assert snapshot.buscar('BRAF', 'V600')['url'].endswith('/15/summary')
+
+
+def test_buscar_resuelve_desde_el_volcado_sin_red(volcado, tmp_path, civic, monkeypatch):
+    db = str(tmp_path / 'snapshot.sqlite')
+    civic_snapshot.importar(*volcado[:2], db, profiles_tsv=volcado[2])
+    snapshot = civic_snapshot.SnapshotCivic(db)
+    monkeypatch.setattr(civic_snapshot, 'obtener_snapshot', lambda *args, **kwargs: snapshot)
+
+    def sin_red(*args, **kwargs):
+        raise AssertionError("no debería salir a la red")
+
+    monkeypatch.setattr(civicdb, '_consultar_lote', sin_red)
+
+    consulta = civicdb.buscar('BRAF', 'V600E')
+    assert consulta.estado == civicdb.ENCONTRADO
+    assert not consulta.obsoleto
@@ -0,0 +1,53 @@
+import io
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+pytest.importorskip('docx')
+pytest.importorskip('openpyxl')
+
+import export_reports  # noqa: E402
+from synthetic_data import generate  # noqa: E402
+
+
+@pytest.fixture
+def muestras(tmp_path):
+    repo = generate(str(tmp_path / 'export.sqlite'), n_samples=3)
+    return export_reports.collect(repo, [1, 2, 3])
+
+
+@pytest.fixture
+def pool():
+    pool = export_reports.start_pool(2)
+    yield pool
+    pool.shutdown()
+
+
+def test_el_pool_genera_docx_y_xlsx(pool, muestras):
+    docx = [pool.submit(export_reports.build_docx, muestra) for muestra in muestras]
+    xlsx = pool.submit(export_reports.build_xlsx, muestras)
+
+    for future, muestra in zip(docx, muestras):
+        name, content = future.result(timeout=60)
+        assert name == export_reports.build_docx(muestra)[0]
+        assert zipfile.ZipFile(io.BytesIO(content)).namelist()
+    assert zipfile.ZipFile(io.BytesIO(xlsx.result(timeout=60))).namelist()
+
+
+def test_errores_de_una_tarea_no_rompen_el_pool(pool, muestras):
+    error = pool.submit(export_reports.build_xlsx, None).exception(timeout=60)
+
+    assert isinstance(error, RuntimeError) and 'TypeError' in str(error)
+    assert pool.submit(export_reports.build_xlsx, muestras).result(timeout=60)
+
+
+def test_proceso_muerto_rompe_el_pool(pool, muestras):
+    for proc in pool._procs:
+        proc.kill()
+        proc.wait()
+
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(export_reports.build_xlsx, muestras).result(timeout=60)
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(export_reports.build_xlsx, muestras)
@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from repository import MirroredRepository, SQLiteRepository
+
+
+def muestra(remote, sample_id, name, *genes):
+    remote._insert('sample', [{'sample_id': sample_id, 'sample_name': name, 'analysis_date': '2025-01-01'}])
+    remote._insert('mutation', [
+        {'sample_id': sample_id, 'gene': gene, 'coding': 'c.1A>T', 'clasificacion_hgua': None} for gene in genes
+    ])
+
+
+def mutaciones(repo):
+    return {
+        row['mutation_id']: (row['gene'], row['clasificacion_hgua'])
+        for row in repo._select_all('mutation', 'mutation_id, gene, clasificacion_hgua', 'mutation_id')
+    }
+
+
+@pytest.fixture(params=[None, 'updated_at'], ids=['sin_marca', 'con_marca'])
+def repos(tmp_path, request):
+    remote = SQLiteRepository(str(tmp_path / 'remote.sqlite'))
+    if request.param:
+        # Columna de cambios como la que mantendría un trigger en Supabase
+        remote.connect().execute("ALTER TABLE mutation ADD COLUMN updated_at TEXT")
+    muestra(remote, 1, '25B1', 'BRAF', 'KRAS')
+    mirror = MirroredRepository(remote, SQLiteRepository(str(tmp_path / 'local.sqlite')), change_column=request.param)
+    mirror.open(background=False)
+    return remote, mirror
+
+
+def test_primera_apertura_copia_todo(repos):
+    remote, mirror = repos
+    assert mutaciones(mirror) == mutaciones(remote)
+    assert mirror.find_samples(['25B1'])[0]['sample_id'] == 1
+
+
+def test_filas_nuevas_llegan_en_cada_pasada(repos):
+    remote, mirror = repos
+    muestra(remote, 2, '25B2', 'EGFR')
+
+    assert mirror.sync()['new'] == 2
+    assert mutaciones(mirror) == mutaciones(remote)
+
+
+def test_clave_menor_confirmada_tarde_llega_en_el_repaso(repos):
+    remote, mirror = repos
+    muestra(remote, 2, '25B2', 'EGFR')
+    mirror.sync()
+    # Una carga concurrente confirma después una mutación con ID anterior
+    remote._insert('mutation', [{'mutation_id': 0, 'sample_id': 1, 'gene': 'TP53', 'clasificacion_hgua': None}])
+
+    mirror.sync(full=True)
+    assert mutaciones(mirror) == mutaciones(remote)
+
+
+def test_borrados_de_muestras_y_de_variantes_sueltas(repos):
+    remote, mirror = repos
+    muestra(remote, 2, '25B2', 'EGFR')
+    mirror.sync()
+
+    remote.delete_samples([2])
+    assert mirror.sync()['deleted'] == 1
+    assert mirror.find_samples(['25B2']) == []
+
+    kras = next(i for i, (gene, _) in mutaciones(remote).items() if gene == 'KRAS')
+    remote._delete('mutation', 'mutation_id', [kras])
+    assert mirror.sync(full=True)['deleted'] == 1
+    assert mutaciones(mirror) == mutaciones(remote)
+
+
+def test_reclasificadas_y_editadas_en_el_remoto(repos):
+    remote, mirror = repos
+    braf = next(i for i, (gene, _) in mutaciones(remote).items() if gene == 'BRAF')
+    values = {'clasificacion_hgua': 'Patogénica', 'gene': 'BRAF1'}
+    if mirror.change_column:
+        values[mirror.change_column] = '2025-06-01T00:00:00'
+    remote._update('mutation', values, 'mutation_id', [braf])
+
+    mirror.sync(full=True)
+    assert mutaciones(mirror)[braf] == ('BRAF1', 'Patogénica')
+
+
+def test_escrituras_van_al_remoto_y_a_la_replica(repos):
+    remote, mirror = repos
+    braf = next(i for i, (gene, _) in mutaciones(remote).items() if gene == 'BRAF')
+    mirror.update_classification('mutation', [braf], 'Benigna')
+
+    assert mutaciones(remote)[braf][1] == mutaciones(mirror)[braf][1] == 'Benigna'
+
+
+def test_con_replica_no_espera_al_remoto(tmp_path):
+    remote = SQLiteRepository(str(tmp_path / 'remote.sqlite'))
+    muestra(remote, 1, '25B1', 'BRAF')
+    local = SQLiteRepository(str(tmp_path / 'local.sqlite'))
+    MirroredRepository(remote, local).open(background=False)
+
+    # Remoto colgado: la apertura sirve la réplica y sincroniza en segundo plano
+    liberar = threading.Event()
+    lento = SQLiteRepository(str(tmp_path / 'remote.sqlite'))
+    original = lento._select_all
+    lento._select_all = lambda *args: liberar.wait(5) and original(*args)
+    mirror = MirroredRepository(lento, local).open(interval=3600)
+    try:
+        assert mirror.find_samples(['25B1'])[0]['sample_id'] == 1
+        assert mirror.last_sync is None
+    finally:
+        liberar.set()
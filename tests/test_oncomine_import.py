@@ -0,0 +1,84 @@
+import contextlib
+
+import pytest
+
+import oncomine_import
+from repository import SQLiteRepository
+
+
+class SinTransacciones(SQLiteRepository):
+    """SQLite que se comporta como Supabase: cada escritura va por su cuenta"""
+
+    falla_en = None
+
+    def transaction(self):
+        return contextlib.nullcontext()
+
+    def _insert(self, table, rows):
+        if table == self.falla_en:
+            raise RuntimeError(f"fallo insertando {table}")
+        super()._insert(table, rows)
+
+
+def muestra(name, *mutaciones):
+    columnas = oncomine_import.COLUMNS['mutation']
+    return {
+        'sample': {'sample_name': name, 'analysis_date': '2025-01-01', 'workflow_name': 'OCA'},
+        'sample_adn_qc': [], 'sample_arn_qc': [], 'cnv': [], 'arn_alteration': [],
+        'mutation': [
+            {**dict.fromkeys(columnas), 'gene': gene, 'coding': coding} for gene, coding in mutaciones
+        ],
+    }
+
+
+def resumen():
+    return {'muestras': 0, 'reemplazadas': 0, 'omitidas': [],
+            'filas': {table: 0 for table in oncomine_import.SAMPLE_CHILD_TABLES}}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = SinTransacciones(str(tmp_path / 'import.sqlite'))
+    oncomine_import._escribir_lote(repo, [muestra('25B1', ('BRAF', 'c.1799T>A'))], False, resumen())
+    sample_id = repo.find_samples(['25B1'])[0]['sample_id']
+    mutation_id = repo.get_molecular([sample_id])['mutation'][0]['mutation_id']
+    repo._update('mutation', {'clasificacion_hgua': 'Patogénica'}, 'mutation_id', [mutation_id])
+    return repo
+
+
+def mutaciones(repo, name):
+    ids = [row['sample_id'] for row in repo.find_samples([name])]
+    return ids, repo.get_molecular(ids)['mutation']
+
+
+def test_reemplazar_conserva_la_clasificacion(repo):
+    nueva = muestra('25B1', ('BRAF', 'c.1799T>A'), ('KRAS', 'c.35G>A'))
+    oncomine_import._escribir_lote(repo, [nueva], True, resumen())
+
+    ids, rows = mutaciones(repo, '25B1')
+    assert len(ids) == 1
+    assert {row['gene']: row['clasificacion_hgua'] for row in rows} == {'BRAF': 'Patogénica', 'KRAS': None}
+
+
+def test_fallo_al_insertar_no_pierde_la_muestra_anterior(repo):
+    antes = mutaciones(repo, '25B1')
+    repo.falla_en = 'mutation'
+
+    with pytest.raises(RuntimeError):
+        oncomine_import._escribir_lote(repo, [muestra('25B1', ('KRAS', 'c.35G>A'))], True, resumen())
+
+    assert mutaciones(repo, '25B1') == antes
+
+
+def test_reintento_borra_todas_las_anteriores(repo, monkeypatch):
+    # Falla el borrado: quedan la antigua y la nueva
+    monkeypatch.setattr(repo, 'delete_samples', lambda ids: (_ for _ in ()).throw(RuntimeError("caído")))
+    with pytest.raises(RuntimeError):
+        oncomine_import._escribir_lote(repo, [muestra('25B1', ('BRAF', 'c.1799T>A'))], True, resumen())
+    assert len(mutaciones(repo, '25B1')[0]) == 2
+
+    monkeypatch.undo()
+    oncomine_import._escribir_lote(repo, [muestra('25B1', ('BRAF', 'c.1799T>A'))], True, resumen())
+    ids, rows = mutaciones(repo, '25B1')
+    assert len(ids) == 1
+    assert [row['clasificacion_hgua'] for row in rows] == ['Patogénica']
@@ -0,0 +1,41 @@
+from recurrence_index import SIN_RECURRENCIA, RecurrenceIndex, variant_key
+from sample_index import sort_key
+
+BRAF = variant_key('BRAF', 'c.1799T>A', 'p.Val600Glu')
+
+# sample_id → analysis_date (la 4 sin fecha)
+FECHAS = {1: '2025-01-10', 2: '2025-03-01', 3: '2025-02-01', 4: None}
+
+
+def orden(sample_id):
+    return sort_key(FECHAS[sample_id], sample_id)
+
+
+def indice(*clases):
+    return RecurrenceIndex(
+        {'mutation_id': i, 'sample_id': sample_id, 'gene': 'BRAF', 'coding': 'c.1799T>A',
+         'protein': 'p.Val600Glu', 'clasificacion_hgua': clase}
+        for i, (sample_id, clase) in enumerate(clases, 1)
+    )
+
+
+def test_solo_cuenta_muestras_anteriores():
+    index = indice((1, 'Benigna'), (2, 'Patogénica'), (3, 'Probablemente patogénica'))
+
+    # La 3 (febrero) ve la 1 (enero), no la 2 (marzo), aunque tenga menor ID que ésta
+    recurrencia = index.lookup([BRAF], before_sample=3, sample_order=orden)[BRAF]
+    assert recurrencia.n == 1
+    assert recurrencia.ultima == 'Benigna'
+
+    recurrencia = index.lookup([BRAF], before_sample=2, sample_order=orden)[BRAF]
+    assert recurrencia.n == 2
+    assert recurrencia.ultima == 'Probablemente patogénica'
+
+    assert index.lookup([BRAF], before_sample=1, sample_order=orden)[BRAF] is SIN_RECURRENCIA
+
+
+def test_sin_fecha_va_antes_que_las_fechadas():
+    index = indice((4, 'Benigna'), (1, None))
+
+    assert index.lookup([BRAF], before_sample=1, sample_order=orden)[BRAF].ultima == 'Benigna'
+    assert index.lookup([BRAF], before_sample=4, sample_order=orden)[BRAF] is SIN_RECURRENCIA
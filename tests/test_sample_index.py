@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from sample_index import SampleIndex, parse_sample_name, sort_key
+
+
+def filas(n, seed=0, first_id=1):
+    rng = random.Random(seed)
+    rows = []
+    for sample_id in range(first_id, first_id + n):
+        if rng.random() < 0.05:
+            name = f"CONTROL-{sample_id}"
+        else:
+            name = f"{rng.choice([23, 24, 25])}{rng.choice('BMR')}{rng.randint(1, 3000)}"
+        # Fechas repetidas y algunas sin fecha: el desempate es sample_id
+        date = None if rng.random() < 0.05 else f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        rows.append({'sample_id': sample_id, 'sample_name': name, 'analysis_date': date})
+    return rows
+
+
+def referencia(rows, prefix=None, year=None, sample_type=None, cursor=None):
+    """Fuerza bruta: filtra y ordena todas las filas como la tabla"""
+    prefix = (prefix or '').strip().upper()
+    selected = []
+    for row in rows:
+        parsed = parse_sample_name(row['sample_name'])
+        key = sort_key(row['analysis_date'], row['sample_id'])
+        if year is not None and (parsed is None or parsed.year != year):
+            continue
+        if sample_type is not None and (parsed is None or parsed.type != sample_type):
+            continue
+        if cursor is not None and key >= sort_key(*cursor):
+            continue
+        if row['sample_name'].upper().startswith(prefix):
+            selected.append(key)
+    return [key[2] for key in sorted(selected, reverse=True)]
+
+
+def paginas(index, limit, cursor=None, **filtros):
+    """Recorre todas las páginas encadenando cursores como la aplicación"""
+    ids = []
+    while True:
+        page, has_next = index.page(cursor=cursor, limit=limit, **filtros)
+        ids += page
+        if not has_next:
+            return ids
+        assert len(page) == limit
+        cursor = index.cursor(page[-1])
+
+
+@pytest.fixture(scope='module')
+def rows():
+    return filas(600)
+
+
+@pytest.fixture(scope='module')
+def index(rows):
+    return SampleIndex(rows)
+
+
+# De muy selectivos (heap) a muy amplios (recorrido por fecha)
+@pytest.mark.parametrize('prefix', [None, '', '2', '25', ' 25b ', '25B1', '24M12', '23R2999', 'CONTROL', '99X'])
+@pytest.mark.parametrize('limit', [1, 7, 50])
+def test_paginas_encadenadas_igual_que_fuerza_bruta(index, rows, prefix, limit):
+    assert paginas(index, limit, prefix=prefix) == referencia(rows, prefix)
+
+
+@pytest.mark.parametrize('filtros', [
+    {'year': 2024}, {'sample_type': 'R'}, {'year': 2025, 'sample_type': 'B'},
+    {'year': 2025, 'prefix': '25B2'}, {'year': 2023, 'prefix': '25'}, {'sample_type': 'M', 'prefix': 'CONTROL'},
+])
+def test_filtros_de_año_y_tipo(index, rows, filtros):
+    assert paginas(index, 9, **filtros) == referencia(rows, **filtros)
+
+
+def test_filas_nuevas_entre_refrescos(rows):
+    index = SampleIndex(rows)
+    first, _ = index.page(prefix='25', limit=10)
+    cursor = index.cursor(first[-1])
+
+    # Llegan muestras nuevas y cambian el nombre y la fecha de otras
+    nuevas = filas(200, seed=1, first_id=10_000)
+    cambiadas = [{**row, 'sample_name': f"25B{row['sample_id']}", 'analysis_date': '2024-06-01'} for row in rows[:50]]
+    index.update(nuevas + cambiadas[:30])
+    index.update(cambiadas[30:])
+    actuales = list({row['sample_id']: row for row in rows + nuevas + cambiadas}.values())
+
+    # La siguiente página continúa desde el cursor con los datos actuales
+    assert paginas(index, 10, cursor=cursor, prefix='25') == referencia(actuales, '25', cursor=cursor)
+    assert paginas(index, 10, prefix='25') == referencia(actuales, '25')
+    assert len(index) == len(actuales)
+    assert index.years() == [2025, 2024, 2023]
+
+
+def test_reconstruir_da_lo_mismo_que_actualizar(rows):
+    nuevas = filas(100, seed=2, first_id=5_000)
+    actualizado = SampleIndex(rows)
+    for row in nuevas:
+        actualizado.update([row])
+    reconstruido = SampleIndex(rows + nuevas)
+
+    for prefix in [None, '24', '25M1']:
+        assert paginas(actualizado, 13, prefix=prefix) == paginas(reconstruido, 13, prefix=prefix)
+    assert actualizado.types() == reconstruido.types()
+
+
+def test_cursor_de_muestra_sin_fecha_o_desconocida(index, rows):
+    sin_fecha = next(row['sample_id'] for row in rows if row['analysis_date'] is None)
+    assert index.cursor(sin_fecha) == (None, sin_fecha)
+    assert index.cursor(999_999) == (None, 999_999)
+    assert index.name(999_999) is None
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+
+from repository import SupabaseRepository
+
+
+class Consulta:
+    """Lo mínimo del query builder de postgrest sobre una lista de filas"""
+
+    def __init__(self, client, table):
+        self.client, self.table = client, table
+        self.filtros, self.inicio, self.fin, self.count = [], 0, None, None
+
+    def select(self, columns, count=None):
+        self.count = count
+        return self
+
+    def in_(self, column, values):
+        self.client.in_values.append(len(values))
+        self.filtros.append(lambda row: row[column] in values)
+        return self
+
+    def gte(self, column, value):
+        self.filtros.append(lambda row: row[column] >= value)
+        return self
+
+    def order(self, column):
+        self.orden = column
+        return self
+
+    def range(self, start, end):
+        self.inicio, self.fin = start, end
+        return self
+
+    def execute(self):
+        self.client.peticiones += 1
+        rows = sorted((row for row in self.client.tablas[self.table] if all(f(row) for f in self.filtros)),
+                      key=lambda row: row[self.orden])
+        count = len(rows) if self.count == 'exact' and self.client.con_total else None
+        return SimpleNamespace(data=rows[self.inicio:self.fin + 1], count=count)
+
+
+class Cliente:
+    def __init__(self, tablas, con_total=True):
+        self.tablas, self.con_total = tablas, con_total
+        self.peticiones = 0
+        self.in_values = []
+
+    def table(self, name):
+        return Consulta(self, name)
+
+
+@pytest.fixture(params=[True, False], ids=['con_total', 'sin_total'])
+def repo(request, monkeypatch):
+    monkeypatch.setattr(SupabaseRepository, 'PAGE_SIZE', 10)
+    monkeypatch.setattr(SupabaseRepository, 'MAX_IN_VALUES', 25)
+    rows = [{'sample_id': i, 'sample_name': f"25B{i}"} for i in range(1, 31)]
+    return SupabaseRepository(Cliente({'sample': rows}, con_total=request.param))
+
+
+def test_select_trocea_los_ids(repo):
+    rows = repo._select('sample', '*', 'sample_id', range(1, 61))
+
+    assert sorted(row['sample_id'] for row in rows) == list(range(1, 31))
+    assert max(repo.client.in_values) <= 25 and min(repo.client.in_values) == 10
+
+
+def test_ultima_pagina_completa(repo):
+    # 30 filas en páginas de 10: con el total bastan 3 peticiones
+    assert len(repo._select_all('sample', '*', 'sample_id')) == 30
+    assert repo.client.peticiones == (3 if repo.client.con_total else 4)
+
+
+def test_pagina_corta(repo):
+    assert len(repo._select_all('sample', '*', 'sample_id', 'sample_id', 6)) == 25
+    assert repo.client.peticiones == 3
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+
+from civic_stub import StubCivic
+from civic_cache import normalizar_clave
+from report_format import civic_queries
+from variant_names import canonical_variant, civic_name, civic_names, civic_variants
+
+
+@pytest.mark.parametrize('protein, coding, esperado', [
+    ('p.Val600Glu', None, 'V600E'),
+    ('p.(Val600Glu)', None, 'V600E'),
+    ('p.V600E', None, 'V600E'),
+    ('p.(Trp288CysfsTer12)', None, 'W288fs'),
+    ('p.Thr1556fs*3', None, 'T1556fs'),
+    ('p.Arg213Ter', None, 'R213*'),
+    ('p.R213X', None, 'R213*'),
+    ('p.Glu746_Ala750del', None, 'E746_A750del'),
+    ('p.Leu747_Pro753delinsSer', None, 'L747_P753delinsS'),
+    ('p.Ala763_Tyr764insPheGlnGluAla', None, 'A763_Y764insFQEA'),
+    ('p.Gly12Asp,p.Gly12Val', None, 'G12D'),
+    ('p.?', 'c.3028+1G>A', 'c.3028+1G>A'),
+    ('p.(=)', None, None),
+    ('p.Val600=', None, None),
+    ('N/A', 'c.35G>A', None),
+    (None, None, None),
+])
+def test_civic_name(protein, coding, esperado):
+    assert civic_name(protein, coding) == esperado
+
+
+def test_multialelica_y_columnas():
+    assert civic_variants('p.Gly12Asp, p.Gly12Val') == ('G12D', 'G12V')
+    assert civic_names(['p.Val600Glu', None, 'p.Val600Glu'], ['c.1799T>A', None, 'c.1799T>A']) == [
+        'V600E', None, 'V600E'
+    ]
+
+
+def test_clave_comun_para_hgvs_alias_y_civic():
+    assert canonical_variant('AMPLIFICATION') == 'AMPLIFICATION'
+    assert normalizar_clave('braf', 'p.Val600Glu') == normalizar_clave('BRAF', 'VAL600GLU') == 'BRAF:V600E'
+
+
+def test_lote_con_hgvs_y_nombre_civic_no_envenena_la_cache(civic, monkeypatch):
+    with StubCivic('ok') as stub:
+        monkeypatch.setattr(civic, 'API_URL', stub.url)
+
+        resultados, no_encontrados, errores = civic.buscar_lote([('BRAF', 'p.Val600Glu'), ('braf', 'V600E')])
+
+        assert set(resultados) == {('BRAF', 'p.Val600Glu'), ('braf', 'V600E')}
+        assert no_encontrados == errores == []
+        assert civic.buscar('BRAF', 'V600E').estado == civic.ENCONTRADO
+        assert stub.peticiones == 1
+
+
+def test_buscar_envia_el_nombre_canonico(civic, monkeypatch):
+    with StubCivic('ok') as stub:
+        monkeypatch.setattr(civic, 'API_URL', stub.url)
+
+        assert civic.buscar('KRAS', 'p.(Gly12Cys)').estado == civic.ENCONTRADO
+        assert civic.buscar('KRAS', 'G12C').estado == civic.ENCONTRADO
+        estados = {par: c.estado for par, c in civic.buscar_varios([('EGFR', 'p.Leu858Arg'), ('EGFR', 'L858R')])}
+        assert list(estados.values()) == [civic.ENCONTRADO]
+        assert stub.peticiones == 2
+
+
+def test_civic_queries_un_par_por_alelo():
+    def mut(gene, protein, coding=None):
+        return SimpleNamespace(gene=gene, protein=protein, coding=coding)
+
+    assert civic_queries(mut('KRAS', 'p.Gly12Asp,p.Gly12Val', 'c.35G>A,c.35G>T')) == [('KRAS', 'G12D'), ('KRAS', 'G12V')]
+    assert civic_queries(mut('BRAF', 'p.(Val600Glu)')) == [('BRAF', 'V600E')]
+    assert civic_queries(mut('TP53', 'p.(Pro72=)')) == []
+    assert civic_queries(mut('N/A', 'p.Val600Glu')) == []
@@ -0,0 +1,130 @@
+"""Nombres de variante de CIViC a partir de la notación HGVS de Ion Reporter.
+
+CIViC nombra las variantes proteicas con códigos de una letra y sin el
+prefijo `p.`: V600E, R213*, W288fs, E746_A750del, A763_Y764insFQEA. Ion
+Reporter da la proteína en HGVS con códigos de tres letras, a veces
+predicha entre paréntesis, varios alelos separados por comas y, en las
+variantes de splicing, sólo el cambio en el ADNc:
+
+    civic_name('p.Val600Glu')                  → 'V600E'
+    civic_name('p.(Trp288CysfsTer12)')         → 'W288fs'
+    civic_name('p.Gly12Asp,p.Gly12Val')        → 'G12D'
+    civic_variants('p.Gly12Asp,p.Gly12Val')    → ('G12D', 'G12V')
+    civic_name('p.?', 'c.3028+1G>A')           → 'c.3028+1G>A'
+    civic_name('p.(=)')                        → None (sinónima, no se busca)
+
+`canonical_variant` aplica la misma normalización a cualquier nombre (los
+de CIViC y sus alias, 'VAL600GLU', 'R213X'...), y `civic_cache.normalizar_clave`
+la usa, así la caché, las búsquedas por lotes y el volcado local comparten
+clave. Todo está memoizado: en una cohorte se repiten pocas notaciones.
+"""
+import re
+from functools import lru_cache
+
+AMINO_ACIDS = {
+    'Ala': 'A', 'Arg': 'R', 'Asn': 'N', 'Asp': 'D', 'Cys': 'C', 'Gln': 'Q', 'Glu': 'E', 'Gly': 'G',
+    'His': 'H', 'Ile': 'I', 'Leu': 'L', 'Lys': 'K', 'Met': 'M', 'Phe': 'F', 'Pro': 'P', 'Ser': 'S',
+    'Thr': 'T', 'Trp': 'W', 'Tyr': 'Y', 'Val': 'V', 'Sec': 'U', 'Pyl': 'O', 'Ter': '*', 'Xaa': 'X',
+}
+
+# Variantes memoizadas (notaciones distintas, no filas)
+CACHE_SIZE = 65536
+
+# Separadores de alelos en el campo protein/coding
+_ALLELES = re.compile(r'\s*[,;|]\s*')
+# Códigos de tres letras como en HGVS (Val600Glu) o en mayúsculas (VAL600GLU, alias de CIViC)
+_AA3 = re.compile('|'.join(AMINO_ACIDS))
+_AA3_UPPER = re.compile('|'.join(code.upper() for code in AMINO_ACIDS))
+# Forma de cambio proteico: aminoácido (1 o 3 letras) o stop y posición
+_PROTEIN = re.compile(r'^(?:[A-Z][a-z]{2}|[A-Z*])\d')
+_PROTEIN_UPPER = re.compile(r'^[A-Z]{3}\d')
+_KEYWORDS = re.compile(r'delins|del|ins|dup|fs|ext', re.IGNORECASE)
+_FRAMESHIFT = re.compile(r'^([A-Z*])(\d+)[A-Z*]?fs.*$')
+_STOP_X = re.compile(r'^([A-Z])(\d+)X$')
+# Sinónimas, desconocidas o sin proteína: no tienen nombre en CIViC
+_NO_PROTEIN = {'', '=', '?', '0', '0?', 'N/A'}
+_SPLICE = re.compile(r'^c\.[-*]?\d+[+-]\d+')
+
+
+def _strip(value):
+    """Quita espacios, prefijo `p.` y paréntesis de predicción"""
+    value = ''.join((value or '').split())
+    if value[:2] in ('p.', 'P.'):
+        value = value[2:]
+    return value.replace('(', '').replace(')', '')
+
+
+def _protein(value):
+    """Cambio proteico (ya sin `p.` ni paréntesis) en la forma de CIViC; el resto sin cambios"""
+    if _PROTEIN_UPPER.match(value) and _AA3_UPPER.match(value):
+        value = _AA3_UPPER.sub(lambda m: AMINO_ACIDS[m.group().title()], value)
+    elif _PROTEIN.match(value):
+        value = _AA3.sub(lambda m: AMINO_ACIDS[m.group()], value)
+    else:
+        return value
+
+    value = _KEYWORDS.sub(lambda m: m.group().lower(), value)
+    # CIViC no pone el aminoácido nuevo ni la longitud en los frameshift
+    frameshift = _FRAMESHIFT.match(value)
+    if frameshift:
+        return f"{frameshift.group(1)}{frameshift.group(2)}fs"
+    return _STOP_X.sub(r'\1\2*', value)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical_variant(variant):
+    """Nombre de variante normalizado ('p.Val600Glu', 'VAL600GLU', 'V600E' → 'V600E').
+
+    Los nombres que no son un cambio proteico (AMPLIFICATION, EXON 19
+    DELETION) sólo se normalizan en espacios.
+    """
+    variant = " ".join((variant or "").split())
+    stripped = _strip(variant)
+    if _PROTEIN.match(stripped) or _PROTEIN_UPPER.match(stripped):
+        return _protein(stripped)
+    return variant
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def civic_variants(protein, coding=None):
+    """Nombres de CIViC de cada alelo de una mutación (tupla, vacía si no hay nada que buscar).
+
+    Si un alelo no tiene cambio proteico pero sí uno de splicing en el
+    ADNc (c.3028+1G>A), se usa éste.
+    """
+    proteins = _ALLELES.split((protein or '').strip())
+    codings = _ALLELES.split((coding or '').strip())
+    names = []
+    for i, allele in enumerate(proteins):
+        allele = _strip(allele)
+        if allele.endswith('='):
+            continue
+        if allele in _NO_PROTEIN:
+            allele_coding = ''.join((codings[i] if i < len(codings) else '').split())
+            if _SPLICE.match(allele_coding):
+                names.append(allele_coding)
+            continue
+        names.append(_protein(allele))
+    return tuple(dict.fromkeys(names))
+
+
+def civic_name(protein, coding=None):
+    """Nombre de CIViC del primer alelo, o None si no hay nada que buscar"""
+    names = civic_variants(protein, coding)
+    return names[0] if names else None
+
+
+def civic_names(proteins, codings=None):
+    """civic_name de columnas enteras (p. ej. df['protein'], df['coding']).
+
+    Cada par distinto se resuelve una sola vez; devuelve una lista alineada
+    con la entrada, para asignarla como columna de un DataFrame.
+    """
+    proteins = list(proteins)
+    codings = list(codings) if codings is not None else [None] * len(proteins)
+    pairs = [
+        (protein if isinstance(protein, str) else None, coding if isinstance(coding, str) else None)
+        for protein, coding in zip(proteins, codings)
+    ]
+    names = {pair: civic_name(*pair) for pair in dict.fromkeys(pairs)}
+    return [names[pair] for pair in pairs]